@@ -44,6 +44,7 @@ class Adb(metaclass=Singleton):
                 PythonADBManager.device.close()
             return True
         if cls.core == cls.EXTERNAL_TOOL_ADB:
+            adb_helper.close_sessions()
             if adb_helper.kill_server().is_okay:
                 print("ADB Server stopped")
             return True
@@ -0,0 +1,126 @@
+# ADB File Explorer
+# Copyright (C) 2025  aakbar5
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from app.core.settings import SettingsOptions, Settings
+from app.helpers.singleton import Singleton
+from app.helpers.tools import CancellationToken
+
+
+class TokenBucket:
+    """
+    TokenBucket - byte rate limit, `rate` bytes per second refilled continuously.
+    Up to BURST seconds worth of bytes can pass at once, rate 0 is unlimited.
+    """
+    BURST = 0.25
+
+    def __init__(self, rate: int = 0):
+        self.rate = rate
+        self.tokens = rate * self.BURST
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, size: int, rate: int) -> float:
+        """Takes `size` bytes out of the bucket, returns the seconds to wait before sending them"""
+        with self.lock:
+            now = time.monotonic()
+            if rate != self.rate:
+                self.rate = rate
+                self.tokens = min(self.tokens, rate * self.BURST)
+            if not rate:
+                self.updated = now
+                return 0.0
+            self.tokens = min(self.tokens + (now - self.updated) * rate, rate * self.BURST)
+            self.updated = now
+            self.tokens -= size
+            return -self.tokens / rate if self.tokens < 0 else 0.0
+
+
+class Bandwidth:
+    """
+    Bandwidth - rate limits of the transfer data, global and for every device.
+    Chunk loops of both cores call throttle() with the size of every chunk they move, it
+    sleeps as long as the buckets ask for. Limits are settings in KiB/s (0 is unlimited)
+    and are read on every chunk, so changes apply to running transfers.
+
+    The bytes of every second are kept for the last HISTORY seconds for throughput graphs.
+    """
+    __metaclass__ = Singleton
+
+    HISTORY = 60
+    # Sleep slices, a cancelled transfer does not wait for its whole delay
+    SLEEP_MAX = 0.1
+
+    lock = threading.Lock()
+    local = threading.local()
+    bucket = TokenBucket()
+    buckets = {}
+    # (second, bytes) of all transfers and of every device
+    history = deque(maxlen=HISTORY)
+    device_history = {}
+
+    @classmethod
+    @contextmanager
+    def transfer(cls, device_id: str, counter: callable = None):
+        """Chunks moved on this thread count for the device `device_id`, counter is called with their size"""
+        previous = getattr(cls.local, 'device_id', None), getattr(cls.local, 'counter', None)
+        cls.local.device_id, cls.local.counter = device_id, counter
+        try:
+            yield
+        finally:
+            cls.local.device_id, cls.local.counter = previous
+
+    @staticmethod
+    def limits():
+        """(global, per device) limit in bytes per second"""
+        return (
+            max(0, Settings.get_value(SettingsOptions.TRANSFER_RATE_LIMIT)) * 1024,
+            max(0, Settings.get_value(SettingsOptions.DEVICE_RATE_LIMIT)) * 1024,
+        )
+
+    @classmethod
+    def throttle(cls, size: int):
+        if size <= 0:
+            return
+        device_id = getattr(cls.local, 'device_id', None)
+        counter = getattr(cls.local, 'counter', None)
+        if counter:
+            counter(size)
+        global_rate, device_rate = cls.limits()
+        with cls.lock:
+            bucket = cls.buckets.get(device_id)
+            if bucket is None:
+                bucket = cls.buckets[device_id] = TokenBucket()
+            cls.__record(cls.history, size)
+            cls.__record(cls.device_history.setdefault(device_id, deque(maxlen=cls.HISTORY)), size)
+
+        delay = max(cls.bucket.reserve(size, global_rate), bucket.reserve(size, device_rate))
+        token = CancellationToken.current()
+        end = time.monotonic() + delay
+        while not token.cancelled:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(remaining, cls.SLEEP_MAX))
+
+    @staticmethod
+    def __record(history: deque, size: int):
+        # Called with the lock held
+        second = int(time.monotonic())
+        if history and history[-1][0] == second:
+            history[-1][1] += size
+        else:
+            history.append([second, size])
+
+    @classmethod
+    def throughput(cls, device_id: str = None, seconds: int = HISTORY) -> list:
+        """Bytes per second of the last `seconds` complete seconds, oldest first, all devices by default"""
+        with cls.lock:
+            history = cls.history if device_id is None else cls.device_history.get(device_id, ())
+            values = dict((second, size) for second, size in history)
+        now = int(time.monotonic())
+        return [values.get(second, 0) for second in range(now - seconds, now)]
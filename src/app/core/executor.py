@@ -0,0 +1,181 @@
+# ADB File Explorer
+# Copyright (C) 2025  aakbar5
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from app.helpers.singleton import Singleton
+
+
+class PoolStats:
+    """Counters of one pool, latencies in seconds"""
+
+    def __init__(self):
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.replaced = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            'queued': self.submitted - self.started,
+            'running': self.started - self.completed,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'replaced': self.replaced,
+            'wait_avg': self.wait_total / self.started if self.started else 0.0,
+            'wait_max': self.wait_max,
+            'run_avg': self.run_total / self.completed if self.completed else 0.0,
+            'run_max': self.run_max,
+        }
+
+
+class Executor:
+    """
+    Executor - bounded thread pools shared by all repository calls.
+    INTERACTIVE runs what the user waits for (listings, stat, small commands), BULK runs
+    transfers, hashing and indexing, so a long transfer never holds a listing back.
+
+    A task submitted with a key replaces the pending task with the same key: its cancel
+    callable is called, e.g. only the latest listing of the file view matters.
+
+    Interactive tasks go first on the link too: bulk loops call yield_to_interactive() between
+    chunks, which holds them while an interactive task younger than PRIORITY_WINDOW is pending.
+    """
+    __metaclass__ = Singleton
+
+    INTERACTIVE = 'interactive'
+    BULK = 'bulk'
+    SIZES = {INTERACTIVE: 4, BULK: 16}
+    # Seconds an interactive task holds bulk tasks back, longer ones share the link again
+    PRIORITY_WINDOW = 3.0
+
+    lock = threading.Lock()
+    interactive_done = threading.Condition(lock)
+    pools = {}
+    stats = {name: PoolStats() for name in SIZES}
+    # Key -> (future, cancel callable) of the latest task
+    keys = {}
+    # Submit time of the pending interactive tasks
+    interactive = {}
+    # Name -> [count, total, max] seconds from submit to completion
+    latency = {}
+    # Called when the last pending interactive task completes
+    idle_callbacks = []
+
+    @classmethod
+    def submit(cls, pool: str, function: callable, *arguments, key=None, cancel: callable = None,
+               name: str = None) -> Future:
+        """name -- end to end latency is recorded under it (default function name)"""
+        replaced = None
+        with cls.lock:
+            executor = cls.pools.get(pool)
+            if executor is None:
+                executor = cls.pools[pool] = ThreadPoolExecutor(cls.SIZES[pool], thread_name_prefix=pool)
+            if key is not None and key in cls.keys:
+                future, replaced = cls.keys.pop(key)
+                if future.done():
+                    replaced = None
+                else:
+                    cls.stats[pool].replaced += 1
+            cls.stats[pool].submitted += 1
+            submitted = time.monotonic()
+            future = executor.submit(cls.__call, pool, submitted, function, arguments)
+            if key is not None:
+                cls.keys[key] = (future, cancel)
+            if pool == cls.INTERACTIVE:
+                cls.interactive[future] = submitted
+        name = name or getattr(function, '__qualname__', 'task')
+        future.add_done_callback(lambda done: cls.__done(key, name, submitted, done))
+        if replaced:
+            replaced()
+        return future
+
+    @classmethod
+    def __call(cls, pool: str, submitted: float, function: callable, arguments: tuple):
+        started = time.monotonic()
+        stats = cls.stats[pool]
+        with cls.lock:
+            stats.started += 1
+            stats.wait_total += started - submitted
+            stats.wait_max = max(stats.wait_max, started - submitted)
+        try:
+            return function(*arguments)
+        except BaseException as error:
+            logging.exception("Unexpected error=%s, type(error)=%s", error, type(error))
+            raise
+        finally:
+            duration = time.monotonic() - started
+            with cls.lock:
+                stats.completed += 1
+                stats.run_total += duration
+                stats.run_max = max(stats.run_max, duration)
+
+    @classmethod
+    def __done(cls, key, name: str, submitted: float, future: Future):
+        duration = time.monotonic() - submitted
+        with cls.lock:
+            if key is not None and cls.keys.get(key, (None,))[0] is future:
+                del cls.keys[key]
+            record = cls.latency.setdefault(name, [0, 0.0, 0.0])
+            record[0] += 1
+            record[1] += duration
+            record[2] = max(record[2], duration)
+            idle = cls.interactive.pop(future, None) is not None and not cls.interactive
+            if idle:
+                cls.interactive_done.notify_all()
+        if idle:
+            for callback in cls.idle_callbacks:
+                callback()
+
+    @classmethod
+    def interactive_pending(cls) -> bool:
+        with cls.lock:
+            return bool(cls.interactive)
+
+    @classmethod
+    def yield_to_interactive(cls) -> float:
+        """
+        Called by bulk loops between chunks, waits while a recent interactive task is pending.
+        Returns the seconds waited.
+        """
+        start = time.monotonic()
+        with cls.lock:
+            while cls.interactive:
+                remaining = max(cls.interactive.values()) + cls.PRIORITY_WINDOW - time.monotonic()
+                if remaining <= 0:
+                    break
+                cls.interactive_done.wait(remaining)
+        return time.monotonic() - start
+
+    @classmethod
+    def statistics(cls) -> dict:
+        """
+        {pool: {'queued', 'running', 'submitted', 'completed', 'replaced', 'wait_avg', ...},
+         'latency': {name: {'count', 'avg', 'max'}}}
+        """
+        with cls.lock:
+            statistics = {name: stats.snapshot() for name, stats in cls.stats.items()}
+            statistics['latency'] = {
+                name: {'count': count, 'avg': total / count, 'max': maximum}
+                for name, (count, total, maximum) in cls.latency.items()
+            }
+            return statistics
+
+    @classmethod
+    def shutdown(cls):
+        """Drops the queued tasks, running ones are expected to be cancelled by their tokens"""
+        with cls.lock:
+            pools = list(cls.pools.values())
+            cls.pools = {}
+            cls.keys = {}
+            cls.interactive.clear()
+            cls.interactive_done.notify_all()
+        for executor in pools:
+            executor.shutdown(wait=False, cancel_futures=True)
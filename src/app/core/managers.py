@@ -192,30 +192,29 @@ class PythonADBManager(ADBManager):
 class WorkersManager:
     """
     Async Workers Manager
-    Contains a list of workers
+    Latest worker of every worker id, the Executor runs them and replaces the pending one
+    with the same id when a new one starts
     """
     __metaclass__ = Singleton
     instance = QObject()
-    workers = []
+    workers = {}
 
     @classmethod
     def work(cls, worker: AsyncRepositoryWorker) -> bool:
-        for _worker in cls.workers:
-            if _worker == worker or _worker.id == worker.id:
-                cls.workers.remove(_worker)
-                del _worker
-                break
         worker.setParent(cls.instance)
-        cls.workers.append(worker)
+        cls.workers[worker.id] = worker
         return True
 
     @classmethod
     def check(cls, worker_id: int) -> bool:
-        for worker in cls.workers:
-            if worker.id == worker_id:
-                if worker.closed:
-                    return True
-        return False
+        worker = cls.workers.get(worker_id)
+        return worker is not None and worker.closed
+
+    @classmethod
+    def cancel_all(cls):
+        for worker in cls.workers.values():
+            if not worker.closed:
+                worker.cancel()
 
 
 class Global:
@@ -0,0 +1,65 @@
+# ADB File Explorer
+# Copyright (C) 2025  aakbar5
+
+import itertools
+import logging
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication
+
+from app.helpers.singleton import Singleton
+from app.helpers.tools import AsyncRepositoryWorker, Cancelled
+
+
+class Operations:
+    """
+    Operations - repository calls of the GUI run off the GUI thread.
+    run() calls method(*arguments) on a worker thread and delivers (data, error) to the
+    callback on the GUI thread. A busy cursor is shown while any operation is pending.
+    """
+    __metaclass__ = Singleton
+
+    ids = itertools.count(1000)
+    running = set()
+
+    @classmethod
+    def run(cls, name: str, method: callable, arguments: tuple = (), callback: callable = None) -> AsyncRepositoryWorker:
+        worker = AsyncRepositoryWorker(
+            worker_id=next(cls.ids),
+            name=name,
+            repository_method=cls.__call,
+            arguments=(method, *arguments),
+            response_callback=lambda data, error: cls.__finished(worker, callback, data, error)
+        )
+        if not cls.running:
+            QApplication.setOverrideCursor(Qt.BusyCursor)
+        cls.running.add(worker)
+        worker.start()
+        return worker
+
+    @classmethod
+    def cancel_all(cls):
+        for worker in list(cls.running):
+            worker.cancel()
+
+    @classmethod
+    def pending(cls) -> int:
+        return len(cls.running)
+
+    @staticmethod
+    def __call(method: callable, *arguments):
+        try:
+            return method(*arguments) or (None, None)
+        except Cancelled:
+            raise
+        except BaseException as error:
+            logging.exception("Unexpected error=%s, type(error)=%s", error, type(error))
+            return None, str(error)
+
+    @classmethod
+    def __finished(cls, worker: AsyncRepositoryWorker, callback: callable, data, error):
+        cls.running.discard(worker)
+        if not cls.running:
+            QApplication.restoreOverrideCursor()
+        if callback:
+            callback(data, error)
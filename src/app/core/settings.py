@@ -1,9 +1,11 @@
 # ADB File Explorer
 # Copyright (C) 2022  Azat Aldeshov
 
+import logging
 import os
 
-from PyQt5.QtCore import QSettings, QPoint, QSize
+from PyQt5 import QtCore
+from PyQt5.QtCore import QObject, QSettings, QPoint, QSize
 
 from app.helpers.singleton import Singleton
 
@@ -27,9 +29,71 @@ class SettingsOptions:
     HEADER_SIZE = 'header_size'
     HEADER_DATE = 'header_date'
     HEADER_MIME_TYPE = 'header_mime_type'
+    TRANSFER_PARALLEL = 'transfer_parallel'
+    SYNC_CHECKSUM = 'sync_checksum'
+    TRANSFER_RETRIES = 'transfer_retries'
+    LISTING_BATCH_SIZE = 'listing_batch_size'
+    LISTING_FLUSH_INTERVAL = 'listing_flush_interval'
+    TRANSFER_RATE_LIMIT = 'transfer_rate_limit'
+    DEVICE_RATE_LIMIT = 'device_rate_limit'
+
+
+def to_bool(value):
+    if isinstance(value, str):
+        if value.lower() == 'true':
+            return True
+        return False
+    if value is None:
+        return False
+    return value
+
+
+class SettingsSignals(QObject):
+    changed = QtCore.pyqtSignal(str, object)  # Key, new value
+
 
 class Settings(metaclass=Singleton):
+    """
+    Settings - QSettings is read once into a snapshot of typed values, get_value() is a dict lookup
+    and safe to call from worker threads. set_value() persists, updates the snapshot and emits
+    signals.changed when the value differs, consumers which keep a value around subscribe to it.
+    Keys outside SettingsOptions, e.g. the last path of a device, are passed through to QSettings.
+    """
     settings_ = None
+    values = {}
+    signals = SettingsSignals()
+
+    # Key, default, type
+    options = (
+        (SettingsOptions.ADB_PATH, 'adb', str),
+        (SettingsOptions.ADB_CORE, 'external', str),
+        (SettingsOptions.ADB_AS_ROOT, False, to_bool),
+        (SettingsOptions.ADB_KILL_AT_EXIT, False, to_bool),
+        (SettingsOptions.PRESERVE_TIMESTAMP, True, to_bool),
+        (SettingsOptions.NOTIFICATION_TIMEOUT, 2000, int),
+        (SettingsOptions.DOWNLOAD_PATH, os.path.join(os.path.expanduser('~'), 'Downloads'), str),
+        (SettingsOptions.SHOW_WELCOME_MSG, True, to_bool),
+        (SettingsOptions.RESTORE_WIN_GEOMETRY, True, to_bool),
+        (SettingsOptions.WIN_SIZE, QSize(640, 480), QSize),
+        (SettingsOptions.WIN_POS, QPoint(50, 50), QPoint),
+        (SettingsOptions.STATUSBAR_UPDATE_TIME, 100, int),
+        (SettingsOptions.FILE_DATE_FORMAT, 'Informal', str),
+        (SettingsOptions.ADB_KEY_FILE_PATH, os.path.join(os.path.expanduser('~'), '.android', 'adbkey'), str),
+        (SettingsOptions.SORT_FOLDERS_BEFORE_FILES, True, to_bool),
+        (SettingsOptions.HEADER_PERMISSION, True, to_bool),
+        (SettingsOptions.HEADER_SIZE, True, to_bool),
+        (SettingsOptions.HEADER_DATE, True, to_bool),
+        (SettingsOptions.HEADER_MIME_TYPE, True, to_bool),
+        (SettingsOptions.TRANSFER_PARALLEL, 2, int),
+        (SettingsOptions.SYNC_CHECKSUM, False, to_bool),
+        (SettingsOptions.TRANSFER_RETRIES, 3, int),
+        (SettingsOptions.LISTING_BATCH_SIZE, 500, int),
+        (SettingsOptions.LISTING_FLUSH_INTERVAL, 100, int),
+        # KiB/s, 0 is unlimited
+        (SettingsOptions.TRANSFER_RATE_LIMIT, 0, int),
+        (SettingsOptions.DEVICE_RATE_LIMIT, 0, int),
+    )
+    types = {key: kind for key, _, kind in options}
 
     @classmethod
     def initialize(cls):
@@ -37,128 +101,40 @@ class Settings(metaclass=Singleton):
             return True
 
         cls.settings_ = QSettings('ADBFileExplorer', 'ADBFileExplorer')
-        if not cls.settings_.contains(SettingsOptions.ADB_PATH):
-            cls.settings_.setValue(SettingsOptions.ADB_PATH, 'adb')
-
-        if not cls.settings_.contains(SettingsOptions.ADB_CORE):
-            cls.settings_.setValue(SettingsOptions.ADB_CORE, 'external')
-
-        if not cls.settings_.contains(SettingsOptions.ADB_AS_ROOT):
-            cls.settings_.setValue(SettingsOptions.ADB_AS_ROOT, False)
-
-        if not cls.settings_.contains(SettingsOptions.ADB_KILL_AT_EXIT):
-            cls.settings_.setValue(SettingsOptions.ADB_KILL_AT_EXIT, False)
-
-        if not cls.settings_.contains(SettingsOptions.PRESERVE_TIMESTAMP):
-            cls.settings_.setValue(SettingsOptions.PRESERVE_TIMESTAMP, True)
-
-        if not cls.settings_.contains(SettingsOptions.NOTIFICATION_TIMEOUT):
-            cls.settings_.setValue(SettingsOptions.NOTIFICATION_TIMEOUT, 2000)
-
-        user_download_folder = os.path.join(os.path.expanduser('~'), 'Downloads')
-        if not cls.settings_.contains(SettingsOptions.DOWNLOAD_PATH):
-            cls.settings_.setValue(SettingsOptions.DOWNLOAD_PATH, user_download_folder)
-
-        if not cls.settings_.contains(SettingsOptions.SHOW_WELCOME_MSG):
-            cls.settings_.setValue(SettingsOptions.SHOW_WELCOME_MSG, True)
-
-        if not cls.settings_.contains(SettingsOptions.RESTORE_WIN_GEOMETRY):
-            cls.settings_.setValue(SettingsOptions.RESTORE_WIN_GEOMETRY, True)
-
-        if not cls.settings_.contains(SettingsOptions.WIN_SIZE):
-            cls.settings_.setValue(SettingsOptions.WIN_SIZE, QSize(640, 480))
-
-        if not cls.settings_.contains(SettingsOptions.WIN_POS):
-            cls.settings_.setValue(SettingsOptions.WIN_POS, QPoint(50, 50))
-
-        if not cls.settings_.contains(SettingsOptions.STATUSBAR_UPDATE_TIME):
-            cls.settings_.setValue(SettingsOptions.STATUSBAR_UPDATE_TIME, 100)
-
-        if not cls.settings_.contains(SettingsOptions.FILE_DATE_FORMAT):
-            cls.settings_.setValue(SettingsOptions.FILE_DATE_FORMAT, 'Informal')
-
-        # os.path.expanduser('~/.android/adbkey')
-        adb_key_file = os.path.join(os.path.expanduser('~'), '.android', 'adbkey')
-        if not cls.settings_.contains(SettingsOptions.ADB_KEY_FILE_PATH):
-            cls.settings_.setValue(SettingsOptions.ADB_KEY_FILE_PATH, adb_key_file)
-
-        if not cls.settings_.contains(SettingsOptions.SORT_FOLDERS_BEFORE_FILES):
-            cls.settings_.setValue(SettingsOptions.SORT_FOLDERS_BEFORE_FILES, True)
-
-        if not cls.settings_.contains(SettingsOptions.HEADER_PERMISSION):
-            cls.settings_.setValue(SettingsOptions.HEADER_PERMISSION, True)
-
-        if not cls.settings_.contains(SettingsOptions.HEADER_SIZE):
-            cls.settings_.setValue(SettingsOptions.HEADER_SIZE, True)
-
-        if not cls.settings_.contains(SettingsOptions.HEADER_DATE):
-            cls.settings_.setValue(SettingsOptions.HEADER_DATE, True)
-
-        if not cls.settings_.contains(SettingsOptions.HEADER_MIME_TYPE):
-            cls.settings_.setValue(SettingsOptions.HEADER_MIME_TYPE, True)
-
-    @classmethod
-    def to_bool(cls, value):
-        if isinstance(value, str):
-            if value.lower() == 'true':
-                return True
-            return False
-        if value is None:
-            return False
-        return value
+        values = {}
+        for key, default, kind in cls.options:
+            if not cls.settings_.contains(key):
+                cls.settings_.setValue(key, default)
+            try:
+                values[key] = kind(cls.settings_.value(key))
+            except (TypeError, ValueError):
+                values[key] = default
+        cls.values = values
 
     @classmethod
     def set_value(cls, key, value):
+        cls.initialize()
+        kind = cls.types.get(key)
+        if kind is None:
+            cls.settings_.setValue(key, value)
+            return
+        try:
+            value = kind(value)
+        except (TypeError, ValueError):
+            logging.warning("Ignoring invalid value %r of setting %s", value, key)
+            return
         cls.settings_.setValue(key, value)
+        if cls.values.get(key) != value:
+            cls.values[key] = value
+            cls.signals.changed.emit(key, value)
 
     @classmethod
     def get_value(cls, key, device = None):
         cls.initialize()
-        raw_value = cls.settings_.value(key)
-        if key == SettingsOptions.ADB_PATH:
-            return str(raw_value)
-        if key == SettingsOptions.ADB_CORE:
-            return str(raw_value)
-        if key == SettingsOptions.ADB_AS_ROOT:
-            return cls.to_bool(raw_value)
-        if key == SettingsOptions.ADB_KILL_AT_EXIT:
-            return cls.to_bool(raw_value)
-        if key == SettingsOptions.PRESERVE_TIMESTAMP:
-            return cls.to_bool(raw_value)
-        if key == SettingsOptions.NOTIFICATION_TIMEOUT:
-            return int(raw_value)
-        if key == SettingsOptions.DOWNLOAD_PATH:
-            if not os.path.isdir(raw_value):
-                os.mkdir(raw_value)
-            if device:
-                device_name = device.name.replace(" ", "_")
-                downloads_path = os.path.join(raw_value, device_name)
-                if not os.path.isdir(downloads_path):
-                    os.mkdir(downloads_path)
-                return downloads_path
-            return raw_value
-        if key == SettingsOptions.SHOW_WELCOME_MSG:
-            return cls.to_bool(raw_value)
-        if key == SettingsOptions.RESTORE_WIN_GEOMETRY:
-            return cls.to_bool(raw_value)
-        if key == SettingsOptions.WIN_SIZE:
-            return QSize(raw_value)
-        if key == SettingsOptions.WIN_POS:
-            return QPoint(raw_value)
-        if key == SettingsOptions.STATUSBAR_UPDATE_TIME:
-            return int(raw_value)
-        if key == SettingsOptions.FILE_DATE_FORMAT:
-            return str(raw_value)
-        if key == SettingsOptions.ADB_KEY_FILE_PATH:
-            return str(raw_value)
-        if key == SettingsOptions.SORT_FOLDERS_BEFORE_FILES:
-            return cls.to_bool(raw_value)
-        if key == SettingsOptions.HEADER_PERMISSION:
-            return cls.to_bool(raw_value)
-        if key == SettingsOptions.HEADER_SIZE:
-            return cls.to_bool(raw_value)
-        if key == SettingsOptions.HEADER_DATE:
-            return cls.to_bool(raw_value)
-        if key == SettingsOptions.HEADER_MIME_TYPE:
-            return cls.to_bool(raw_value)
-        return raw_value
+        if key not in cls.values:
+            return cls.settings_.value(key)
+        value = cls.values[key]
+        if key == SettingsOptions.DOWNLOAD_PATH and device:
+            # Created by the download which writes into it
+            return os.path.join(value, device.name.replace(" ", "_"))
+        return value
@@ -0,0 +1,187 @@
+# ADB File Explorer
+# Copyright (C) 2025  aakbar5
+
+import math
+import threading
+import time
+from collections import deque
+
+from app.helpers.singleton import Singleton
+
+
+class TransferMeter:
+    """
+    TransferMeter - bytes moved by one transfer.
+    Paths which don't report bytes (e.g. `adb pull` subprocess) are estimated from the
+    percent progress and the expected size.
+    """
+
+    def __init__(self, transfer):
+        self.transfer = transfer
+        self.size = transfer.size or 0
+        self.bytes = 0
+        self.started = None
+        self.finished = None
+
+    @property
+    def done(self) -> int:
+        done = max(self.bytes, self.size * self.transfer.progress // 100)
+        return min(done, self.size) if self.size else done
+
+    @property
+    def total(self) -> int:
+        """Expected bytes, estimated from the progress when the size is unknown, 0 before that"""
+        if self.size:
+            return self.size
+        progress = self.transfer.progress
+        return self.done * 100 // progress if 0 < progress < 100 else self.done if self.finished else 0
+
+    def snapshot(self, now: float) -> dict:
+        elapsed = ((self.finished or now) - self.started) if self.started else 0.0
+        rate = self.bytes / elapsed if elapsed > 0 else 0.0
+        total = self.total
+        return {
+            'name': self.transfer.name,
+            'kind': self.transfer.kind,
+            'state': self.transfer.state,
+            'device_id': self.transfer.device_id,
+            'bytes': self.done,
+            'size': total,
+            'progress': self.transfer.progress,
+            'elapsed': elapsed,
+            'rate': rate,
+            'eta': (total - self.done) / rate if rate > 0 and total and not self.finished else None,
+        }
+
+
+class TransferStatistics:
+    """
+    TransferStatistics - bytes over time of the transfer batches, fed by TransferQueue.
+    The batch rate is smoothed exponentially with time constant TAU seconds, the ETA of the
+    batch divides the remaining bytes by it. While sizes of queued transfers are unknown the
+    ETA follows from the average progress instead.
+
+    snapshot() describes the running batch, history() the last finished batches.
+    """
+    __metaclass__ = Singleton
+
+    TAU = 5.0
+    # Shortest interval of a rate sample
+    SAMPLE_MIN = 0.5
+    HISTORY = 100
+
+    lock = threading.Lock()
+    meters = {}
+    started = None
+    rate = 0.0
+    sampled_at = None
+    sampled_bytes = 0
+    batches = deque(maxlen=HISTORY)
+
+    @classmethod
+    def add(cls, transfer):
+        """New transfer of the batch, or one queued again for a retry"""
+        with cls.lock:
+            if not cls.meters:
+                cls.started = time.monotonic()
+                cls.rate = 0.0
+                cls.sampled_at = cls.started
+                cls.sampled_bytes = 0
+            meter = cls.meters.get(transfer)
+            if meter is None:
+                cls.meters[transfer] = TransferMeter(transfer)
+                return
+            # Queued again for a retry, only the bytes of the new attempt count
+            cls.sampled_bytes = max(0, cls.sampled_bytes - meter.bytes)
+            meter.bytes = 0
+            meter.started = None
+            meter.finished = None
+
+    @classmethod
+    def running(cls, transfer):
+        with cls.lock:
+            meter = cls.meters.get(transfer)
+            if meter and meter.started is None:
+                meter.started = time.monotonic()
+
+    @classmethod
+    def count(cls, transfer, size: int):
+        # Called from the transfer threads for every chunk
+        meter = cls.meters.get(transfer)
+        if meter:
+            meter.bytes += size
+
+    @classmethod
+    def finished(cls, transfer):
+        with cls.lock:
+            meter = cls.meters.get(transfer)
+            if meter:
+                meter.finished = time.monotonic()
+
+    @classmethod
+    def batch_finished(cls):
+        with cls.lock:
+            if not cls.meters:
+                return
+            summary = cls.__snapshot(time.monotonic())
+            del summary['transfers']
+            cls.batches.append(summary)
+            cls.meters = {}
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        """
+        {'files', 'files_done', 'bytes', 'size', 'elapsed', 'rate', 'average_rate', 'eta', 'progress',
+         'failed', 'cancelled', 'transfers': [per transfer dict]}, None when nothing is queued.
+        Bytes in bytes, times in seconds, rates in bytes per second, eta None while unknown.
+        """
+        with cls.lock:
+            if not cls.meters:
+                return None
+            return cls.__snapshot(time.monotonic())
+
+    @classmethod
+    def history(cls) -> list:
+        """Summaries of the last finished batches, oldest first"""
+        with cls.lock:
+            return list(cls.batches)
+
+    @classmethod
+    def __snapshot(cls, now: float) -> dict:
+        # Called with the lock held
+        meters = list(cls.meters.values())
+        moved = sum(meter.bytes for meter in meters)
+        interval = now - cls.sampled_at
+        if interval >= cls.SAMPLE_MIN:
+            sample = (moved - cls.sampled_bytes) / interval
+            weight = 1 - math.exp(-interval / cls.TAU)
+            cls.rate = sample if cls.sampled_bytes == 0 else cls.rate + weight * (sample - cls.rate)
+            cls.sampled_at = now
+            cls.sampled_bytes = moved
+
+        done = sum(meter.done for meter in meters)
+        size = sum(meter.total for meter in meters)
+        finished = [meter for meter in meters if meter.finished]
+        progress = sum(meter.transfer.progress for meter in meters) / len(meters)
+        elapsed = now - cls.started
+
+        eta = None
+        if len(finished) < len(meters):
+            if all(meter.size or meter.finished for meter in meters) and cls.rate > 0:
+                eta = max(size - done, 0) / cls.rate
+            elif 0 < progress < 100:
+                eta = elapsed * (100 - progress) / progress
+        return {
+            'files': len(meters),
+            'files_done': len(finished),
+            'bytes': done,
+            'size': size,
+            'elapsed': elapsed,
+            'rate': cls.rate,
+            'average_rate': moved / elapsed if elapsed > 0 else 0.0,
+            'eta': eta,
+            'progress': progress,
+            'failed': len([meter for meter in finished if meter.transfer.error and not meter.transfer.token.cancelled]),
+            'cancelled': len([meter for meter in finished if meter.transfer.token.cancelled]),
+            'transfers': [meter.snapshot(now) for meter in meters],
+        }
@@ -0,0 +1,304 @@
+# ADB File Explorer
+# Copyright (C) 2025  aakbar5
+
+import functools
+import heapq
+import itertools
+import logging
+import threading
+from contextlib import contextmanager
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import QObject
+
+from app.core.bandwidth import Bandwidth
+from app.core.executor import Executor
+from app.core.settings import SettingsOptions, Settings
+from app.core.statistics import TransferStatistics
+from app.helpers.singleton import Singleton
+from app.helpers.tools import Cancelled, CancellationToken
+
+
+class TransferType:
+    DOWNLOAD = 'Download'
+    UPLOAD = 'Upload'
+    SYNC = 'Sync'
+
+
+class TransferState:
+    QUEUED = 'Queued'
+    RUNNING = 'Running'
+    DONE = 'Done'
+    FAILED = 'Failed'
+    CANCELLED = 'Cancelled'
+
+
+class Transfer:
+    """
+    Transfer - one queued repository call, e.g. FileRepository.download.
+    The repository method is called as method(progress_callback, *arguments) and returns (data, error).
+
+    Keyword arguments:
+    name -- shown in progress notifications
+    kind -- TransferType
+    method -- repository method
+    arguments -- tuple of arguments after the progress callback
+    device_id -- transfers of one device share its parallel streams
+    priority -- lower values start first, FIFO within the same priority (default 0)
+    callback -- callable function on GUI thread, params: (data, error) -> None (default None)
+    refresh -- refresh file listing after the batch (default False)
+    max_retries -- failed attempts retried automatically with exponential backoff (default 0)
+    size -- expected bytes for statistics, 0 when unknown (default 0)
+    """
+
+    def __init__(self, **kwargs):
+        self.name = kwargs.get("name")
+        self.kind = kwargs.get("kind") or TransferType.DOWNLOAD
+        self.method = kwargs.get("method")
+        self.arguments = kwargs.get("arguments") or ()
+        self.device_id = kwargs.get("device_id")
+        self.priority = kwargs.get("priority") or 0
+        self.callback = kwargs.get("callback")
+        self.refresh = kwargs.get("refresh") or False
+        self.max_retries = kwargs.get("max_retries") or 0
+        self.size = kwargs.get("size") or 0
+
+        self.state = TransferState.QUEUED
+        self.progress = 0
+        self.retries = 0
+        self.data = None
+        self.error = None
+        self.token = CancellationToken()
+
+
+class TransferSignals(QObject):
+    started = QtCore.pyqtSignal()  # New batch
+    progress = QtCore.pyqtSignal(str, int)  # Current transfer name, batch progress
+    finished = QtCore.pyqtSignal(object)  # Transfer
+    batch_finished = QtCore.pyqtSignal(object)  # List of transfers of the batch
+
+
+class TransferQueue:
+    """
+    Transfer scheduler
+    Runs queued transfers with a bounded number of parallel streams per device.
+    A batch lasts from the first queued transfer until the queue drains.
+    Interactive requests go first: transfers pause between chunks and only one per device
+    is started while one is pending.
+    """
+    __metaclass__ = Singleton
+    signals = TransferSignals()
+
+    lock = threading.Lock()
+    queue = []
+    batch = []
+    # Failed transfers of the last finished batch, retry_failed() queues them again
+    failed = []
+    running = {}
+    paused = False
+    sequence = itertools.count()
+    last_progress = -1
+    # Transfers waiting for their retry delay
+    delayed = 0
+    # (signal, arguments) to emit once the lock is released, slots may call back into the queue
+    emits = []
+    RETRY_DELAY = 2
+    RETRY_DELAY_MAX = 60
+
+    @classmethod
+    @contextmanager
+    def __locked(cls):
+        with cls.lock:
+            yield
+            emits, cls.emits = cls.emits, []
+        for signal, arguments in emits:
+            signal.emit(*arguments)
+
+    @classmethod
+    def __emit(cls, signal, *arguments):
+        # Called with the lock held
+        cls.emits.append((signal, arguments))
+
+    @classmethod
+    def add(cls, transfer: Transfer):
+        with cls.__locked():
+            if not cls.batch:
+                cls.last_progress = -1
+                cls.__emit(cls.signals.started)
+            cls.batch.append(transfer)
+            TransferStatistics.add(transfer)
+            heapq.heappush(cls.queue, (transfer.priority, next(cls.sequence), transfer))
+            cls.__dispatch()
+
+    @classmethod
+    def pause(cls):
+        with cls.lock:
+            cls.paused = True
+
+    @classmethod
+    def resume(cls):
+        with cls.lock:
+            cls.paused = False
+            cls.__dispatch()
+
+    @classmethod
+    def retry_failed(cls) -> int:
+        with cls.__locked():
+            failed = [t for t in cls.batch if t.state == TransferState.FAILED]
+            failed += [t for t in cls.failed if t.state == TransferState.FAILED and t not in failed]
+            cls.failed = []
+            if failed and not cls.batch:
+                cls.last_progress = -1
+                cls.__emit(cls.signals.started)
+            for transfer in failed:
+                if transfer not in cls.batch:
+                    cls.batch.append(transfer)
+                transfer.retries = 0
+                transfer.state = TransferState.QUEUED
+                transfer.progress = 0
+                transfer.error = None
+                TransferStatistics.add(transfer)
+                heapq.heappush(cls.queue, (transfer.priority, next(cls.sequence), transfer))
+            cls.__dispatch()
+            return len(failed)
+
+    @classmethod
+    def cancel_all(cls) -> int:
+        """Drops the queued transfers and interrupts the running ones, returns the number of cancelled transfers"""
+        with cls.__locked():
+            active = [t for t in cls.batch if t.state in (TransferState.QUEUED, TransferState.RUNNING)]
+            for transfer in active:
+                transfer.token.cancel()
+            queued = [entry[2] for entry in cls.queue]
+            cls.queue = []
+            for transfer in queued:
+                cls.__cancelled(transfer)
+            cls.__drained()
+        if queued:
+            cls.__progress(queued[-1].name)
+        return len(active)
+
+    @classmethod
+    def pending(cls) -> int:
+        with cls.lock:
+            return len([t for t in cls.batch if t.state in (TransferState.QUEUED, TransferState.RUNNING)])
+
+    @classmethod
+    def __dispatch(cls):
+        # Called with the lock held
+        if cls.paused:
+            return
+
+        parallel = max(1, Settings.get_value(SettingsOptions.TRANSFER_PARALLEL))
+        if Executor.interactive_pending():
+            parallel = 1
+        waiting = []
+        while cls.queue:
+            entry = heapq.heappop(cls.queue)
+            transfer = entry[2]
+            if cls.running.get(transfer.device_id, 0) >= parallel:
+                waiting.append(entry)
+                continue
+            cls.running[transfer.device_id] = cls.running.get(transfer.device_id, 0) + 1
+            transfer.state = TransferState.RUNNING
+            Executor.submit(Executor.BULK, cls.__run, transfer)
+        for entry in waiting:
+            heapq.heappush(cls.queue, entry)
+
+    @classmethod
+    def __run(cls, transfer: Transfer):
+        def progress_callback(path: str, progress: int):
+            transfer.token.check()
+            Executor.yield_to_interactive()
+            transfer.token.check()
+            transfer.progress = progress
+            cls.__progress(path)
+
+        TransferStatistics.running(transfer)
+        counter = functools.partial(TransferStatistics.count, transfer)
+        with transfer.token.activate(), Bandwidth.transfer(transfer.device_id, counter):
+            try:
+                data, error = transfer.method(progress_callback, *transfer.arguments)
+            except Cancelled:
+                data, error = None, CancellationToken.MESSAGE
+            except BaseException as error:
+                logging.exception("Unexpected error=%s, type(error)=%s", error, type(error))
+                data, error = None, str(error)
+
+        with cls.__locked():
+            cls.running[transfer.device_id] -= 1
+            if transfer.token.cancelled:
+                cls.__cancelled(transfer)
+            elif error and transfer.retries < transfer.max_retries:
+                # e.g. cable hiccup, resumable transfers continue where they stopped
+                transfer.retries += 1
+                transfer.state = TransferState.QUEUED
+                TransferStatistics.add(transfer)
+                delay = min(cls.RETRY_DELAY * 2 ** (transfer.retries - 1), cls.RETRY_DELAY_MAX)
+                logging.warning("Transfer %s failed (%s), retry %d in %ds", transfer.name, error, transfer.retries, delay)
+                cls.delayed += 1
+                timer = threading.Timer(delay, cls.__requeue, args=(transfer,))
+                timer.daemon = True
+                timer.start()
+            else:
+                transfer.data = data
+                transfer.error = error
+                transfer.progress = 100
+                transfer.state = TransferState.FAILED if error else TransferState.DONE
+                TransferStatistics.finished(transfer)
+                cls.__emit(cls.signals.finished, transfer)
+
+            cls.__dispatch()
+            cls.__drained()
+        cls.__progress(transfer.name)
+
+    @classmethod
+    def __requeue(cls, transfer: Transfer):
+        with cls.__locked():
+            cls.delayed -= 1
+            if transfer.token.cancelled:
+                cls.__cancelled(transfer)
+                cls.__drained()
+                return
+            heapq.heappush(cls.queue, (transfer.priority, next(cls.sequence), transfer))
+            cls.__dispatch()
+
+    @classmethod
+    def interactive_idle(cls):
+        # Starts the transfers held back while interactive requests were pending
+        with cls.lock:
+            cls.__dispatch()
+
+    @classmethod
+    def __cancelled(cls, transfer: Transfer):
+        # Called with the lock held
+        transfer.data = None
+        transfer.error = CancellationToken.MESSAGE
+        transfer.progress = 100
+        transfer.state = TransferState.CANCELLED
+        TransferStatistics.finished(transfer)
+        cls.__emit(cls.signals.finished, transfer)
+
+    @classmethod
+    def __drained(cls):
+        # Called with the lock held, ends the batch once nothing is queued, waiting or running
+        if cls.batch and not cls.queue and not cls.delayed and not any(cls.running.values()):
+            batch = cls.batch
+            cls.batch = []
+            cls.failed = [t for t in batch if t.state == TransferState.FAILED]
+            TransferStatistics.batch_finished()
+            cls.__emit(cls.signals.batch_finished, batch)
+
+    @classmethod
+    def __progress(cls, name: str):
+        batch = cls.batch
+        if not batch:
+            return
+        progress = int(sum(t.progress for t in batch) / len(batch))
+        if progress != cls.last_progress:
+            cls.last_progress = progress
+            done = len([t for t in batch if t.state in (TransferState.DONE, TransferState.FAILED, TransferState.CANCELLED)])
+            cls.signals.progress.emit(f"[{done}/{len(batch)}] {name}", progress)
+
+
+Executor.idle_callbacks.append(TransferQueue.interactive_idle)
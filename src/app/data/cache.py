@@ -0,0 +1,74 @@
+# ADB File Explorer
+# Copyright (C) 2025  aakbar5
+
+import threading
+from collections import OrderedDict
+from typing import List
+
+from app.core.managers import ADBManager
+from app.data.models import File
+
+
+class ListingCache:
+    """
+    ListingCache - LRU cache of directory listings keyed by (device id, normalized path).
+    Bounded by the number of cached listings and by an estimate of their memory use.
+    """
+    MAX_ENTRIES = 64
+    MAX_BYTES = 64 * 1024 * 1024
+    # Rough footprint of one File object with its attribute strings
+    FILE_BYTES = 1024
+
+    entries = OrderedDict()
+    total_bytes = 0
+    lock = threading.Lock()
+
+    @staticmethod
+    def key(device_id: str, path: str) -> tuple:
+        return device_id, ADBManager.normalized_path(path)
+
+    @classmethod
+    def get(cls, device_id: str, path: str) -> List[File]:
+        key = cls.key(device_id, path)
+        with cls.lock:
+            entry = cls.entries.get(key)
+            if entry is None:
+                return None
+            cls.entries.move_to_end(key)
+            return list(entry[0])
+
+    @classmethod
+    def put(cls, device_id: str, path: str, files: List[File]):
+        key = cls.key(device_id, path)
+        size = cls.FILE_BYTES * (len(files) + 1)
+        with cls.lock:
+            cls.__remove(key)
+            if size > cls.MAX_BYTES:
+                return
+            cls.entries[key] = (list(files), size)
+            cls.total_bytes += size
+            while len(cls.entries) > cls.MAX_ENTRIES or cls.total_bytes > cls.MAX_BYTES:
+                _, (_, evicted) = cls.entries.popitem(last=False)
+                cls.total_bytes -= evicted
+
+    @classmethod
+    def invalidate(cls, device_id: str, path: str, recursive: bool = False):
+        key = cls.key(device_id, path)
+        with cls.lock:
+            if not recursive:
+                cls.__remove(key)
+                return
+            for cached in [k for k in cls.entries if k[0] == device_id and k[1].startswith(key[1])]:
+                cls.__remove(cached)
+
+    @classmethod
+    def clear(cls, device_id: str = None):
+        with cls.lock:
+            for cached in [k for k in cls.entries if device_id is None or k[0] == device_id]:
+                cls.__remove(cached)
+
+    @classmethod
+    def __remove(cls, key: tuple):
+        entry = cls.entries.pop(key, None)
+        if entry:
+            cls.total_bytes -= entry[1]
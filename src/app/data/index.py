@@ -0,0 +1,239 @@
+# ADB File Explorer
+# Copyright (C) 2025  aakbar5
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Tuple
+
+from PyQt5.QtCore import QStandardPaths
+
+from app.core.adb import Adb
+from app.data.models import File
+from app.data.repositories import FileRepository
+from app.helpers.converters import convert_to_index_records, convert_index_row_to_file
+from app.services.adb_helper import index_children_script, index_dirs_script, index_script, storage_roots_script
+
+
+class FileIndex:
+    """
+    FileIndex - per device SQLite index of every file below the storage roots, for global search.
+
+    The first update of a storage root streams one recursive listing into the database. Later
+    updates list the directories with their mtime only and re-list the direct children of the
+    directories which changed since the last update. A directory mtime changes when entries are
+    added, removed or renamed, not when a file is modified in place.
+    """
+    SCHEMA_VERSION = 1
+    INSERT_BATCH = 5000
+    # Directories re-listed by one shell command during an incremental update
+    CHILDREN_BATCH = 200
+    SEARCH_LIMIT = 500
+
+    lock = threading.Lock()
+    updating = set()
+
+    @staticmethod
+    def location(device_id: str) -> str:
+        folder = QStandardPaths.writableLocation(QStandardPaths.AppLocalDataLocation) \
+            or os.path.join(os.path.expanduser('~'), '.adbfileexplorer')
+        return os.path.join(folder, 'index', re.sub(r'[^\w.-]', '_', device_id) + '.sqlite')
+
+    @classmethod
+    def connect(cls, device_id: str) -> sqlite3.Connection:
+        path = cls.location(device_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        connection = sqlite3.connect(path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        if connection.execute("PRAGMA user_version").fetchone()[0] != cls.SCHEMA_VERSION:
+            cls.__create(connection)
+        return connection
+
+    @classmethod
+    def __create(cls, connection: sqlite3.Connection):
+        connection.executescript("""
+            DROP TABLE IF EXISTS names;
+            DROP TABLE IF EXISTS files;
+            DROP TABLE IF EXISTS dirs;
+            CREATE TABLE files(
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL UNIQUE,
+                parent TEXT NOT NULL,
+                name TEXT NOT NULL COLLATE NOCASE,
+                size INTEGER,
+                mtime INTEGER,
+                mode INTEGER
+            );
+            CREATE INDEX files_parent ON files(parent);
+            CREATE INDEX files_name ON files(name);
+            CREATE TABLE dirs(path TEXT PRIMARY KEY, mtime INTEGER) WITHOUT ROWID;
+        """)
+        try:
+            # Trigram tokenizer (SQLite >= 3.34) matches any substring of at least 3 characters
+            connection.executescript("""
+                CREATE VIRTUAL TABLE names USING fts5(name, content='files', content_rowid='id', tokenize='trigram');
+                CREATE TRIGGER files_insert AFTER INSERT ON files BEGIN
+                    INSERT INTO names(rowid, name) VALUES (new.id, new.name);
+                END;
+                CREATE TRIGGER files_delete AFTER DELETE ON files BEGIN
+                    INSERT INTO names(names, rowid, name) VALUES ('delete', old.id, old.name);
+                END;
+            """)
+        except sqlite3.OperationalError as error:
+            logging.warning("Full text search not available, falling back to LIKE: %s", error)
+        connection.execute(f"PRAGMA user_version={cls.SCHEMA_VERSION}")
+        connection.commit()
+
+    @staticmethod
+    def has_fts(connection: sqlite3.Connection) -> bool:
+        return connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'names'").fetchone() is not None
+
+    @staticmethod
+    def __subtree(root: str) -> Tuple[str, str]:
+        # Bounds of the paths below `root`, '0' sorts right after '/'
+        return root + '/', root + '0'
+
+    @classmethod
+    def update(cls) -> Tuple[str, str]:
+        device = Adb.manager().get_device()
+        if not device:
+            return None, "No device selected!"
+
+        with cls.lock:
+            if device.id in cls.updating:
+                return None, "Index update is already running"
+            cls.updating.add(device.id)
+
+        start = time.monotonic()
+        try:
+            roots, error = cls.__lines(storage_roots_script())
+            if error:
+                return None, error
+            connection = cls.connect(device.id)
+            try:
+                for root in dict.fromkeys(root.rstrip('/') for root in roots if root.startswith('/')):
+                    error = cls.__update_root(connection, root)
+                    if error:
+                        return None, error
+                count = connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            finally:
+                connection.close()
+        except sqlite3.Error as error:
+            logging.exception("Index update failed: %s", error)
+            return None, f"Index update failed: {error}"
+        finally:
+            with cls.lock:
+                cls.updating.discard(device.id)
+        return f"Indexed {count} files in {time.monotonic() - start:.1f}s", None
+
+    @classmethod
+    def __update_root(cls, connection: sqlite3.Connection, root: str) -> str:
+        lower, upper = cls.__subtree(root)
+        stored = dict(connection.execute(
+            "SELECT path, mtime FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (root, lower, upper)
+        ))
+
+        lines, error = cls.__lines(index_dirs_script(root))
+        if error:
+            return error
+        current = {}
+        for line in lines:
+            mtime, _, path = line.partition('/')
+            if mtime.isdigit() and path.startswith('/'):
+                current[path.rstrip('/') or '/'] = int(mtime)
+        if not current:
+            logging.warning("Index: %s is empty or not readable", root)
+
+        if not stored:
+            connection.execute("DELETE FROM files WHERE path >= ? AND path < ?", (lower, upper))
+            error = cls.__insert(connection, index_script(root))
+            if error:
+                return error
+        else:
+            for path in stored.keys() - current.keys():
+                connection.execute("DELETE FROM files WHERE path = ? OR parent = ?", (path, path))
+            changed = [path for path, mtime in current.items() if stored.get(path) != mtime]
+            for path in changed:
+                connection.execute("DELETE FROM files WHERE parent = ?", (path,))
+            for start in range(0, len(changed), cls.CHILDREN_BATCH):
+                error = cls.__insert(connection, index_children_script(changed[start:start + cls.CHILDREN_BATCH]))
+                if error:
+                    return error
+            logging.info("Index: %s, %d of %d directories changed", root, len(changed), len(current))
+
+        connection.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (root, lower, upper))
+        connection.executemany("INSERT OR REPLACE INTO dirs(path, mtime) VALUES (?, ?)", current.items())
+        connection.commit()
+        return None
+
+    @classmethod
+    def __insert(cls, connection: sqlite3.Connection, command: str) -> str:
+        lines, error = cls.__lines(command)
+        if error:
+            return error
+        records = convert_to_index_records(lines)
+        while True:
+            batch = [record for _, record in zip(range(cls.INSERT_BATCH), records)]
+            if not batch:
+                return None
+            connection.executemany(
+                "INSERT OR IGNORE INTO files(path, parent, name, size, mtime, mode) VALUES (?, ?, ?, ?, ?, ?)", batch
+            )
+
+    @staticmethod
+    def __lines(command: str):
+        stream, error = FileRepository.stream_lines(command)
+        if error or stream is None:
+            return None, error or "Listing failed"
+        return (line.rstrip('\n') for line in stream), None
+
+    @classmethod
+    def search(cls, text: str, limit: int = SEARCH_LIMIT) -> Tuple[List[File], str]:
+        """
+        Searches the names in the index of the current device, case-insensitive.
+        'abc*' matches names starting with 'abc', anything else matches names containing the text.
+        """
+        device = Adb.manager().get_device()
+        if not device:
+            return None, "No device selected!"
+        if not os.path.exists(cls.location(device.id)):
+            return None, "The device is not indexed yet, enable global search first"
+
+        text = text.strip()
+        if not text.strip('*'):
+            return [], None
+
+        columns = "SELECT path, name, size, mtime, mode FROM files"
+        try:
+            connection = cls.connect(device.id)
+            try:
+                if text.endswith('*'):
+                    pattern = cls.__escape(text.rstrip('*')) + '%'
+                    rows = connection.execute(
+                        f"{columns} WHERE name LIKE ? ESCAPE '\\' ORDER BY name LIMIT ?", (pattern, limit)
+                    )
+                elif len(text) >= 3 and cls.has_fts(connection):
+                    phrase = '"' + text.replace('"', '""') + '"'
+                    rows = connection.execute(
+                        f"{columns} WHERE id IN (SELECT rowid FROM names WHERE names MATCH ? LIMIT ?) ORDER BY name",
+                        (phrase, limit)
+                    )
+                else:
+                    pattern = '%' + cls.__escape(text) + '%'
+                    rows = connection.execute(
+                        f"{columns} WHERE name LIKE ? ESCAPE '\\' ORDER BY name LIMIT ?", (pattern, limit)
+                    )
+                return [convert_index_row_to_file(row) for row in rows], None
+            finally:
+                connection.close()
+        except sqlite3.Error as error:
+            logging.exception("Index search failed: %s", error)
+            return None, f"Index search failed: {error}"
+
+    @staticmethod
+    def __escape(text: str) -> str:
+        return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
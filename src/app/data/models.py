@@ -3,8 +3,10 @@
 
 import datetime
 import posixpath
+import sys
 
 from app.core.settings import SettingsOptions, Settings
+from app.helpers.lookup import MimeTypesLookUp
 
 size_types = (
     ('BYTE', 'B'),
@@ -24,6 +26,17 @@ file_types = (
     ('p', 'FIFO')
 )
 
+file_type_codes = dict(file_types)
+
+
+def _text(value) -> str:
+    return None if value is None else str(value)
+
+
+def _interned(value) -> str:
+    return None if value is None else sys.intern(str(value))
+
+
 months = (
     ('NONE', 'None', 'None'),
     ('JANUARY', 'Jan.', 'January'),
@@ -51,21 +64,50 @@ days = (
 )
 
 
+class DisplayFormat:
+    """
+    DisplayFormat - what the display strings of a File depend on, read once instead of per cell.
+    Strings cached under an older generation are stale, invalidate() runs when the date format
+    preference changes and at midnight, when informal dates like 'Yesterday' roll over.
+    """
+    generation = 0
+    date_format = None
+    now = None
+
+    @classmethod
+    def invalidate(cls):
+        cls.generation += 1
+        cls.date_format = Settings.get_value(SettingsOptions.FILE_DATE_FORMAT)
+        cls.now = datetime.datetime.now()
+
+
 class File:
+    """
+    File - one listing entry. Large folders hold many of these, so there is no per-instance
+    __dict__, repeated strings (owner, group, permissions) are interned and the type is
+    decoded once from the permissions. Missing attributes are None.
+    """
+    __slots__ = ('name', 'owner', 'group', 'other', 'path', 'link', 'link_type', 'file_type',
+                 'permissions', 'raw_size', 'raw_date', 'type', 'isdir', 'display')
+
     def __init__(self, **kwargs):
-        self.name = str(kwargs.get("name"))
-        self.owner = str(kwargs.get("owner"))
-        self.group = str(kwargs.get("group"))
-        self.other = str(kwargs.get("other"))
-        self.path = str(kwargs.get("path"))
-        self.link = str(kwargs.get("link"))
-        self.link_type = str(kwargs.get("link_type"))
-        self.file_type = str(kwargs.get("file_type"))
-        self.permissions = str(kwargs.get("permissions"))
+        self.name = _text(kwargs.get("name"))
+        self.owner = _interned(kwargs.get("owner"))
+        self.group = _interned(kwargs.get("group"))
+        self.other = _interned(kwargs.get("other"))
+        self.path = _text(kwargs.get("path"))
+        self.link = _text(kwargs.get("link"))
+        self.link_type = _interned(kwargs.get("link_type"))
+        self.file_type = _interned(kwargs.get("file_type"))
+        self.permissions = _interned(kwargs.get("permissions"))
 
         self.raw_size = kwargs.get("size") or 0
         self.raw_date = kwargs.get("date_time")
 
+        self.type = file_type_codes.get(self.permissions[:1] if self.permissions else None, 'Unknown')
+        self.isdir = self.type == 'Directory'
+        self.display = None
+
     def __str__(self):
         return f"{self.type} '{self.name}' (at '{self.location}')"
 
@@ -89,7 +131,9 @@ class File:
         # An object of <class 'datetime.datetime'>
         created = self.raw_date
 
-        date_fmt_type = Settings.get_value(SettingsOptions.FILE_DATE_FORMAT)
+        if DisplayFormat.now is None:
+            DisplayFormat.invalidate()
+        date_fmt_type = DisplayFormat.date_format
         if date_fmt_type == 'ISO':
             return str(created.isoformat())
 
@@ -102,7 +146,7 @@ class File:
             return str(created.strftime(fmt))
 
         # Default is informal
-        now = datetime.datetime.now()
+        now = DisplayFormat.now
         if created.year < now.year:
             return f'{created.day} {months[created.month][1]} {created.year}'
         if created.month < now.month:
@@ -116,19 +160,23 @@ class File:
         return str(created.time())[:-3]
 
     @property
-    def location(self):
-        return posixpath.dirname(self.path or '') + '/'
-
-    @property
-    def type(self):
-        for ft in file_types:
-            if self.permissions and self.permissions[0] == ft[0]:
-                return ft[1]
-        return 'Unknown'
+    def mime_type(self):
+        if self.type == 'File':
+            return MimeTypesLookUp.get(posixpath.splitext(self.name or '')[1], "")
+        return ""
+
+    def strings(self) -> tuple:
+        """(size, date, mime type) as displayed, computed on first use and kept until DisplayFormat changes"""
+        display = self.display
+        if display is None or display[0] != DisplayFormat.generation:
+            if DisplayFormat.now is None:
+                DisplayFormat.invalidate()
+            display = self.display = (DisplayFormat.generation, self.size, self.date, self.mime_type)
+        return display
 
     @property
-    def isdir(self):
-        return self.type in (FileType.DIRECTORY, FileType.DIRECTORY)
+    def location(self):
+        return posixpath.dirname(self.path or '') + '/'
 
 
 class FileType:
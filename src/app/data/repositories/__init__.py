@@ -1,20 +1,56 @@
 # ADB File Explorer
 # Copyright (C) 2022  Azat Aldeshov
 
-from typing import List, Tuple
+import io
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
 
 from app.core.adb import Adb
+from app.data.cache import ListingCache
 from app.data.models import Device, File
 from app.data.repositories import android_adb, python_adb
 
 
 class FileRepository:
+    @staticmethod
+    def invalidate(path: str, recursive: bool = False):
+        device = Adb.manager().get_device()
+        if device:
+            ListingCache.invalidate(device.id, path, recursive)
+
+    @classmethod
+    @contextmanager
+    def invalidating(cls, *paths: str, tree: str = None):
+        """
+        Drops the cached listings of paths and of everything under tree around a mutation.
+        Again after it, a listing revalidated meanwhile would put the old entries back.
+        """
+        def invalidate():
+            for path in paths:
+                cls.invalidate(path)
+            if tree:
+                cls.invalidate(tree, recursive=True)
+
+        invalidate()
+        try:
+            yield
+        finally:
+            invalidate()
+
+    @classmethod
+    def cached_files(cls) -> List[File]:
+        device = Adb.manager().get_device()
+        if not device:
+            return None
+        return ListingCache.get(device.id, Adb.manager().get_current_path())
+
     @classmethod
     def capture_screenshot(cls) -> Tuple[str, str]:
-        if Adb.core == Adb.PYTHON_ADB_SHELL:
-            return python_adb.FileRepository.capture_screenshot()
-        if Adb.core == Adb.EXTERNAL_TOOL_ADB:
-            return android_adb.FileRepository.capture_screenshot()
+        with cls.invalidating('/sdcard/Download/'):
+            if Adb.core == Adb.PYTHON_ADB_SHELL:
+                return python_adb.FileRepository.capture_screenshot()
+            if Adb.core == Adb.EXTERNAL_TOOL_ADB:
+                return android_adb.FileRepository.capture_screenshot()
         return None
 
     @classmethod
@@ -33,6 +69,30 @@ class FileRepository:
             return android_adb.FileRepository.is_android_root()
         return None
 
+    @classmethod
+    def device_status(cls, commands: Dict[str, str]) -> Tuple[Dict[str, str], str]:
+        if Adb.core == Adb.PYTHON_ADB_SHELL:
+            return python_adb.FileRepository.device_status(commands)
+        if Adb.core == Adb.EXTERNAL_TOOL_ADB:
+            return android_adb.FileRepository.device_status(commands)
+        return None, None
+
+    @classmethod
+    def device_info(cls) -> Tuple[Dict[str, str], str]:
+        if Adb.core == Adb.PYTHON_ADB_SHELL:
+            return python_adb.FileRepository.device_info()
+        if Adb.core == Adb.EXTERNAL_TOOL_ADB:
+            return android_adb.FileRepository.device_info()
+        return None, None
+
+    @classmethod
+    def stat_many(cls, paths: List[str]) -> Tuple[Dict[str, File], str]:
+        if Adb.core == Adb.PYTHON_ADB_SHELL:
+            return python_adb.FileRepository.stat_many(paths)
+        if Adb.core == Adb.EXTERNAL_TOOL_ADB:
+            return android_adb.FileRepository.stat_many(paths)
+        return None, None
+
     @classmethod
     def android_version(cls) -> Tuple[str, str]:
         if Adb.core == Adb.PYTHON_ADB_SHELL:
@@ -50,19 +110,51 @@ class FileRepository:
         return None
 
     @classmethod
-    def files(cls) -> Tuple[List[File], str]:
+    def files(cls, partial_callback: callable = None) -> Tuple[List[File], str]:
+        """partial_callback: (files) -> None, gets the entries in batches while the listing runs"""
+        device = Adb.manager().get_device()
+        path = Adb.manager().get_current_path()
+        response = None
+        if Adb.core == Adb.PYTHON_ADB_SHELL:
+            response = python_adb.FileRepository.files()
+        if Adb.core == Adb.EXTERNAL_TOOL_ADB:
+            response = android_adb.FileRepository.files(partial_callback)
+
+        if device and response and response[0] is not None and not response[1]:
+            ListingCache.put(device.id, path, response[0])
+        return response
+
+    @classmethod
+    def tree(cls, path: str) -> Tuple[Dict[str, Tuple[int, int]], str]:
+        if Adb.core == Adb.PYTHON_ADB_SHELL:
+            return python_adb.FileRepository.tree(path)
+        if Adb.core == Adb.EXTERNAL_TOOL_ADB:
+            return android_adb.FileRepository.tree(path)
+        return None
+
+    @classmethod
+    def stream_lines(cls, command: str) -> Tuple[io.TextIOBase, str]:
         if Adb.core == Adb.PYTHON_ADB_SHELL:
-            return python_adb.FileRepository.files()
+            return python_adb.FileRepository.stream_lines(command)
         if Adb.core == Adb.EXTERNAL_TOOL_ADB:
-            return android_adb.FileRepository.files()
+            return android_adb.FileRepository.stream_lines(command)
         return None
 
     @classmethod
-    def rename(cls, file: File, name: str) -> Tuple[str, str]:
+    def checksums(cls, path: str, names: list) -> Tuple[Dict[str, str], str]:
         if Adb.core == Adb.PYTHON_ADB_SHELL:
-            return python_adb.FileRepository.rename(file, name)
+            return python_adb.FileRepository.checksums(path, names)
         if Adb.core == Adb.EXTERNAL_TOOL_ADB:
-            return android_adb.FileRepository.rename(file, name)
+            return android_adb.FileRepository.checksums(path, names)
+        return None
+
+    @classmethod
+    def rename(cls, file: File, name: str) -> Tuple[str, str]:
+        with cls.invalidating(file.location, tree=file.path if file.isdir else None):
+            if Adb.core == Adb.PYTHON_ADB_SHELL:
+                return python_adb.FileRepository.rename(file, name)
+            if Adb.core == Adb.EXTERNAL_TOOL_ADB:
+                return android_adb.FileRepository.rename(file, name)
         return None
 
     @classmethod
@@ -75,50 +167,61 @@ class FileRepository:
 
     @classmethod
     def delete(cls, file: File) -> Tuple[str, str]:
-        if Adb.core == Adb.PYTHON_ADB_SHELL:
-            return python_adb.FileRepository.delete(file)
-        if Adb.core == Adb.EXTERNAL_TOOL_ADB:
-            return android_adb.FileRepository.delete(file)
+        with cls.invalidating(file.location, tree=file.path if file.isdir else None):
+            if Adb.core == Adb.PYTHON_ADB_SHELL:
+                return python_adb.FileRepository.delete(file)
+            if Adb.core == Adb.EXTERNAL_TOOL_ADB:
+                return android_adb.FileRepository.delete(file)
         return None
 
     @classmethod
     def download(cls, progress_callback: callable, source: File, destination: str, delete_too: bool) -> Tuple[str, str]:
-        if Adb.core == Adb.PYTHON_ADB_SHELL:
-            return python_adb.FileRepository.download(
-                progress_callback=progress_callback,
-                source=source,
-                destination=destination,
-                delete_too=delete_too
-            )
-        if Adb.core == Adb.EXTERNAL_TOOL_ADB:
-            return android_adb.FileRepository.download(
-                progress_callback=progress_callback,
-                source=source,
-                destination=destination,
-                delete_too=delete_too
-            )
+        paths = (source.location,) if delete_too else ()
+        with cls.invalidating(*paths, tree=source.path if delete_too else None):
+            if Adb.core == Adb.PYTHON_ADB_SHELL:
+                return python_adb.FileRepository.download(
+                    progress_callback=progress_callback,
+                    source=source,
+                    destination=destination,
+                    delete_too=delete_too
+                )
+            if Adb.core == Adb.EXTERNAL_TOOL_ADB:
+                return android_adb.FileRepository.download(
+                    progress_callback=progress_callback,
+                    source=source,
+                    destination=destination,
+                    delete_too=delete_too
+                )
         return None
 
     @classmethod
     def new_folder(cls, name) -> Tuple[str, str]:
-        if Adb.core == Adb.PYTHON_ADB_SHELL:
-            return python_adb.FileRepository.new_folder(name=name)
-        if Adb.core == Adb.EXTERNAL_TOOL_ADB:
-            return android_adb.FileRepository.new_folder(name=name)
+        with cls.invalidating(Adb.manager().get_current_path()):
+            if Adb.core == Adb.PYTHON_ADB_SHELL:
+                return python_adb.FileRepository.new_folder(name=name)
+            if Adb.core == Adb.EXTERNAL_TOOL_ADB:
+                return android_adb.FileRepository.new_folder(name=name)
         return None
 
     @classmethod
-    def upload(cls, progress_callback: callable, source: str) -> Tuple[str, str]:
-        if Adb.core == Adb.PYTHON_ADB_SHELL:
-            return python_adb.FileRepository.upload(
-                progress_callback=progress_callback,
-                source=source
-            )
-        if Adb.core == Adb.EXTERNAL_TOOL_ADB:
-            return android_adb.FileRepository.upload(
-                progress_callback=progress_callback,
-                source=source
-            )
+    def upload(cls, progress_callback: callable, source: str, destination: str = None, bulk: bool = None) -> Tuple[str, str]:
+        # bulk: True streams directories as one tar archive, False pushes file by file, None picks by file count
+        destination = destination or Adb.manager().get_current_path()
+        with cls.invalidating(tree=destination):
+            if Adb.core == Adb.PYTHON_ADB_SHELL:
+                return python_adb.FileRepository.upload(
+                    progress_callback=progress_callback,
+                    source=source,
+                    destination=destination,
+                    bulk=bulk
+                )
+            if Adb.core == Adb.EXTERNAL_TOOL_ADB:
+                return android_adb.FileRepository.upload(
+                    progress_callback=progress_callback,
+                    source=source,
+                    destination=destination,
+                    bulk=bulk
+                )
         return None
 
 class DeviceRepository:
@@ -2,17 +2,31 @@
 # Copyright (C) 2022  Azat Aldeshov
 
 from datetime import datetime
-from typing import List, Tuple
+from typing import Dict, List, Tuple
+import io
+import logging
+import os
 import shlex
+import tarfile
 
+from app.core.bandwidth import Bandwidth
 from app.core.managers import ADBManager
 from app.core.settings import SettingsOptions, Settings
 from app.data.models import FileType, Device, File
-from app.helpers.converters import convert_to_devices, convert_to_file, convert_to_file_list_a
+from app.helpers.archives import BULK_MIN_FILES, EmptyArchiveError, extract_stream, scan_tree, use_bulk, write_stream
+from app.helpers.converters import FileListParser, convert_to_devices, convert_to_file, convert_to_file_list_a, \
+    convert_to_file_list_c, convert_to_tree_size, convert_to_tree, convert_to_checksums, convert_to_status
+from app.helpers.resume import RESUME_MIN_SIZE, CHUNK_SIZE, PartialDownload, remove_partial, upload_part_name
+from app.helpers.tools import BatchCallback, Cancelled, CancellationToken
 from app.services import adb_helper
 
 
 class FileRepository:
+    # Devices without `stat -c` (pre-toybox) are listed by parsing `ls -l`
+    stat_listing = {}
+    # Devices with tar can receive directories as one archive stream
+    tar_support = {}
+
     @classmethod
     def capture_screenshot(cls) -> Tuple[str, str]:
         # print(f"android_adb: capture_screenshot")
@@ -64,6 +78,17 @@ class FileRepository:
         is_root = response.output_data.find("uid=0(root)")
         return is_root, None
 
+    @classmethod
+    def device_status(cls, commands: Dict[str, str]) -> Tuple[Dict[str, str], str]:
+        """Runs every command of {name: command} in one round-trip, returns {name: first output line}"""
+        if not ADBManager.get_device():
+            return None, "No device selected!"
+
+        response = adb_helper.status(ADBManager.get_device().id, commands)
+        if not response.is_okay:
+            return None, response.error_data or response.output_data
+        return convert_to_status(response.output_data, commands), None
+
     @classmethod
     def android_version(cls) -> Tuple[str, str]:
         # print(f"android_adb: android_version")
@@ -85,31 +110,108 @@ class FileRepository:
 
         # TODO: Do we really need to chage current path
         path = ADBManager.set_current_path(path)
-        args = adb_helper.ShellCommand.LS_LIST_DIRS + [shlex.quote(path)]
-        response = adb_helper.shell(ADBManager.get_device().id, args)
-        if not response.is_okay:
-            return None, response.error_data or response.output_data
-        file = convert_to_file(response.output_data.strip())
-        if not file:
-            return None, f"Unexpected string:\n{response.output_data}"
-
-        if file.type == FileType.LINK:
-            args = adb_helper.ShellCommand.LS_LIST_DIRS + [shlex.quote(path) + '/']
-            response = adb_helper.shell(ADBManager.get_device().id, args)
-            file.link_type = FileType.UNKNOWN
-            if response.output_data and response.output_data.startswith('d'):
-                file.link_type = FileType.DIRECTORY
-            elif response.output_data and 'Not a' in response.output_data:
-                file.link_type = FileType.FILE
-        file.path = path
-        return file, response.error_data
-
-    @classmethod
-    def files(cls) -> Tuple[List[File], str]:
+        files, error = cls.stat_many([path])
+        if not files:
+            return None, error
+        return files[path], None
+
+    @classmethod
+    def stat_many(cls, paths: List[str]) -> Tuple[Dict[str, File], str]:
+        """Entries of `paths` by one round-trip, {path: File}, paths which failed are reported in the error"""
+        if not ADBManager.get_device():
+            return None, "No device selected!"
+
+        device_id = ADBManager.get_device().id
+        files = {}
+        errors = []
+        fallback = paths
+        if cls.stat_listing.get(device_id, True):
+            fallback = []
+            responses = adb_helper.batch(device_id, [adb_helper.stat_file_script(path) for path in paths])
+            for path, response in zip(paths, responses):
+                if response.exit_code == adb_helper.ShellCommand.STAT_NOT_SUPPORTED:
+                    cls.stat_listing[device_id] = False
+                    fallback.append(path)
+                    continue
+                entries = convert_to_file_list_c(response.output_data, path) if response.is_okay else None
+                if not entries:
+                    errors.append(response.error_data or f"{path}: No such file or directory")
+                    continue
+                entries[0].path = path
+                files[path] = entries[0]
+
+        if fallback:
+            # 'ls -l -d' of the entry and, for links, of the entry as a directory
+            commands = []
+            for path in fallback:
+                commands.append(shlex.join(adb_helper.ShellCommand.LS_LIST_DIRS + [path]))
+                commands.append(shlex.join(adb_helper.ShellCommand.LS_LIST_DIRS + [path + '/']))
+            responses = adb_helper.batch(device_id, commands)
+            for path, response, target in zip(fallback, responses[0::2], responses[1::2]):
+                file = convert_to_file(response.output_data.strip()) if response.is_okay and response.output_data else None
+                if not file:
+                    errors.append(response.error_data or f"Unexpected string:\n{response.output_data}")
+                    continue
+                if file.type == FileType.LINK:
+                    output = (target.output_data or '') + (target.error_data or '')
+                    file.link_type = FileType.UNKNOWN
+                    if output.startswith('d'):
+                        file.link_type = FileType.DIRECTORY
+                    elif 'Not a' in output:
+                        file.link_type = FileType.FILE
+                file.path = path
+                files[path] = file
+        return files, "\n".join(errors) or None
+
+    @classmethod
+    def device_info(cls) -> Tuple[Dict[str, str], str]:
+        """Android version, model and uid of the shell by one round-trip"""
+        if not ADBManager.get_device():
+            return None, "No device selected!"
+
+        responses = adb_helper.batch(ADBManager.get_device().id, list(adb_helper.ShellCommand.DEVICE_INFO.values()))
+        if not any(response.is_okay for response in responses):
+            return None, responses[0].error_data
+        return {
+            name: (response.output_data or '').strip() if response.is_okay else ''
+            for name, response in zip(adb_helper.ShellCommand.DEVICE_INFO, responses)
+        }, None
+
+    @classmethod
+    def files(cls, partial_callback: callable = None) -> Tuple[List[File], str]:
         if not ADBManager.get_device():
             return None, "No device selected!"
 
         path = ADBManager.get_current_path()
+        device_id = ADBManager.get_device().id
+        if cls.stat_listing.get(device_id, True):
+            parser = FileListParser(path)
+            batches = None
+            if partial_callback:
+                # Entries are passed on in batches while the listing is still running
+                batches = BatchCallback(
+                    partial_callback,
+                    Settings.get_value(SettingsOptions.LISTING_BATCH_SIZE),
+                    Settings.get_value(SettingsOptions.LISTING_FLUSH_INTERVAL) / 1000
+                )
+
+            def feed(line: str):
+                file = parser.feed(line)
+                if file:
+                    batches.add(file)
+
+            response = adb_helper.list_dir(device_id, path, stdout_callback=feed if batches else None)
+            if response.exit_code == adb_helper.ShellCommand.STAT_NOT_SUPPORTED:
+                cls.stat_listing[device_id] = False
+            elif not response.is_okay:
+                return [], response.error_data or response.output_data
+            elif batches:
+                files = parser.finish()
+                batches.flush()
+                return files, response.error_data
+            else:
+                return convert_to_file_list_c(response.output_data, path), response.error_data
+
         args = adb_helper.ShellCommand.LS_ALL_LIST + [shlex.quote(path)]
         response = adb_helper.shell(ADBManager.get_device().id, args)
         if not response.is_okay and response.exit_code != 1:
@@ -127,6 +229,37 @@ class FileRepository:
         files = convert_to_file_list_a(response.output_data, dirs=dirs, path=path)
         return files, response.error_data
 
+    @classmethod
+    def tree(cls, path: str) -> Tuple[Dict[str, Tuple[int, int]], str]:
+        if not ADBManager.get_device():
+            return None, "No device selected!"
+
+        response = adb_helper.tree(ADBManager.get_device().id, path)
+        if not response.is_okay:
+            return None, response.error_data or response.output_data
+        return convert_to_tree(response.output_data, path), None
+
+    @classmethod
+    def stream_lines(cls, command: str) -> Tuple[io.TextIOBase, str]:
+        """Output of the shell `command` as a text stream which is read while the command runs"""
+        if not ADBManager.get_device():
+            return None, "No device selected!"
+
+        stream, error = adb_helper.exec_out(ADBManager.get_device().id, command)
+        if error:
+            return None, error
+        return io.TextIOWrapper(stream, encoding='utf-8', errors='replace'), None
+
+    @classmethod
+    def checksums(cls, path: str, names: list) -> Tuple[Dict[str, str], str]:
+        if not ADBManager.get_device():
+            return None, "No device selected!"
+
+        response = adb_helper.checksums(ADBManager.get_device().id, path, names)
+        if not response.is_okay:
+            return None, response.error_data or response.output_data
+        return convert_to_checksums(response.output_data), None
+
     @classmethod
     def rename(cls, file: File, name) -> Tuple[str, str]:
         if '/' in name or '\\' in name:
@@ -168,22 +301,108 @@ class FileRepository:
             elif data:
                 self.messages.append(data)
 
+        def progress(self, path: str, written: int, total: int):
+            self.callback(path, int(written / total * 100) if total else 100)
+
     @classmethod
     def download(cls, progress_callback: callable, source: File, destination: str, delete_too: bool = False) -> Tuple[str, str]:
         if not destination:
             destination = Settings.get_value(SettingsOptions.DOWNLOAD_PATH, ADBManager.get_device())
             destination = destination.replace(" ", "_")
+            try:
+                os.makedirs(destination, exist_ok=True)
+            except OSError as error:
+                return None, f"Could not create {destination}: {error}"
 
         if ADBManager.get_device() and source and destination:
+            if source.isdir:
+                data, error = cls.bulk_download(progress_callback, source, destination)
+                if error:
+                    return None, error
+                if data:
+                    return cls.delete(source) if delete_too is True else (data, None)
+            elif source.raw_size >= RESUME_MIN_SIZE:
+                data, error = cls.resumable_download(progress_callback, source, destination)
+                if error:
+                    return None, error
+                if data:
+                    return cls.delete(source) if delete_too is True else (data, None)
+
             helper = cls.UpDownHelper(progress_callback)
-            response = adb_helper.pull(ADBManager.get_device().id, source.path, destination, helper.call)
+            response = adb_helper.pull(ADBManager.get_device().id, source.path, destination, helper.call, helper.progress)
             if not response.is_okay:
+                if CancellationToken.current().cancelled:
+                    remove_partial(os.path.join(destination, source.name))
                 return None, response.error_data or "\n".join(helper.messages)
             if delete_too is True:
                 return cls.delete(source)
-            return response.error_data or "\n".join(helper.messages), None
+            return response.error_data or "\n".join(helper.messages) or response.output_data, None
         return None, None
 
+    @classmethod
+    def resumable_download(cls, progress_callback: callable, source: File, destination: str) -> Tuple[str, str]:
+        """
+        Large files go through a partial file, a failed attempt continues from the last recorded offset.
+        (None, None) when not used, e.g. the device has no `stat -c`.
+        """
+        device_id = ADBManager.get_device().id
+        if not cls.stat_listing.get(device_id, True):
+            return None, None
+        response = adb_helper.size_and_mtime(device_id, source.path)
+        if response.exit_code == adb_helper.ShellCommand.STAT_NOT_SUPPORTED:
+            cls.stat_listing[device_id] = False
+        values = (response.output_data or '').split()
+        if not response.is_okay or len(values) != 2 or not all(value.isdigit() for value in values):
+            # `adb pull` reports what went wrong
+            return None, None
+        size, mtime = int(values[0]), int(values[1])
+
+        partial = PartialDownload(os.path.join(destination, source.name), source.path, size, mtime)
+        offset = partial.offset
+        stream, error = adb_helper.read_from(device_id, source.path, offset)
+        if error:
+            return None, error
+        try:
+            with stream:
+                offset = partial.write(stream, offset, progress_callback)
+        except OSError as error:
+            offset = partial.offset
+            logging.warning("Download of %s interrupted: %s", source.path, error)
+
+        if offset != size:
+            return None, f"Download of {source.path} stopped at {offset} of {size} bytes, retry resumes it"
+        partial.finish(Settings.get_value(SettingsOptions.PRESERVE_TIMESTAMP))
+        return f"Download successful!\nDest: {partial.path}", None
+
+    @classmethod
+    def bulk_download(cls, progress_callback: callable, source: File, destination: str) -> Tuple[str, str]:
+        """Streams the directory as one tar archive if it holds many small files, (None, None) when not used"""
+        device_id = ADBManager.get_device().id
+        response = adb_helper.scan_dir(device_id, source.path)
+        files, size = convert_to_tree_size(response.output_data) if response.is_okay else (0, 0)
+        if not use_bulk(files, size):
+            return None, None
+
+        stream, error = adb_helper.tar_stream(device_id, source.path)
+        if error:
+            return None, None
+
+        target = os.path.join(destination, source.name)
+        try:
+            with stream:
+                extracted, _ = extract_stream(
+                    stream, destination, progress_callback, files, size,
+                    Settings.get_value(SettingsOptions.PRESERVE_TIMESTAMP)
+                )
+        except EmptyArchiveError:
+            # No tar on the device, pull file by file
+            return None, None
+        except tarfile.ReadError:
+            return None, f"Incomplete archive stream of {source.path}"
+        except (tarfile.TarError, OSError) as error:
+            return None, str(error)
+        return f"Download successful!\nDest: {target}\nFiles: {extracted}/{files}", None
+
     @classmethod
     def new_folder(cls, name) -> Tuple[str, str]:
         if not ADBManager.get_device():
@@ -196,16 +415,119 @@ class FileRepository:
         return response.output_data, response.error_data
 
     @classmethod
-    def upload(cls, progress_callback: callable, source: str) -> Tuple[str, str]:
-        if ADBManager.get_device() and ADBManager.get_current_path() and source:
+    def upload(cls, progress_callback: callable, source: str, destination: str = None, bulk: bool = None) -> Tuple[str, str]:
+        destination = destination or ADBManager.get_current_path()
+        if ADBManager.get_device() and destination and source:
+            if os.path.isdir(source) and bulk is not False:
+                data, error = cls.bulk_upload(progress_callback, source, destination, bulk)
+                if data or error:
+                    return data, error
+            elif os.path.isfile(source) and os.path.getsize(source) >= RESUME_MIN_SIZE:
+                data, error = cls.resumable_upload(progress_callback, source, destination)
+                if data or error:
+                    return data, error
+
             helper = cls.UpDownHelper(progress_callback)
-            response = adb_helper.push(ADBManager.get_device().id, source, ADBManager.get_current_path(), helper.call)
+            response = adb_helper.push(
+                ADBManager.get_device().id, source, destination, helper.call, helper.progress
+            )
             if not response.is_okay:
                 return None, response.error_data or "\n".join(helper.messages)
 
-            return response.error_data or "\n".join(helper.messages), None
+            return response.error_data or "\n".join(helper.messages) or response.output_data, None
         return None, None
 
+    @classmethod
+    def resumable_upload(cls, progress_callback: callable, source: str, destination: str) -> Tuple[str, str]:
+        """
+        Large files are appended to a partial file on the device, named after the size and mtime of
+        the local file, a failed attempt continues from the size the partial file has reached.
+        (None, None) when not used, e.g. the device has no `stat -c`.
+        """
+        device_id = ADBManager.get_device().id
+        if not cls.stat_listing.get(device_id, True):
+            return None, None
+        info = os.stat(source)
+        size, mtime = info.st_size, int(info.st_mtime)
+        target = destination.rstrip('/') + '/' + os.path.basename(os.path.normpath(source))
+        part = upload_part_name(target, size, mtime)
+
+        response = adb_helper.size_and_mtime(device_id, part)
+        if response.exit_code == adb_helper.ShellCommand.STAT_NOT_SUPPORTED:
+            cls.stat_listing[device_id] = False
+            return None, None
+        values = (response.output_data or '').split()
+        offset = min(int(values[0]), size) if response.is_okay and values and values[0].isdigit() else 0
+
+        stream, error = adb_helper.append_to(device_id, part, offset)
+        if error:
+            return None, error
+        error = None
+        try:
+            with open(source, 'rb') as file:
+                file.seek(offset)
+                for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+                    stream.write(chunk)
+                    offset += len(chunk)
+                    Bandwidth.throttle(len(chunk))
+                    progress_callback(target, int(offset / max(size, 1) * 100))
+        except OSError as exception:
+            error = str(exception)
+        except Cancelled:
+            stream.abort()
+            raise
+        lines = stream.close().strip().splitlines()
+        if error or not lines or lines[-1] != '0':
+            return None, f"Upload of {source} stopped at {offset} of {size} bytes, retry resumes it\n" + \
+                ("\n".join(lines[:-1]) or error or '')
+
+        response = adb_helper.size_and_mtime(device_id, part)
+        values = (response.output_data or '').split()
+        if not values or values[0] != str(size):
+            return None, f"Upload of {source} is incomplete, retry resumes it"
+
+        # Keep the local mtime, `touch -d @epoch` is not supported everywhere
+        args = [
+            adb_helper.ShellCommand.MV, shlex.quote(part), shlex.quote(target), '&&',
+            f"{{ {adb_helper.ShellCommand.TOUCH} -m -d @{mtime} {shlex.quote(target)} 2>/dev/null; true; }}"
+        ]
+        response = adb_helper.shell(device_id, args)
+        if not response.is_okay:
+            return None, response.error_data or response.output_data
+        return f"Upload successful!\nDest: {target}", None
+
+    @classmethod
+    def bulk_upload(cls, progress_callback: callable, source: str, destination: str, bulk: bool = None) -> Tuple[str, str]:
+        """Streams the local directory as one tar archive, (None, None) when not used"""
+        files, size = scan_tree(source)
+        if not bulk and files < BULK_MIN_FILES:
+            return None, None
+
+        device_id = ADBManager.get_device().id
+        if device_id not in cls.tar_support:
+            cls.tar_support[device_id] = adb_helper.shell(device_id, [adb_helper.ShellCommand.TAR_CHECK]).is_okay
+        if not cls.tar_support[device_id]:
+            return None, None
+
+        stream, error = adb_helper.untar_stream(device_id, destination)
+        if error:
+            return None, error
+
+        archived, error = 0, None
+        try:
+            archived, _ = write_stream(stream, source, progress_callback, files, size)
+        except (tarfile.TarError, OSError) as exception:
+            error = str(exception)
+        except Cancelled:
+            stream.abort()
+            raise
+
+        lines = stream.close().strip().splitlines()
+        if error or not lines or lines[-1] != '0':
+            return None, "\n".join(lines[:-1]) or error or f"Could not extract the archive into {destination}"
+        target = destination.rstrip('/') + '/' + os.path.basename(os.path.normpath(source))
+        return f"Upload successful!\nDest: {target}\nFiles: {archived}/{files}", None
+
 
 class DeviceRepository:
     @classmethod
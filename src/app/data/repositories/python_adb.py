@@ -2,18 +2,26 @@
 # Copyright (C) 2022  Azat Aldeshov
 
 import datetime
+import io
 import logging
 import os
 import shlex
-from typing import List, Tuple
+import tarfile
+from typing import Dict, List, Tuple
 
 from usb1 import USBContext
 
+from app.core.bandwidth import Bandwidth
 from app.core.managers import PythonADBManager
 from app.core.settings import SettingsOptions, Settings
 from app.data.models import Device, File, FileType
-from app.helpers.converters import __converter_to_permissions_default__
-from app.services.adb_helper import ShellCommand
+from app.helpers.archives import EmptyArchiveError, IterStream, extract_stream, use_bulk
+from app.helpers.converters import convert_mode_to_permissions, convert_to_tree_size, convert_to_tree, \
+    convert_to_checksums, convert_to_status
+from app.helpers.resume import RESUME_MIN_SIZE, PartialDownload, remove_partial
+from app.helpers.tools import Cancelled, CancellationToken
+from app.services.adb_helper import ShellBatch, ShellCommand, checksum_script, read_from_script, scan_script, status_script, tar_script, \
+    tree_script
 
 
 class FileRepository:
@@ -37,6 +45,18 @@ class FileRepository:
             return None, "Device not available!"
         return "TODO", "None"
 
+    @classmethod
+    def device_status(cls, commands: Dict[str, str]) -> Tuple[Dict[str, str], str]:
+        if not PythonADBManager.device:
+            return None, "No device selected!"
+        if not PythonADBManager.device.available:
+            return None, "Device not available!"
+        try:
+            return convert_to_status(PythonADBManager.device.shell(status_script(commands)), commands), None
+        except BaseException as error:
+            logging.exception("Unexpected error=%s, type(error)=%s", error, type(error))
+            return None, error
+
     @classmethod
     def android_version(cls) -> Tuple[str, str]:
         if not PythonADBManager.device:
@@ -47,35 +67,74 @@ class FileRepository:
 
     @classmethod
     def file(cls, path: str) -> Tuple[File, str]:
+        if not PythonADBManager.device:
+            return None, "No device selected!"
+        if not PythonADBManager.device.available:
+            return None, "Device not available!"
+
+        path = PythonADBManager.set_current_path(path)
+        files, error = cls.stat_many([path])
+        if not files:
+            return None, error
+        return files[path], None
+
+    @classmethod
+    def stat_many(cls, paths: List[str]) -> Tuple[Dict[str, File], str]:
+        """{path: File} of `paths`, the link types are resolved by one shell round-trip"""
         if not PythonADBManager.device:
             return None, "No device selected!"
         if not PythonADBManager.device.available:
             return None, "Device not available!"
         try:
-            path = PythonADBManager.set_current_path(path)
-            mode, size, mtime = PythonADBManager.device.stat(path)
-            file = File(
-                name=os.path.basename(os.path.normpath(path)),
-                size=size,
-                date_time=datetime.datetime.utcfromtimestamp(mtime),
-                permissions=__converter_to_permissions_default__(list(oct(mode)[2:]))
-            )
-
-            if file.type == FileType.LINK:
-                args = ShellCommand.LS_LIST_DIRS + [shlex.quote(path) + '/']
-                response = PythonADBManager.device.shell(shlex.join(args))
-                file.link_type = FileType.UNKNOWN
-                if response and response.startswith('d'):
-                    file.link_type = FileType.DIRECTORY
-                elif response and 'Not a' in response:
-                    file.link_type = FileType.FILE
-            file.path = path
-            return file, None
+            files = {}
+            errors = []
+            for path in paths:
+                mode, size, mtime = PythonADBManager.device.stat(path)
+                if not mode:
+                    errors.append(f"{path}: No such file or directory")
+                    continue
+                files[path] = File(
+                    name=os.path.basename(os.path.normpath(path)),
+                    path=path,
+                    size=size,
+                    date_time=datetime.datetime.utcfromtimestamp(mtime),
+                    permissions=convert_mode_to_permissions(mode)
+                )
+
+            links = [path for path, file in files.items() if file.type == FileType.LINK]
+            if links:
+                batch = ShellBatch([shlex.join(ShellCommand.LS_LIST_DIRS + [path + '/']) for path in links])
+                responses = batch.responses(PythonADBManager.device.shell(batch.script()))
+                for path, response in zip(links, responses):
+                    output = (response.output_data or '') + (response.error_data or '')
+                    files[path].link_type = FileType.UNKNOWN
+                    if output.startswith('d'):
+                        files[path].link_type = FileType.DIRECTORY
+                    elif 'Not a' in output:
+                        files[path].link_type = FileType.FILE
+            return files, "\n".join(errors) or None
 
         except BaseException as error:
             logging.exception("Unexpected error=%s, type(error)=%s", error, type(error))
             return None, error
 
+    @classmethod
+    def device_info(cls) -> Tuple[Dict[str, str], str]:
+        if not PythonADBManager.device:
+            return None, "No device selected!"
+        if not PythonADBManager.device.available:
+            return None, "Device not available!"
+        try:
+            batch = ShellBatch(list(ShellCommand.DEVICE_INFO.values()))
+            responses = batch.responses(PythonADBManager.device.shell(batch.script()))
+            return {
+                name: (response.output_data or '').strip() if response.is_okay else ''
+                for name, response in zip(ShellCommand.DEVICE_INFO, responses)
+            }, None
+        except BaseException as error:
+            logging.exception("Unexpected error=%s, type(error)=%s", error, type(error))
+            return None, error
+
     @classmethod
     def files(cls) -> Tuple[List[File], str]:
         if not PythonADBManager.device:
@@ -95,7 +154,7 @@ class FileRepository:
                 if file.filename.decode() == '.' or file.filename.decode() == '..':
                     continue
 
-                permissions = __converter_to_permissions_default__(list(oct(file.mode)[2:]))
+                permissions = convert_mode_to_permissions(file.mode)
                 link_type = None
                 if permissions[0] == 'l':
                     link_type = FileType.FILE
@@ -119,6 +178,41 @@ class FileRepository:
             logging.exception("Unexpected error=%s, type(error)=%s", error, type(error))
             return files, error
 
+    @classmethod
+    def tree(cls, path: str) -> Tuple[Dict[str, Tuple[int, int]], str]:
+        if not PythonADBManager.device:
+            return None, "No device selected!"
+        if not PythonADBManager.device.available:
+            return None, "Device not available!"
+        try:
+            return convert_to_tree(PythonADBManager.device.shell(tree_script(path)), path), None
+        except BaseException as error:
+            logging.exception("Unexpected error=%s, type(error)=%s", error, type(error))
+            return None, error
+
+    @classmethod
+    def stream_lines(cls, command: str) -> Tuple[io.TextIOBase, str]:
+        """Output of the shell `command` as a text stream which is read while the command runs"""
+        if not PythonADBManager.device:
+            return None, "No device selected!"
+        if not PythonADBManager.device.available:
+            return None, "Device not available!"
+
+        chunks = PythonADBManager.device.streaming_shell(command, decode=False)
+        return io.TextIOWrapper(io.BufferedReader(IterStream(chunks)), encoding='utf-8', errors='replace'), None
+
+    @classmethod
+    def checksums(cls, path: str, names: list) -> Tuple[Dict[str, str], str]:
+        if not PythonADBManager.device:
+            return None, "No device selected!"
+        if not PythonADBManager.device.available:
+            return None, "Device not available!"
+        try:
+            return convert_to_checksums(PythonADBManager.device.shell(checksum_script(path, names))), None
+        except BaseException as error:
+            logging.exception("Unexpected error=%s, type(error)=%s", error, type(error))
+            return None, error
+
     @classmethod
     def rename(cls, file: File, name: str) -> Tuple[str, str]:
         if not PythonADBManager.device:
@@ -184,6 +278,7 @@ class FileRepository:
                 self.written = 0
 
             self.written += written
+            Bandwidth.throttle(written)
             self.callback(path, int(self.written / self.total * 100))
 
     @classmethod
@@ -191,10 +286,26 @@ class FileRepository:
         if not destination:
             destination = Settings.get_value(SettingsOptions.DOWNLOAD_PATH, PythonADBManager.get_device())
             destination = destination.replace(" ", "_")
+            try:
+                os.makedirs(destination, exist_ok=True)
+            except OSError as error:
+                return None, f"Could not create {destination}: {error}"
 
         helper = cls.UpDownHelper(progress_callback)
-        destination = os.path.join(destination, os.path.basename(os.path.normpath(source)))
         if PythonADBManager.device and PythonADBManager.device.available and source:
+            if source.isdir:
+                data, error = cls.bulk_download(progress_callback, source, destination)
+                if error:
+                    return None, error
+                if data:
+                    return cls.delete(source) if delete_too is True else (data, None)
+            elif source.raw_size >= RESUME_MIN_SIZE:
+                data, error = cls.resumable_download(progress_callback, source, destination)
+                if error:
+                    return None, error
+                return cls.delete(source) if delete_too is True else (data, None)
+
+            destination = os.path.join(destination, source.name)
             try:
                 PythonADBManager.device.pull(
                     device_path=source.path,
@@ -202,11 +313,78 @@ class FileRepository:
                     progress_callback=helper.call
                 )
                 return f"Download successful!\nDest: {destination}", None
+            except Cancelled:
+                remove_partial(destination)
+                return None, CancellationToken.MESSAGE
             except BaseException as error:
                 logging.exception("Unexpected error=%s, type(error)=%s", error, type(error))
                 return None, error
         return None, None
 
+    @classmethod
+    def resumable_download(cls, progress_callback: callable, source: File, destination: str) -> Tuple[str, str]:
+        """Large files go through a partial file, a failed attempt continues from the last recorded offset"""
+        try:
+            _, size, mtime = PythonADBManager.device.stat(source.path)
+        except BaseException as error:
+            logging.exception("Unexpected error=%s, type(error)=%s", error, type(error))
+            return None, error
+
+        partial = PartialDownload(os.path.join(destination, source.name), source.path, size, mtime)
+        offset = partial.offset
+        chunks = PythonADBManager.device.streaming_shell(read_from_script(source.path, offset), decode=False)
+        try:
+            with io.BufferedReader(IterStream(chunks)) as stream:
+                offset = partial.write(stream, offset, progress_callback)
+        except Cancelled:
+            raise
+        except BaseException as error:
+            offset = partial.offset
+            logging.warning("Download of %s interrupted: %s", source.path, error, exc_info=True)
+        finally:
+            # Ends the device stream when it was not read to its end
+            chunks.close()
+
+        if offset != size:
+            return None, f"Download of {source.path} stopped at {offset} of {size} bytes, retry resumes it"
+        partial.finish(Settings.get_value(SettingsOptions.PRESERVE_TIMESTAMP))
+        return f"Download successful!\nDest: {partial.path}", None
+
+    @classmethod
+    def bulk_download(cls, progress_callback: callable, source: File, destination: str) -> Tuple[str, str]:
+        """Streams the directory as one tar archive if it holds many small files, (None, None) when not used"""
+        try:
+            files, size = convert_to_tree_size(PythonADBManager.device.shell(scan_script(source.path)))
+        except Cancelled:
+            raise
+        except BaseException as error:
+            logging.exception("Unexpected error=%s, type(error)=%s", error, type(error))
+            return None, None
+        if not use_bulk(files, size):
+            return None, None
+
+        target = os.path.join(destination, source.name)
+        chunks = PythonADBManager.device.streaming_shell(tar_script(source.path), decode=False)
+        try:
+            with io.BufferedReader(IterStream(chunks)) as stream:
+                extracted, _ = extract_stream(
+                    stream, destination, progress_callback, files, size,
+                    Settings.get_value(SettingsOptions.PRESERVE_TIMESTAMP)
+                )
+        except EmptyArchiveError:
+            # No tar on the device, pull file by file
+            return None, None
+        except tarfile.ReadError:
+            return None, f"Incomplete archive stream of {source.path}"
+        except Cancelled:
+            raise
+        except BaseException as error:
+            logging.exception("Unexpected error=%s, type(error)=%s", error, type(error))
+            return None, str(error)
+        finally:
+            chunks.close()
+        return f"Download successful!\nDest: {target}\nFiles: {extracted}/{files}", None
+
     @classmethod
     def new_folder(cls, name) -> Tuple[str, str]:
         if not PythonADBManager.device:
@@ -224,10 +402,14 @@ class FileRepository:
             return None, error
 
     @classmethod
-    def upload(cls, progress_callback: callable, source: str) -> Tuple[str, str]:
+    def upload(cls, progress_callback: callable, source: str, destination: str = None, bulk: bool = None) -> Tuple[str, str]:
+        # adb_shell can't stream stdin into a command, directories are pushed file by file
+        if bulk and os.path.isdir(source):
+            return None, "Upload as archive is not supported by the python adb core, use the external adb"
         helper = cls.UpDownHelper(progress_callback)
-        destination = PythonADBManager.get_current_path() + os.path.basename(os.path.normpath(source))
-        if PythonADBManager.device and PythonADBManager.device.available and PythonADBManager.get_current_path() and source:
+        location = destination or PythonADBManager.get_current_path()
+        destination = location + os.path.basename(os.path.normpath(source))
+        if PythonADBManager.device and PythonADBManager.device.available and location and source:
             try:
                 PythonADBManager.device.push(
                     local_path=source,
@@ -0,0 +1,309 @@
+# ADB File Explorer
+# Copyright (C) 2025  aakbar5
+
+import hashlib
+import json
+import logging
+import os
+import posixpath
+from typing import Dict, List, Tuple
+
+from app.core.adb import Adb
+from app.data.models import File
+from app.data.repositories import FileRepository
+
+
+class SyncDirection:
+    BOTH = 'Both ways'
+    PULL = 'Device to local'
+    PUSH = 'Local to device'
+
+
+class SyncAction:
+    DOWNLOAD = 'Download'
+    UPLOAD = 'Upload'
+    DELETE_LOCAL = 'Delete local'
+    DELETE_REMOTE = 'Delete on device'
+    # Both sides already match, only the state file gets updated
+    RECORD = 'Record'
+
+
+class SyncItem:
+    def __init__(self, action: str, name: str, reason: str):
+        self.action = action
+        self.name = name
+        self.reason = reason
+
+    def __str__(self):
+        return f"{self.action}: {self.name} ({self.reason})"
+
+
+class SyncPlan:
+    """
+    SyncPlan - what a sync would do, computed without touching either side.
+    `state` holds the entries which are in sync already.
+    """
+
+    def __init__(self, device_id: str, remote: str, local: str, direction: str):
+        self.device_id = device_id
+        self.remote = remote
+        self.local = local
+        self.direction = direction
+        self.items: List[SyncItem] = []
+        self.state: Dict[str, list] = {}
+        self.remote_files: Dict[str, Tuple[int, int]] = {}
+        self.local_files: Dict[str, Tuple[int, int]] = {}
+
+    @property
+    def transfers(self) -> List[SyncItem]:
+        return [item for item in self.items if item.action != SyncAction.RECORD]
+
+    def summary(self) -> str:
+        counts = {}
+        for item in self.transfers:
+            counts[item.action] = counts.get(item.action, 0) + 1
+        if not counts:
+            return "Nothing to transfer, both folders are in sync."
+        return "\n".join(f"{action}: {count}" for action, count in counts.items())
+
+
+class FolderSync:
+    """
+    FolderSync - incremental sync between a device folder and a local folder.
+
+    Files are compared by size and mtime against the state of the last sync, which is kept in
+    STATE_FILE inside the local folder. A file changed on one side only is copied to the other,
+    a file which disappeared from one side since the last sync is deleted on the other one.
+    Files changed on both sides go to the newer one. With `checksum`, files of equal size are
+    compared by sha1 before they get transferred.
+    """
+    STATE_FILE = '.adbfe_sync.json'
+    STATE_VERSION = 1
+    # FAT based storage keeps mtime with 2 seconds resolution
+    MTIME_TOLERANCE = 2
+    CHECKSUM_BATCH = 100
+
+    @classmethod
+    def plan(cls, remote: str, local: str, direction: str = SyncDirection.BOTH,
+             checksum: bool = False) -> Tuple[SyncPlan, str]:
+        device = Adb.manager().get_device()
+        if not device:
+            return None, "No device selected!"
+
+        remote = remote.rstrip('/') + '/'
+        remote_files, error = FileRepository.tree(remote)
+        if error or remote_files is None:
+            return None, error or f"Could not list {remote}"
+
+        plan = SyncPlan(device.id, remote, local, direction)
+        plan.remote_files = remote_files
+        plan.local_files = cls.local_tree(local)
+        state = cls.load_state(plan)
+
+        for name in sorted(set(plan.remote_files) | set(plan.local_files) | set(state)):
+            local_file = plan.local_files.get(name)
+            remote_file = plan.remote_files.get(name)
+            item = cls.__compare(name, local_file, remote_file, state.get(name), direction)
+            if item and cls.__allowed(item, direction):
+                plan.items.append(item)
+            elif not item and local_file and remote_file:
+                # Unchanged on both sides
+                plan.state[name] = [*local_file, *remote_file]
+            elif name in state:
+                # Skipped by the direction, keep what was known so the change is seen next time
+                plan.state[name] = state[name]
+
+        if checksum:
+            error = cls.__match_checksums(plan)
+            if error:
+                logging.warning("Checksums not compared: %s", error)
+        return plan, None
+
+    @classmethod
+    def __compare(cls, name: str, local_file: tuple, remote_file: tuple, state: list, direction: str) -> SyncItem:
+        if local_file and remote_file:
+            if state:
+                local_changed = tuple(state[:2]) != local_file
+                remote_changed = tuple(state[2:]) != remote_file
+            else:
+                local_changed = remote_changed = not cls.same(local_file, remote_file)
+
+            if not local_changed and not remote_changed:
+                item = None if state else SyncItem(SyncAction.RECORD, name, "same size and time")
+            elif local_changed and remote_changed:
+                if cls.same(local_file, remote_file):
+                    item = SyncItem(SyncAction.RECORD, name, "same size and time")
+                elif direction == SyncDirection.PULL or (direction == SyncDirection.BOTH and remote_file[1] >= local_file[1]):
+                    item = SyncItem(SyncAction.DOWNLOAD, name, "changed on both sides")
+                else:
+                    item = SyncItem(SyncAction.UPLOAD, name, "changed on both sides")
+            elif local_changed:
+                item = SyncItem(SyncAction.UPLOAD, name, "changed locally")
+            else:
+                item = SyncItem(SyncAction.DOWNLOAD, name, "changed on device")
+        elif local_file:
+            if state and tuple(state[:2]) == local_file:
+                item = SyncItem(SyncAction.DELETE_LOCAL, name, "deleted on device")
+            else:
+                item = SyncItem(SyncAction.UPLOAD, name, "new local file")
+        elif remote_file:
+            if state and tuple(state[2:]) == remote_file:
+                item = SyncItem(SyncAction.DELETE_REMOTE, name, "deleted locally")
+            else:
+                item = SyncItem(SyncAction.DOWNLOAD, name, "new on device")
+        else:
+            return None
+        return item
+
+    @staticmethod
+    def __allowed(item: SyncItem, direction: str) -> bool:
+        allowed = {
+            SyncDirection.PULL: (SyncAction.DOWNLOAD, SyncAction.DELETE_LOCAL, SyncAction.RECORD),
+            SyncDirection.PUSH: (SyncAction.UPLOAD, SyncAction.DELETE_REMOTE, SyncAction.RECORD),
+        }.get(direction)
+        return not allowed or item.action in allowed
+
+    @classmethod
+    def __match_checksums(cls, plan: SyncPlan) -> str:
+        candidates = [
+            item for item in plan.items
+            if item.action in (SyncAction.DOWNLOAD, SyncAction.UPLOAD)
+            and item.name in plan.local_files and item.name in plan.remote_files
+            and plan.local_files[item.name][0] == plan.remote_files[item.name][0]
+        ]
+        for start in range(0, len(candidates), cls.CHECKSUM_BATCH):
+            batch = candidates[start:start + cls.CHECKSUM_BATCH]
+            checksums, error = FileRepository.checksums(plan.remote, [item.name for item in batch])
+            if error or checksums is None:
+                return error or "sha1sum failed"
+            for item in batch:
+                if checksums.get(item.name) == cls.sha1(os.path.join(plan.local, item.name)):
+                    item.action = SyncAction.RECORD
+                    item.reason = "same checksum"
+        return None
+
+    @classmethod
+    def apply(cls, progress_callback: callable, plan: SyncPlan) -> Tuple[str, str]:
+        state = dict(plan.state)
+        done = {}
+        errors = []
+        for index, item in enumerate(plan.items):
+            progress_callback(item.name, int(index / len(plan.items) * 100))
+            error = cls.__apply_item(plan, item, state)
+            if error:
+                errors.append(f"{item.name}: {error}")
+            else:
+                done[item.action] = done.get(item.action, 0) + 1
+
+        if done.get(SyncAction.UPLOAD):
+            # Record the uploads as the device reports them, e.g. storage with coarse mtime
+            remote_files, _ = FileRepository.tree(plan.remote)
+            for item in plan.items:
+                if item.action == SyncAction.UPLOAD and item.name in state and item.name in (remote_files or {}):
+                    state[item.name][2:] = remote_files[item.name]
+
+        error = cls.save_state(plan, state)
+        if error:
+            errors.append(error)
+        done.pop(SyncAction.RECORD, None)
+        data = "Sync finished<br/>" + ("<br/>".join(f"{action}: {count}" for action, count in done.items()) or "No changes")
+        return data, "<br/>".join(errors) or None
+
+    @classmethod
+    def __apply_item(cls, plan: SyncPlan, item: SyncItem, state: dict) -> str:
+        local_path = os.path.join(plan.local, *item.name.split('/'))
+        remote_path = plan.remote + item.name
+        remote_file = plan.remote_files.get(item.name)
+
+        try:
+            if item.action == SyncAction.DOWNLOAD:
+                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                source = File(name=posixpath.basename(remote_path), path=remote_path, permissions='-')
+                _, error = FileRepository.download(lambda *args: None, source, os.path.dirname(local_path), False)
+                if error:
+                    return error
+                state[item.name] = [*cls.local_stat(local_path), *remote_file]
+            elif item.action == SyncAction.UPLOAD:
+                _, error = FileRepository.upload(lambda *args: None, local_path, posixpath.dirname(remote_path) + '/', False)
+                if error:
+                    return error
+                # Push keeps the local mtime, apply() reads the device side back
+                local_file = cls.local_stat(local_path)
+                state[item.name] = [*local_file, *local_file]
+            elif item.action == SyncAction.DELETE_LOCAL:
+                os.remove(local_path)
+                state.pop(item.name, None)
+            elif item.action == SyncAction.DELETE_REMOTE:
+                target = File(name=posixpath.basename(remote_path), path=remote_path, permissions='-')
+                _, error = FileRepository.delete(target)
+                if error:
+                    return error
+                state.pop(item.name, None)
+            elif item.action == SyncAction.RECORD:
+                state[item.name] = [*plan.local_files[item.name], *remote_file]
+        except OSError as error:
+            return str(error)
+        return None
+
+    @classmethod
+    def same(cls, local_file: tuple, remote_file: tuple) -> bool:
+        return local_file[0] == remote_file[0] and abs(local_file[1] - remote_file[1]) <= cls.MTIME_TOLERANCE
+
+    @staticmethod
+    def local_stat(path: str) -> Tuple[int, int]:
+        info = os.stat(path)
+        return info.st_size, int(info.st_mtime)
+
+    @staticmethod
+    def sha1(path: str) -> str:
+        digest = hashlib.sha1()
+        try:
+            with open(path, 'rb') as file:
+                for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        except OSError:
+            return None
+        return digest.hexdigest()
+
+    @classmethod
+    def local_tree(cls, path: str) -> Dict[str, Tuple[int, int]]:
+        files = {}
+        pending = [(path, '')]
+        while pending:
+            directory, prefix = pending.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        name = prefix + entry.name
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append((entry.path, name + '/'))
+                        elif entry.is_file(follow_symlinks=False) and name != cls.STATE_FILE:
+                            info = entry.stat(follow_symlinks=False)
+                            files[name] = (info.st_size, int(info.st_mtime))
+            except OSError as error:
+                logging.warning("Could not scan %s: %s", directory, error)
+        return files
+
+    @classmethod
+    def load_state(cls, plan: SyncPlan) -> Dict[str, list]:
+        try:
+            with open(os.path.join(plan.local, cls.STATE_FILE), 'r', encoding='utf-8') as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        if state.get('version') != cls.STATE_VERSION or state.get('device') != plan.device_id \
+                or state.get('remote') != plan.remote:
+            return {}
+        return state.get('files') or {}
+
+    @classmethod
+    def save_state(cls, plan: SyncPlan, files: Dict[str, list]) -> str:
+        state = {'version': cls.STATE_VERSION, 'device': plan.device_id, 'remote': plan.remote, 'files': files}
+        path = os.path.join(plan.local, cls.STATE_FILE)
+        try:
+            with open(path + '.tmp', 'w', encoding='utf-8') as file:
+                json.dump(state, file)
+            os.replace(path + '.tmp', path)
+        except OSError as error:
+            return f"Could not save sync state: {error}"
+        return None
@@ -0,0 +1,105 @@
+# ADB File Explorer
+# Copyright (C) 2025  aakbar5
+
+import logging
+import threading
+import time
+
+from app.core.managers import Global
+from app.core.settings import Settings
+from app.core.transfers import TransferQueue
+from app.data.repositories import FileRepository
+
+
+class TelemetryField:
+    """
+    TelemetryField - one status value printed by `command` on the device.
+    It is read every `interval` seconds, the delay doubles while the value stays the same
+    up to `max_interval` and drops back to `interval` when it changes.
+    """
+
+    def __init__(self, name: str, command: str, interval: float, max_interval: float):
+        self.name = name
+        self.command = command
+        self.interval = interval
+        self.max_interval = max_interval
+
+        self.value = None
+        self.delay = interval
+        self.due = 0
+
+    def update(self, value: str, now: float, factor: float) -> bool:
+        changed = value != self.value
+        self.value = value
+        self.delay = self.interval if changed else min(self.delay * 2, self.max_interval)
+        self.due = now + self.delay * factor
+        return changed
+
+
+class DeviceTelemetry(threading.Thread):
+    """
+    DeviceTelemetry - samples the status bar values of the current device.
+    All fields which are due are read by one shell round-trip, the status bar signals are
+    emitted only when a value changed. Delays are stretched while transfers are running,
+    so the status bar does not compete with them for the link.
+
+    The interval of a field can be set in seconds by the setting 'telemetry/<name>'.
+    """
+    # Name, command, interval, max interval (seconds)
+    FIELDS = (
+        ('battery_level', 'cmd battery get level', 5, 60),
+        ('battery_status', 'cmd battery get status', 2, 30),
+        ('uid', 'id -u', 10, 300),
+    )
+    TRANSFER_FACTOR = 4
+
+    def __init__(self, min_delay_mseconds: int = 1000):
+        super(DeviceTelemetry, self).__init__(daemon=True)
+        self.min_delay = min_delay_mseconds / 1000
+        self.fields = []
+        for name, command, interval, max_interval in self.FIELDS:
+            interval = self.interval(name, interval)
+            self.fields.append(TelemetryField(name, command, interval, max(interval, max_interval)))
+        self._stop_event = threading.Event()
+
+    @staticmethod
+    def interval(name: str, default: float) -> float:
+        value = Settings.get_value(f"telemetry/{name}")
+        try:
+            interval = float(value or default)
+        except (TypeError, ValueError):
+            logging.warning("Invalid telemetry interval of %s: %s, using %ss", name, value, default)
+            return default
+        return interval if interval > 0 else default
+
+    def run(self):
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            due = [field for field in self.fields if field.due <= now]
+            if due:
+                self.sample(due, now)
+            wait = min(field.due for field in self.fields) - time.monotonic()
+            self._stop_event.wait(max(wait, self.min_delay))
+        logging.debug("Device telemetry stopped")
+
+    def sample(self, fields: list, now: float):
+        data, error = FileRepository.device_status({field.name: field.command for field in fields})
+        if error:
+            logging.debug("Device telemetry: %s", error)
+        data = data or {}
+
+        factor = self.TRANSFER_FACTOR if TransferQueue.pending() else 1
+        changed = {field.name for field in fields if field.update(data.get(field.name, ''), now, factor)}
+        values = {field.name: field.value for field in self.fields}
+
+        if changed & {'battery_level', 'battery_status'}:
+            level, status = values['battery_level'] or '', values['battery_status'] or ''
+            if level.isdigit() and status.isdigit():
+                Global().communicate.status_bar_battery_level.emit(level, status)
+            else:
+                Global().communicate.status_bar_battery_level.emit('', '')
+        if 'uid' in changed and values['uid']:
+            Global().communicate.status_bar_is_root.emit(0 if values['uid'] == '0' else -1)
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,92 @@
+# ADB File Explorer
+# Copyright (C) 2025  aakbar5
+
+from PyQt5.QtCore import QPointF, Qt, QTimer
+from PyQt5.QtGui import QColor, QPainter, QPen, QPolygonF
+from PyQt5.QtWidgets import QDialog, QFormLayout, QLabel, QSpinBox, QVBoxLayout, QWidget
+
+from app.core.bandwidth import Bandwidth
+from app.core.settings import SettingsOptions, Settings
+from app.helpers.converters import convert_to_readable_size
+
+
+class ThroughputGraph(QWidget):
+    """Transfer throughput of the last minute, the dashed line is the global limit"""
+
+    def __init__(self, parent: QWidget = None):
+        super(ThroughputGraph, self).__init__(parent)
+        self.setMinimumSize(360, 140)
+        self.values = Bandwidth.throughput()
+
+    def refresh(self):
+        self.values = Bandwidth.throughput()
+        self.update()
+
+    def paintEvent(self, _event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.fillRect(self.rect(), QColor('#2e3436'))
+
+        limit, _ = Bandwidth.limits()
+        top = max(*self.values, limit, 1) * 1.1
+        width, height = self.width(), self.height()
+        step = width / max(len(self.values) - 1, 1)
+
+        def y(value):
+            return height - value / top * height
+
+        if limit:
+            pen = QPen(QColor('#ef2929'), 1, Qt.DashLine)
+            painter.setPen(pen)
+            painter.drawLine(QPointF(0, y(limit)), QPointF(width, y(limit)))
+
+        painter.setPen(QPen(QColor('#8ae234'), 2))
+        painter.drawPolyline(QPolygonF([QPointF(index * step, y(value)) for index, value in enumerate(self.values)]))
+
+        painter.setPen(QColor('#eeeeec'))
+        painter.drawText(6, 16, f"{convert_to_readable_size(self.values[-1])}/s")
+
+
+class BandwidthDialog(QDialog):
+    """
+    Transfer rate limits, changes apply to the running transfers right away.
+    """
+    MAXIMUM = 10 * 1024 * 1024  # KiB/s
+
+    def __init__(self, parent: QWidget = None):
+        super(BandwidthDialog, self).__init__(parent)
+        self.setWindowTitle("Transfer rate")
+        layout = QVBoxLayout(self)
+
+        form = QFormLayout()
+        layout.addLayout(form)
+        self.widget_global_limit = self.limit_box(SettingsOptions.TRANSFER_RATE_LIMIT)
+        form.addRow("All transfers:", self.widget_global_limit)
+        self.widget_device_limit = self.limit_box(SettingsOptions.DEVICE_RATE_LIMIT)
+        form.addRow("Each device:", self.widget_device_limit)
+
+        self.graph = ThroughputGraph(self)
+        layout.addWidget(QLabel("Throughput, last minute:", self))
+        layout.addWidget(self.graph)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.graph.refresh)
+
+    def limit_box(self, key: str) -> QSpinBox:
+        box = QSpinBox(self)
+        box.setRange(0, self.MAXIMUM)
+        box.setSingleStep(256)
+        box.setSuffix(" KiB/s")
+        box.setSpecialValueText("Unlimited")
+        box.setValue(Settings.get_value(key))
+        box.valueChanged.connect(lambda value: Settings.set_value(key, value))
+        return box
+
+    def showEvent(self, event):
+        self.graph.refresh()
+        self.timer.start(1000)
+        return super(BandwidthDialog, self).showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        return super(BandwidthDialog, self).hideEvent(event)
@@ -5,7 +5,7 @@ from typing import Any
 
 from PyQt5 import (QtCore, QtGui)
 from PyQt5.QtCore import (pyqtSlot, QAbstractListModel, QModelIndex, QRect, QSize, Qt, QVariant)
-from PyQt5.QtGui import (QKeySequence, QMovie, QPalette, QPixmap)
+from PyQt5.QtGui import (QKeySequence, QMovie, QPalette)
 from PyQt5.QtWidgets import (QApplication, QLabel, QListView, QShortcut, QStyle,
                              QStyledItemDelegate, QStyleOptionViewItem, QVBoxLayout,
                              QWidget)
@@ -16,6 +16,7 @@ from app.core.resources import Resources
 from app.core.settings import SettingsOptions, Settings
 from app.data.models import DeviceType, MessageData
 from app.data.repositories import DeviceRepository
+from app.helpers.icons import IconCache
 from app.helpers.tools import AsyncRepositoryWorker, read_string_from_file
 
 
@@ -80,7 +81,7 @@ class DeviceListModel(QAbstractListModel):
         if role == Qt.DisplayRole:
             return self.items[index.row()]
         if role == Qt.DecorationRole:
-            return QPixmap(self.icon_path(index)).scaled(32, 32, Qt.KeepAspectRatio)
+            return IconCache.pixmap(self.icon_path(index), QSize(32, 32))
         return QVariant()
 
 
@@ -1,14 +1,16 @@
 # ADB File Explorer
 # Copyright (C) 2022  Azat Aldeshov
 
-import sys
+import datetime
 import os
-from typing import Any
+import re
+import sys
+from typing import Any, Tuple
 
 from PyQt5 import (QtCore, QtGui)
 from PyQt5.QtCore import (QAbstractTableModel, QEvent, QModelIndex,
-                          QObject, QPoint, QRect, QSize, QSortFilterProxyModel, Qt)
-from PyQt5.QtGui import (QColor, QFont, QMovie, QPixmap)
+                          QObject, QPersistentModelIndex, QPoint, QRect, QSize, QSortFilterProxyModel, Qt, QTimer)
+from PyQt5.QtGui import (QColor, QFont, QMovie)
 from PyQt5.QtWidgets import (QAction, QFileDialog, QHBoxLayout, QHeaderView,
                              QInputDialog, QLabel, QMainWindow, QMenu, QMessageBox,
                              QShortcut, QSizePolicy, QStyledItemDelegate,
@@ -16,17 +18,32 @@ from PyQt5.QtWidgets import (QAction, QFileDialog, QHBoxLayout, QHeaderView,
                              QVBoxLayout, QWidget)
 
 from app.core.adb import Adb
+from app.core.executor import Executor
 from app.core.managers import Global
+from app.core.operations import Operations
 from app.core.resources import Resources
 from app.core.settings import SettingsOptions, Settings
-from app.data.models import FileType, MessageData, MessageType
+from app.core.transfers import Transfer, TransferQueue, TransferType
+from app.data.models import DisplayFormat, FileType, MessageData, MessageType
+from app.data.index import FileIndex
 from app.data.repositories import FileRepository
-from app.gui.explorer.statusbar import DeviceStatusThread
+from app.data.sync import FolderSync, SyncDirection
+from app.data.telemetry import DeviceTelemetry
 from app.gui.explorer.toolbar import UpButton, UploadTools, PathBar, HomeButton, RefreshButton, BackButton, ForwardButton, SearchBar
-from app.helpers.lookup import QtEventsLookUp, MimeTypesLookUp
-from app.helpers.tools import AsyncRepositoryWorker, ProgressCallbackHelper
+from app.helpers.icons import IconCache
+from app.helpers.lookup import QtEventsLookUp
+from app.helpers.tools import AsyncRepositoryWorker
 
 HEADER = ['File', 'Permissions', 'Size', 'Date', 'MimeType']
+NATURAL_SPLIT = re.compile(r'(\d+)')
+ICON_SIZE = QSize(32, 32)
+# Settings which show a column
+HEADER_OPTIONS = {
+    SettingsOptions.HEADER_PERMISSION: 1,
+    SettingsOptions.HEADER_SIZE: 2,
+    SettingsOptions.HEADER_DATE: 3,
+    SettingsOptions.HEADER_MIME_TYPE: 4,
+}
 
 
 class FileExplorerToolbar(QWidget):
@@ -99,40 +116,25 @@ class FileItemDelegate(QStyledItemDelegate):
         painter.drawText(QRect(x, y, w, h), options, text)
 
 class CustomSortModel(QSortFilterProxyModel):
+    """
+    Filters the rows of TableViewModel, sorting is left to the source model
+    which sorts on precomputed keys instead of calling lessThan per comparison.
+    """
+
     def __init__(self):
         super(CustomSortModel, self).__init__()
 
-    def lessThan(self, left, right):
-        # left is of type # PyQt5.QtCore.QModelIndex
-
-        # Get items
-        items = self.sourceModel().items
-
-        # Extract file objects
-        left_file_object = items[left.row()]
-        right_file_object = items[right.row()]
+    def sort(self, column: int, order: Qt.SortOrder = Qt.AscendingOrder):
+        self.sourceModel().sort(column, order)
+        # Keep the source order
+        super(CustomSortModel, self).sort(-1, order)
 
-        # Extract file names
-        left_text = left_file_object.name
-        right_text = right_file_object.name
-
-        # Check whether these are directories or not
-        left_is_dir = left_file_object.isdir
-        right_is_dir = right_file_object.isdir
-
-        # Sort directories above files
-        if Settings.get_value(SettingsOptions.SORT_FOLDERS_BEFORE_FILES) is True:
-            if left_is_dir:
-                if not right_is_dir:
-                    return True if self.sortOrder() == Qt.AscendingOrder else False
-            elif right_is_dir:
-                return False if self.sortOrder() == Qt.AscendingOrder else True
-
-        # Sort items of the same type (file or directory) lexicographically.
-        if left_text.lower() < right_text.lower():
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        # Match the name directly instead of going through data() for every row
+        regexp = self.filterRegExp()
+        if regexp.isEmpty():
             return True
-        else:
-            return False
+        return regexp.indexIn(self.sourceModel().items[source_row].name or '') != -1
 
 
 # Creating the table model
@@ -140,18 +142,163 @@ class TableViewModel(QAbstractTableModel):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.items = []
+        self.sort_column = 0
+        self.sort_order = Qt.AscendingOrder
+        # natural_key() of the names in the listing
+        self.name_keys = {}
+        self.folders_first = Settings.get_value(SettingsOptions.SORT_FOLDERS_BEFORE_FILES)
+
+        # Informal dates like 'Yesterday' change at midnight
+        self.midnight_timer = QTimer(self)
+        self.midnight_timer.setSingleShot(True)
+        self.midnight_timer.timeout.connect(self.invalidate_display)
+        self.schedule_midnight()
+        Settings.signals.changed.connect(self.setting_changed)
+
+    def setting_changed(self, key: str, value):
+        if key == SettingsOptions.FILE_DATE_FORMAT:
+            self.invalidate_display()
+        elif key == SettingsOptions.SORT_FOLDERS_BEFORE_FILES:
+            self.folders_first = value
+            self.reorder()
+
+    def schedule_midnight(self):
+        now = datetime.datetime.now()
+        midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+        self.midnight_timer.start(int((midnight - now).total_seconds() * 1000) + 1000)
+
+    def invalidate_display(self):
+        """Drops the cached size, date and mime strings of every row"""
+        DisplayFormat.invalidate()
+        self.schedule_midnight()
+        if self.items:
+            self.dataChanged.emit(self.index(0, 2), self.index(len(self.items) - 1, len(HEADER) - 1))
 
     def clear(self):
         self.beginResetModel()
         self.items.clear()
+        self.name_keys = {}
         self.endResetModel()
 
     def populate(self, files: list):
         self.beginResetModel()
-        self.items.clear()
-        self.items = files
+        self.name_keys = {}
+        self.items = self.sorted(files, self.sort_column, self.sort_order)
         self.endResetModel()
 
+    def extend(self, files: list):
+        """Appends rows of a listing which is still running, finish() sorts them"""
+        if not files:
+            return
+        start = len(self.items)
+        self.beginInsertRows(QModelIndex(), start, start + len(files) - 1)
+        self.items.extend(files)
+        self.endInsertRows()
+
+    def finish(self):
+        # Link types are known once the whole listing has been read
+        self.reorder()
+        if self.items:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self.items) - 1, len(HEADER) - 1))
+
+    @staticmethod
+    def natural_key(name: str) -> tuple:
+        # 'file10' after 'file9', digits are compared as numbers
+        parts = NATURAL_SPLIT.split(name.lower())
+        parts[1::2] = map(int, parts[1::2])
+        return tuple(parts)
+
+    def sorted(self, files: list, column: int, order: Qt.SortOrder) -> list:
+        """
+        Sorts on keys computed once per row, the comparisons run in C.
+        Ties are ordered by name and folders stay above files in both orders.
+        """
+        names = [self.name_keys.get(f.name) for f in files]
+        for row, key in enumerate(names):
+            if key is None:
+                names[row] = self.name_keys[files[row].name] = self.natural_key(files[row].name or '')
+
+        if column == 1:
+            keys = [(f.permissions or '', key) for f, key in zip(files, names)]
+        elif column == 2:
+            keys = [(f.raw_size, key) for f, key in zip(files, names)]
+        elif column == 3:
+            keys = [(f.raw_date or datetime.datetime.min, key) for f, key in zip(files, names)]
+        elif column == 4:
+            keys = [(f.mime_type, key) for f, key in zip(files, names)]
+        else:
+            keys = names
+
+        descending = order == Qt.DescendingOrder
+        if self.folders_first is True:
+            # reverse=True flips the folder flag as well
+            keys = [(f.isdir == descending, key) for f, key in zip(files, keys)]
+        rows = sorted(range(len(files)), key=keys.__getitem__, reverse=descending)
+        return [files[row] for row in rows]
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.AscendingOrder):
+        # QTableView.sortByColumn() asks twice, the items are kept sorted by the current column
+        if (column, order) == (self.sort_column, self.sort_order):
+            return
+        self.sort_column = column
+        self.sort_order = order
+        self.reorder()
+
+    def reorder(self):
+        if not self.items:
+            return
+
+        self.layoutAboutToBeChanged.emit()
+        items = self.sorted(self.items, self.sort_column, self.sort_order)
+        rows = {id(file_object): row for row, file_object in enumerate(items)}
+        persistent = self.persistentIndexList()
+        self.changePersistentIndexList(persistent, [
+            self.index(rows[id(self.items[index.row()])], index.column()) for index in persistent
+        ])
+        self.items = items
+        self.layoutChanged.emit()
+
+    @staticmethod
+    def signature(file_object) -> tuple:
+        return (file_object.permissions, file_object.raw_size, file_object.raw_date,
+                file_object.link, file_object.link_type)
+
+    def apply(self, files: list):
+        """
+        Replace items with a fresh listing of the same folder, emitting row
+        removals, changes and insertions only for the rows which differ.
+        """
+        fresh = {f.name: f for f in files}
+
+        row = len(self.items) - 1
+        while row >= 0:
+            if self.items[row].name in fresh:
+                row -= 1
+                continue
+            last = row
+            while row > 0 and self.items[row - 1].name not in fresh:
+                row -= 1
+            self.beginRemoveRows(QModelIndex(), row, last)
+            del self.items[row:last + 1]
+            self.endRemoveRows()
+            row -= 1
+
+        changed = False
+        for row, file_object in enumerate(self.items):
+            new_object = fresh.pop(file_object.name)
+            self.items[row] = new_object
+            if self.signature(file_object) != self.signature(new_object):
+                changed = True
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(HEADER) - 1))
+
+        if fresh:
+            start = len(self.items)
+            self.beginInsertRows(QModelIndex(), start, start + len(fresh) - 1)
+            self.items.extend(fresh.values())
+            self.endInsertRows()
+        if fresh or changed:
+            self.reorder()
+
     def headerData(self, section, orientation, role):
         if role == Qt.DisplayRole and orientation == Qt.Horizontal:
             return HEADER[section]
@@ -169,21 +316,12 @@ class TableViewModel(QAbstractTableModel):
                 return file_object.name
             if col == 1:
                 return file_object.permissions
-            if col == 2:
-                return file_object.size
-            if col == 3:
-                return file_object.date
-            if col == 4:
-                file_type = file_object.type
-                if file_type == FileType.DIRECTORY:
-                    return ""
-                if file_type == FileType.FILE:
-                    ext = os.path.splitext(file_object.name)[1]
-                    if ext in MimeTypesLookUp.keys():
-                        return MimeTypesLookUp[ext]
-                    return ""
+            if col > 1:
+                return file_object.strings()[col - 1]
+        if role == Qt.ToolTipRole and col == 0:
+            return file_object.path
         if role == Qt.DecorationRole and col == 0:
-            return QPixmap(self.icon(file_object)).scaled(32, 32, Qt.KeepAspectRatio)
+            return IconCache.pixmap(self.icon(file_object), ICON_SIZE)
         if role == Qt.FontRole and col == 1:
             font = QFont("monospace")
             font.setStyleHint(QFont.Monospace)
@@ -196,18 +334,21 @@ class TableViewModel(QAbstractTableModel):
         if role == Qt.EditRole and value:
             print(f"setData: {file_object.name} -> {value}")
             if file_object.name != value:
-                _, error = FileRepository.rename(file_object, value)
-                if error:
-                    Global().communicate.notification.emit(
-                        MessageData(
-                            timeout=10000,
-                            title="Rename",
-                            body=f"<span style='color: red; font-weight: 600'> {error} </span>",
-                        )
-                    )
-                Global.communicate.files_refresh.emit()
+                Operations.run("Rename", FileRepository.rename, (file_object, value), self.rename_response)
         return super(TableViewModel, self).setData(index, value, role)
 
+    @staticmethod
+    def rename_response(_, error):
+        if error:
+            Global().communicate.notification.emit(
+                MessageData(
+                    timeout=10000,
+                    title="Rename",
+                    body=f"<span style='color: red; font-weight: 600'> {error} </span>",
+                )
+            )
+        Global.communicate.files_refresh.emit()
+
     def flags(self, index) -> Qt.ItemFlags:
         if not index.isValid():
             return Qt.NoItemFlags
@@ -251,7 +392,8 @@ class TableViewModel(QAbstractTableModel):
 
 class FileExplorerWidget(QWidget):
     FILES_WORKER_ID = 300
-    DOWNLOAD_WORKER_ID = 399
+    INDEX_WORKER_ID = 396
+    SYNC_WORKER_ID = 397
 
     def __init__(self, parent=None):
         super(FileExplorerWidget, self).__init__(parent)
@@ -274,6 +416,8 @@ class FileExplorerWidget(QWidget):
         self.table_sorting_model.setFilterKeyColumn(0)
         Global().communicate.search_text_update.connect(self._change_search_text)
         Global().communicate.search_case_update.connect(self._change_search_case_sensitivity)
+        Global().communicate.search_global_mode.connect(self._change_search_global_mode)
+        Global().communicate.search_global.connect(self._search_global)
 
         # Setup the QTableView to enable sorting
         self.table_view = QTableView()
@@ -297,6 +441,12 @@ class FileExplorerWidget(QWidget):
         self.table_view.installEventFilter(self)
 
         self.navigation_dict = dict()
+        # Rows of the running listing which are shown already
+        self.streamed_rows = 0
+        # Folder of the rows on screen
+        self.shown_path = None
+        # Only the results of the latest global search are shown
+        self.search_text = None
 
         # Customize tableview header
         self.table_header = self.table_view.horizontalHeader()
@@ -315,17 +465,10 @@ class FileExplorerWidget(QWidget):
         self.table_header.setSectionResizeMode(3, QHeaderView.ResizeToContents)
         self.table_header.setSectionResizeMode(4, QHeaderView.ResizeToContents)
 
-        if Settings.get_value(SettingsOptions.HEADER_PERMISSION) is False:
-            self.table_view.setColumnHidden(1, True)
-
-        if Settings.get_value(SettingsOptions.HEADER_SIZE) is False:
-            self.table_view.setColumnHidden(2, True)
-
-        if Settings.get_value(SettingsOptions.HEADER_DATE) is False:
-            self.table_view.setColumnHidden(3, True)
-
-        if Settings.get_value(SettingsOptions.HEADER_MIME_TYPE) is False:
-            self.table_view.setColumnHidden(4, True)
+        for key, column in HEADER_OPTIONS.items():
+            if Settings.get_value(key) is False:
+                self.table_view.setColumnHidden(column, True)
+        Settings.signals.changed.connect(self.setting_changed)
 
         # self.table_view.horizontalHeader().setStretchLastSection(True)
 
@@ -361,18 +504,13 @@ class FileExplorerWidget(QWidget):
         Global().communicate.status_bar_device_label.emit(name)
 
         # Emit Android version for status bar
-        lines = ['']
-        data, _ = FileRepository.android_version()
-        if data:
-            lines = data.splitlines()
-        Global().communicate.status_bar_android_version.emit(lines[0])
-
-        # Emit Android root/unroot status for status bar
-        data, _ = FileRepository.is_android_root()
-        Global().communicate.status_bar_is_root.emit(data)
+        Operations.run(
+            "Device info", FileRepository.device_info, (),
+            lambda data, _: Global().communicate.status_bar_android_version.emit((data or {}).get('android_version', ''))
+        )
 
-        # Setup thread to monitor device
-        self.device_status_thread = DeviceStatusThread(Settings.get_value(SettingsOptions.STATUSBAR_UPDATE_TIME))
+        # Battery and root status for status bar, the first sample emits all of them
+        self.device_status_thread = DeviceTelemetry(Settings.get_value(SettingsOptions.STATUSBAR_UPDATE_TIME))
         self.device_status_thread.start()
 
     def dragEnterEvent(self, event):
@@ -383,12 +521,15 @@ class FileExplorerWidget(QWidget):
 
     def dropEvent(self, event):
         drag_objects = [u.toLocalFile() for u in event.mimeData().urls()]
+        uploads = []
         for obj in drag_objects:
             if os.path.isdir(obj) or os.path.isfile(obj):
-                self.uploader.setup([obj])
-                self.uploader.upload()
+                uploads.append(obj)
             else:
                 print("Drag object is not file or folder")
+        if uploads:
+            self.uploader.setup(uploads)
+            self.uploader.upload()
 
     def _change_search_text(self, val):
         print(f"SearchBar: SearchText -> {val}")
@@ -406,6 +547,53 @@ class FileExplorerWidget(QWidget):
         else:
             self.table_sorting_model.setFilterCaseSensitivity(Qt.CaseInsensitive)
 
+    def _change_search_global_mode(self, enabled: bool):
+        if not enabled:
+            self.search_text = None
+            Global().communicate.files_refresh.emit()
+            return
+
+        # Bring the index up to date, only changed directories are listed again
+        worker = AsyncRepositoryWorker(
+            worker_id=self.INDEX_WORKER_ID,
+            pool=Executor.BULK,
+            name="Index",
+            repository_method=FileIndex.update,
+            response_callback=lambda data, error: FileExplorerWidget.show_notification(
+                data, error, 'Index', 'Index error'),
+            arguments=()
+        )
+        if Adb.worker().work(worker):
+            Global().communicate.notification.emit(
+                MessageData(
+                    title='Index',
+                    body="Indexing device files, search results may be incomplete until it finishes",
+                    message_type=MessageType.LOADING_MESSAGE,
+                    message_catcher=worker.set_loading_widget
+                )
+            )
+            worker.start()
+
+    def _search_global(self, text: str):
+        self.search_text = text
+        Operations.run(
+            "Search", FileIndex.search, (text,), lambda files, error: self._search_global_response(text, files, error)
+        )
+
+    def _search_global_response(self, text: str, files: list, error: str):
+        if text != self.search_text:
+            return
+        if error:
+            FileExplorerWidget.show_notification(None, error, 'Search', 'Search error')
+            return
+        self._show_files(files)
+        # Search results, the next refresh starts over
+        self.shown_path = None
+        Global().communicate.status_bar_general.emit(
+            f"Search '{text}': {len(files)} result(s)" + (" (limited)" if len(files) >= FileIndex.SEARCH_LIMIT else ""),
+            5000
+        )
+
     def _get_selected_items(self):
         """
         Return selected items as list of tuples where each
@@ -451,25 +639,46 @@ class FileExplorerWidget(QWidget):
 
     def update(self):
         super(FileExplorerWidget, self).update()
+        path = Adb.manager().get_current_path()
+        cached = FileRepository.cached_files()
+        # Refresh of the folder on screen, the rows are diffed so selection and scroll position stay
+        refresh = path == self.shown_path and not self.table_view.isHidden()
+        revalidate = refresh or cached is not None
+        self.streamed_rows = 0
         worker = AsyncRepositoryWorker(
             name="Files",
             worker_id=self.FILES_WORKER_ID,
             repository_method=FileRepository.files,
-            response_callback=self._async_response,
+            response_callback=lambda files, error: self._async_response(files, error, path, revalidate),
+            # Shown rows are revalidated as a whole, otherwise rows are shown while they arrive
+            partial_callback=None if revalidate else lambda files: self._partial_response(files, path),
             arguments=()
         )
         if Adb.worker().work(worker):
-            # First Setup loading view
-            self.table_model.clear()
-            self.table_view.setHidden(True)
-            self.loading.setHidden(False)
-            self.empty_label.setHidden(True)
-            self.loading_movie.start()
+            if refresh:
+                pass
+            elif cached is not None:
+                # Show the cached listing right away, the worker revalidates it
+                self.loading_movie.stop()
+                self.loading.setHidden(True)
+                self._show_files(cached)
+            else:
+                # First Setup loading view
+                self.shown_path = None
+                self.table_model.clear()
+                self.table_view.setHidden(True)
+                self.loading.setHidden(False)
+                self.empty_label.setHidden(True)
+                self.loading_movie.start()
 
             # Then start async worker
             worker.start()
             Global().communicate.path_toolbar_refresh.emit()
 
+    def setting_changed(self, key: str, value):
+        if key in HEADER_OPTIONS:
+            self.table_view.setColumnHidden(HEADER_OPTIONS[key], value is False)
+
     def app_close(self):
         self.device_status_thread.stop()
         Global().communicate.files_refresh.disconnect()
@@ -478,7 +687,33 @@ class FileExplorerWidget(QWidget):
         self.app_close()
         return super(FileExplorerWidget, self).close()
 
-    def _async_response(self, files: list, error: str):
+    def _partial_response(self, files: list, path: str):
+        if path != Adb.manager().get_current_path():
+            return
+        if not self.streamed_rows:
+            self.loading_movie.stop()
+            self.loading.setHidden(True)
+            self.empty_label.setHidden(True)
+            self.table_view.setHidden(False)
+        self.streamed_rows += len(files)
+        self.table_model.extend(files)
+
+    def _async_response(self, files: list, error: str, path: str = None, revalidate: bool = False):
+        if path and path != Adb.manager().get_current_path():
+            # User moved on to another folder meanwhile
+            return
+
+        streamed = self.streamed_rows
+        self.streamed_rows = 0
+        if streamed and files is not None and len(files) == len(self.table_model.items):
+            # The rows are in the table already
+            print(f"FileExplorerWidget: Streamed {streamed} rows (Path: {Adb.manager().get_current_path()})")
+            Global().communicate.device_connect.emit()
+            self.table_model.finish()
+            self.shown_path = path
+            self.restore_selection()
+            return
+
         self.loading_movie.stop()
         self.loading.setHidden(True)
 
@@ -496,23 +731,43 @@ class FileExplorerWidget(QWidget):
                         body=f"<span style='color: red; font-weight: 600'> {error} </span>"
                     )
                 )
+        if revalidate and error and not files and not self.table_view.isHidden():
+            # Keep the rows on screen, the error was reported above
+            return
+        if revalidate and files and not self.table_view.isHidden():
+            print(f"FileExplorerWidget: Revalidated (Path: {Adb.manager().get_current_path()})")
+            # Keep the first visible row in place when rows above it come or go
+            top = QPersistentModelIndex(self.table_view.indexAt(QPoint(0, 0)))
+            scrolled = self.table_view.verticalScrollBar().value() > 0
+            self.table_model.apply(files)
+            if scrolled and top.isValid():
+                self.table_view.scrollTo(self.table_sorting_model.index(top.row(), 0), QTableView.PositionAtTop)
+        else:
+            self._show_files(files)
+
+    def _show_files(self, files: list):
+        self.shown_path = Adb.manager().get_current_path()
         if not files:
             self.table_view.setHidden(True)
             self.empty_label.setHidden(False)
         else:
             print(f"FileExplorerWidget: Refreshed (Path: {Adb.manager().get_current_path()})")
             Global().communicate.device_connect.emit()
+            self.empty_label.setHidden(True)
             self.table_view.setHidden(False)
             self.table_model.populate(files)
-            self.table_view.setFocus()
+            self.restore_selection()
 
-            curr_path = Adb.manager().get_current_path()
-            cur_row = self.navigation_dict.get(curr_path, None)
-            if cur_row is not None:
-                print("FileExplorerWidget: Refreshed -- restore selection")
-                self.table_view.setCurrentIndex(cur_row)
-                self.table_view.selectRow(cur_row.row())
-                self.navigation_dict.pop(curr_path)
+    def restore_selection(self):
+        self.table_view.setFocus()
+
+        curr_path = Adb.manager().get_current_path()
+        cur_row = self.navigation_dict.get(curr_path, None)
+        if cur_row is not None:
+            print("FileExplorerWidget: Refreshed -- restore selection")
+            self.table_view.setCurrentIndex(cur_row)
+            self.table_view.selectRow(cur_row.row())
+            self.navigation_dict.pop(curr_path)
 
     def eventFilter(self, obj: 'QObject', event: 'QEvent') -> bool:
         # print(f"FileExplorerWidget: eventFilter (event: {QtEventsLookUp[event.type()]})")
@@ -577,6 +832,10 @@ class FileExplorerWidget(QWidget):
         action_upload_directory.triggered.connect(self.__action_upload_directory__)
         menu.addAction(action_upload_directory)
 
+        action_upload_archive = QAction('Upload directory as archive', self)
+        action_upload_archive.triggered.connect(self.toolbar.upload_tools.__action_upload_directory_archive__)
+        menu.addAction(action_upload_archive)
+
         action_upload_files = QAction('Upload files', self)
         action_upload_files.triggered.connect(self.__action_upload_files__)
         menu.addAction(action_upload_files)
@@ -615,6 +874,10 @@ class FileExplorerWidget(QWidget):
         action_download_to_n_delete.triggered.connect(self.download_to_n_delete)
         menu.addAction(action_download_to_n_delete)
 
+        action_sync = QAction('Sync with local folder...', self)
+        action_sync.triggered.connect(self.sync_folder)
+        menu.addAction(action_sync)
+
         menu.addSeparator()
 
         action_properties = QAction('Properties', self)
@@ -642,18 +905,18 @@ class FileExplorerWidget(QWidget):
                 )
             )
 
+    # Successful transfers are summarized once the transfer queue drains
     @staticmethod
-    def default_download_response(data, error):
+    def default_download_response(_data, error):
         if error:
             print(f"download_reponse: {error}")
-        FileExplorerWidget.show_notification(data, error, 'Downloaded', 'Download error')
+        FileExplorerWidget.show_notification(None, error, 'Downloaded', 'Download error')
 
     @staticmethod
-    def default_download_n_delete_response(data, error):
+    def default_download_n_delete_response(_data, error):
         if error:
             print(f"download_n_delete_response: {error}")
-        FileExplorerWidget.show_notification(data, error, 'Downloaded n Deleted', 'Download/Delete error')
-        Global.communicate.files_refresh.emit()
+        FileExplorerWidget.show_notification(None, error, 'Downloaded n Deleted', 'Download/Delete error')
 
     def rename(self):
         self.table_view.edit(self.table_view.currentIndex())
@@ -679,18 +942,23 @@ class FileExplorerWidget(QWidget):
                 self.navigation_dict[curr_path] = selected_row
                 Global().communicate.files_refresh.emit()
         else:
-            data, error = FileRepository.open_file(file_object)
-            if error:
-                Global().communicate.notification.emit(
-                    MessageData(
-                        title='File',
-                        timeout=Settings.get_value(SettingsOptions.NOTIFICATION_TIMEOUT),
-                        body=f"<span style='color: red; font-weight: 600'> {error} </span>"
-                    )
+            Operations.run(
+                "Open file", FileRepository.open_file, (file_object,),
+                lambda data, error: self._open_file_response(file_object, data, error)
+            )
+
+    def _open_file_response(self, file_object, data, error):
+        if error:
+            Global().communicate.notification.emit(
+                MessageData(
+                    title='File',
+                    timeout=Settings.get_value(SettingsOptions.NOTIFICATION_TIMEOUT),
+                    body=f"<span style='color: red; font-weight: 600'> {error} </span>"
                 )
-            else:
-                self.text_view_window = TextView(file_object.name, data)
-                self.text_view_window.show()
+            )
+        else:
+            self.text_view_window = TextView(file_object.name, data)
+            self.text_view_window.show()
 
     def delete(self):
         file_names = '\n'.join(map(lambda f: f.name, self.files))
@@ -711,26 +979,32 @@ class FileExplorerWidget(QWidget):
         )
 
         if reply == QMessageBox.Yes:
-            for file in self.files:
-                # TODO: show busy loading here
-                data, error = FileRepository.delete(file)
-                if data:
-                    Global().communicate.notification.emit(
-                        MessageData(
-                            timeout=Settings.get_value(SettingsOptions.NOTIFICATION_TIMEOUT),
-                            title="Delete",
-                            body=data,
-                        )
+            Operations.run("Delete", self.delete_files, (self.files,), self._delete_response)
+
+    @staticmethod
+    def delete_files(files: list) -> Tuple[list, str]:
+        return [FileRepository.delete(file) for file in files], None
+
+    @staticmethod
+    def _delete_response(results: list, _):
+        for data, error in results or []:
+            if data:
+                Global().communicate.notification.emit(
+                    MessageData(
+                        timeout=Settings.get_value(SettingsOptions.NOTIFICATION_TIMEOUT),
+                        title="Delete",
+                        body=data,
                     )
-                if error:
-                    Global().communicate.notification.emit(
-                        MessageData(
-                            timeout=Settings.get_value(SettingsOptions.NOTIFICATION_TIMEOUT),
-                            title="Delete",
-                            body=f"<span style='color: red; font-weight: 600'>{error}</span>",
-                        )
+                )
+            if error:
+                Global().communicate.notification.emit(
+                    MessageData(
+                        timeout=Settings.get_value(SettingsOptions.NOTIFICATION_TIMEOUT),
+                        title="Delete",
+                        body=f"<span style='color: red; font-weight: 600'>{error}</span>",
                     )
-            Global.communicate.files_refresh.emit()
+                )
+        Global.communicate.files_refresh.emit()
 
     def download_to(self, delete_too: bool = False):
         dir_name = QFileDialog.getExistingDirectory(self, 'Download to', '~')
@@ -742,35 +1016,90 @@ class FileExplorerWidget(QWidget):
         if delete_too:
             callback = self.default_download_n_delete_response
 
+        device = Adb.manager().get_device()
         for file in self.files:
-            # Build title of the notification card
-            title = "Download "
-            if delete_too:
-                title += "n Delete "
-            print(f"download_files: {title} -> destination({destination})")
-
-            # Setup job
-            helper = ProgressCallbackHelper()
-            worker = AsyncRepositoryWorker(
-                worker_id=self.DOWNLOAD_WORKER_ID,
-                name=title,
-                repository_method=FileRepository.download,
-                response_callback=callback,
-                arguments=(
-                    helper.progress_callback.emit, file, destination, delete_too
+            print(f"download_files: {file.name} -> destination({destination})")
+            TransferQueue.add(
+                Transfer(
+                    name=file.name,
+                    kind=TransferType.DOWNLOAD,
+                    method=FileRepository.download,
+                    arguments=(file, destination, delete_too),
+                    device_id=device.id if device else None,
+                    size=0 if file.isdir else file.raw_size,
+                    callback=callback,
+                    refresh=delete_too,
+                    max_retries=Settings.get_value(SettingsOptions.TRANSFER_RETRIES)
                 )
             )
-            if Adb.worker().work(worker):
-                Global().communicate.notification.emit(
-                    MessageData(
-                        title=title,
-                        body=file.name,
-                        message_type=MessageType.LOADING_MESSAGE,
-                        message_catcher=worker.set_loading_widget
-                    )
+
+    def sync_folder(self):
+        # Selected folder, or the current one
+        remote = Adb.manager().get_current_path()
+        if self.file and self.file.isdir:
+            remote = self.file.path
+
+        local = QFileDialog.getExistingDirectory(self, f'Sync {remote} with', '~')
+        if not local:
+            return
+        directions = [SyncDirection.BOTH, SyncDirection.PULL, SyncDirection.PUSH]
+        direction, ok = QInputDialog.getItem(self, 'Sync', 'Direction:', directions, 0, False)
+        if not ok:
+            return
+
+        worker = AsyncRepositoryWorker(
+            worker_id=self.SYNC_WORKER_ID,
+            pool=Executor.BULK,
+            name="Sync plan",
+            repository_method=FolderSync.plan,
+            response_callback=self._sync_plan_response,
+            arguments=(remote, local, direction, Settings.get_value(SettingsOptions.SYNC_CHECKSUM))
+        )
+        if Adb.worker().work(worker):
+            Global().communicate.notification.emit(
+                MessageData(
+                    title='Sync',
+                    body="Comparing folders, please wait",
+                    message_type=MessageType.LOADING_MESSAGE,
+                    message_catcher=worker.set_loading_widget
                 )
-                helper.setup(worker, worker.update_loading_widget)
-                worker.start()
+            )
+            worker.start()
+
+    def _sync_plan_response(self, plan, error):
+        if error or not plan:
+            FileExplorerWidget.show_notification(None, error, 'Sync', 'Sync error')
+            return
+
+        # Dry-run: show the plan before anything is transferred
+        if not plan.transfers:
+            # Only the state is recorded
+            Operations.run(
+                "Sync", FolderSync.apply, (lambda *args: None, plan),
+                lambda data, error: FileExplorerWidget.show_notification(plan.summary(), error, 'Sync', 'Sync error')
+            )
+            return
+
+        dialog = QMessageBox(self)
+        dialog.setWindowTitle('Sync')
+        dialog.setText(f"{plan.remote} <-> {plan.local}\n\n{plan.summary()}\n\nApply these changes?")
+        dialog.setDetailedText("\n".join(str(item) for item in plan.transfers))
+        dialog.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+        dialog.setDefaultButton(QMessageBox.No)
+        if dialog.exec_() != QMessageBox.Yes:
+            return
+
+        TransferQueue.add(
+            Transfer(
+                name=f"Sync {plan.remote}",
+                kind=TransferType.SYNC,
+                method=FolderSync.apply,
+                arguments=(plan,),
+                device_id=plan.device_id,
+                callback=lambda data, error: FileExplorerWidget.show_notification(data, error, 'Sync', 'Sync error'),
+                refresh=True
+            )
+        )
 
     def download_n_delete_files(self):
         self.download_files(delete_too=True)
@@ -796,7 +1125,7 @@ class FileExplorerWidget(QWidget):
 
         properties = QMessageBox(self)
         properties.setStyleSheet("background-color: #DDDDDD")
-        icon = QPixmap(self.table_model.icon(self.file)).scaled(128, 128, Qt.KeepAspectRatio)
+        icon = IconCache.pixmap(self.table_model.icon(self.file), QSize(128, 128))
         properties.setIconPixmap(icon)
         properties.setWindowTitle('Properties')
         properties.setInformativeText(info)
@@ -823,24 +1152,7 @@ class FileExplorerWidget(QWidget):
         text, ok = QInputDialog.getText(self, 'New folder', 'Enter new folder name:')
 
         if ok and text:
-            data, error = FileRepository.new_folder(text)
-            if error:
-                Global().communicate.notification.emit(
-                    MessageData(
-                        timeout=Settings.get_value(SettingsOptions.NOTIFICATION_TIMEOUT),
-                        title="Creating folder",
-                        body=f"<span style='color: red; font-weight: 600'> {error} </span>",
-                    )
-                )
-            if data:
-                Global().communicate.notification.emit(
-                    MessageData(
-                        title="Creating folder",
-                        timeout=Settings.get_value(SettingsOptions.NOTIFICATION_TIMEOUT),
-                        body=data,
-                    )
-                )
-            Global().communicate.files_refresh.emit()
+            Operations.run("Creating folder", FileRepository.new_folder, (text,), UploadTools.create_folder_response)
 
 class TextView(QMainWindow):
     def __init__(self, filename, data):
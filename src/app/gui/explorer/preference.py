@@ -47,6 +47,16 @@ class PerferenceDialog(QDialog):
 
         adb_settings_grp_box_layout.addRow(self.widget_adb_as_root, self.widget_adb_kill_server_at_exit)
 
+        self.widget_transfer_parallel = QLineEdit()
+        self.widget_transfer_parallel.setValidator(QIntValidator(1, 16))
+        self.widget_transfer_parallel.setText(str(Settings.get_value(SettingsOptions.TRANSFER_PARALLEL)))
+        adb_settings_grp_box_layout.addRow("Parallel transfers:", self.widget_transfer_parallel)
+
+        self.widget_transfer_retries = QLineEdit()
+        self.widget_transfer_retries.setValidator(QIntValidator(0, 10))
+        self.widget_transfer_retries.setText(str(Settings.get_value(SettingsOptions.TRANSFER_RETRIES)))
+        adb_settings_grp_box_layout.addRow("Transfer retries:", self.widget_transfer_retries)
+
         # -- ADB key file
         self.adb_key_grp_box_layout = QGridLayout()
 
@@ -91,7 +101,11 @@ class PerferenceDialog(QDialog):
         self.widget_preserve_timestamp = QCheckBox(self.tr('Preserve timestamp'), self)
         if Settings.get_value(SettingsOptions.PRESERVE_TIMESTAMP) is True:
             self.widget_preserve_timestamp.setChecked(True)
-        general_grp_box_layout.addRow(self.widget_preserve_timestamp)
+
+        self.widget_sync_checksum = QCheckBox(self.tr('Compare checksums on sync'), self)
+        if Settings.get_value(SettingsOptions.SYNC_CHECKSUM) is True:
+            self.widget_sync_checksum.setChecked(True)
+        general_grp_box_layout.addRow(self.widget_preserve_timestamp, self.widget_sync_checksum)
 
         # -- Download folder group
         self.download_folder_grp_box_layout = QGridLayout()
@@ -125,6 +139,16 @@ class PerferenceDialog(QDialog):
             self.widget_sort_folders_before_file.setChecked(True)
         view_settings_grp_box_layout.addWidget(self.widget_sort_folders_before_file)
 
+        self.widget_listing_batch_size = QLineEdit()
+        self.widget_listing_batch_size.setValidator(QIntValidator(1, 100000))
+        self.widget_listing_batch_size.setText(str(Settings.get_value(SettingsOptions.LISTING_BATCH_SIZE)))
+        view_settings_grp_box_layout.addRow("Listing batch (rows):", self.widget_listing_batch_size)
+
+        self.widget_listing_flush_interval = QLineEdit()
+        self.widget_listing_flush_interval.setValidator(QIntValidator(10, 10000))
+        self.widget_listing_flush_interval.setText(str(Settings.get_value(SettingsOptions.LISTING_FLUSH_INTERVAL)))
+        view_settings_grp_box_layout.addRow("Listing flush interval (ms):", self.widget_listing_flush_interval)
+
         # HEADER = ['File', 'Permissions', 'Size', 'Date', 'MimeType']
         self.header_permission = QCheckBox(self.tr('Permission'), self)
         if Settings.get_value(SettingsOptions.HEADER_PERMISSION) is True:
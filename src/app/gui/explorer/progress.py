@@ -0,0 +1,55 @@
+# ADB File Explorer
+# Copyright (C) 2025  aakbar5
+
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import QLabel, QProgressBar, QVBoxLayout, QWidget
+
+from app.core.statistics import TransferStatistics
+from app.helpers.converters import convert_to_readable_duration, convert_to_readable_size
+
+
+class TransferPanel(QWidget):
+    """
+    Compact progress of the running transfer batch: current file, bytes of the batch,
+    smoothed rate and ETA. Refreshed every second from TransferStatistics.
+    """
+    INTERVAL = 1000
+
+    def __init__(self, parent: QWidget = None):
+        super(TransferPanel, self).__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(10, 5, 10, 10)
+        layout.setSpacing(2)
+
+        self.current = QLabel("Waiting...", self)
+        self.current.setTextFormat(Qt.PlainText)
+        self.progress = QProgressBar(self)
+        self.progress.setMaximumHeight(16)
+        self.progress.setAlignment(Qt.AlignCenter)
+        self.details = QLabel(self)
+        self.details.setStyleSheet("font-size: 12px;")
+        layout.addWidget(self.current)
+        layout.addWidget(self.progress)
+        layout.addWidget(self.details)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(self.INTERVAL)
+
+    def update_progress(self, title: str, progress: int):
+        self.current.setText(self.fontMetrics().elidedText(title, Qt.ElideMiddle, max(self.width() - 20, 200)))
+        self.progress.setValue(progress)
+
+    def refresh(self):
+        snapshot = TransferStatistics.snapshot()
+        if not snapshot:
+            return
+        size = convert_to_readable_size(snapshot['bytes'])
+        if snapshot['size'] > snapshot['bytes']:
+            size += f" of {convert_to_readable_size(snapshot['size'])}"
+        details = [f"{snapshot['files_done']}/{snapshot['files']} files", size]
+        if snapshot['rate']:
+            details.append(f"{convert_to_readable_size(snapshot['rate'])}/s")
+        if snapshot['eta'] is not None:
+            details.append(f"{convert_to_readable_duration(snapshot['eta'])} left")
+        self.details.setText(" · ".join(details))
@@ -1,15 +1,14 @@
 # ADB File Explorer
 # Copyright (C) 2023  aakbar5
 
-import threading
-
-from PyQt5.QtCore import (pyqtSignal, QObject, QSize)
-from PyQt5.QtGui import QIcon
+from PyQt5.QtCore import QSize
 from PyQt5.QtWidgets import (QHBoxLayout, QLabel, QWidget)
 
 from app.core.managers import Global
+from app.core.operations import Operations
 from app.core.resources import Resources
 from app.data.repositories import FileRepository
+from app.helpers.icons import IconCache
 
 
 class AndroidBatteryWidget(QWidget):
@@ -54,55 +53,55 @@ class AndroidBatteryWidget(QWidget):
             int_status = int(text_status)
 
             battery_sts = "??"
-            battery_icon = QIcon(Resources.icon_battery_xx).pixmap(self.IconSize)
+            battery_icon = IconCache.pixmap(Resources.icon_battery_xx, self.IconSize)
 
             if int_status == battery_status_full:
                 battery_sts = "100%"
-                battery_icon = QIcon(Resources.icon_battery_100).pixmap(self.IconSize)
+                battery_icon = IconCache.pixmap(Resources.icon_battery_100, self.IconSize)
             elif int_status == battery_status_charging:
                 if 1 <= int_level <= 10:
                     battery_sts = f"{int_level}%".ljust(5)
-                    battery_icon = QIcon(Resources.icon_battery_charging_10).pixmap(self.IconSize)
+                    battery_icon = IconCache.pixmap(Resources.icon_battery_charging_10, self.IconSize)
                 elif 11 <= int_level <= 20:
                     battery_sts = f"{int_level}%".ljust(5)
-                    battery_icon = QIcon(Resources.icon_battery_charging_20).pixmap(self.IconSize)
+                    battery_icon = IconCache.pixmap(Resources.icon_battery_charging_20, self.IconSize)
                 elif 21 <= int_level <= 40:
                     battery_sts = f"{int_level}%".ljust(5)
-                    battery_icon = QIcon(Resources.icon_battery_charging_40).pixmap(self.IconSize)
+                    battery_icon = IconCache.pixmap(Resources.icon_battery_charging_40, self.IconSize)
                 elif 41 <= int_level <= 60:
                     battery_sts = f"{int_level}%".ljust(5)
-                    battery_icon = QIcon(Resources.icon_battery_charging_60).pixmap(self.IconSize)
+                    battery_icon = IconCache.pixmap(Resources.icon_battery_charging_60, self.IconSize)
                 elif 61 <= int_level <= 80:
                     battery_sts = f"{int_level}%".ljust(5)
-                    battery_icon = QIcon(Resources.icon_battery_charging_80).pixmap(self.IconSize)
+                    battery_icon = IconCache.pixmap(Resources.icon_battery_charging_80, self.IconSize)
                 elif 81 <= int_level <= 99:
                     battery_sts = f"{int_level}%".ljust(5)
-                    battery_icon = QIcon(Resources.icon_battery_charging_90).pixmap(self.IconSize)
+                    battery_icon = IconCache.pixmap(Resources.icon_battery_charging_90, self.IconSize)
             elif int_status == battery_status_not_charging:
                 if 1 <= int_level <= 10:
                     battery_sts = f"{int_level}%".ljust(5)
-                    battery_icon = QIcon(Resources.icon_battery_normal_10).pixmap(self.IconSize)
+                    battery_icon = IconCache.pixmap(Resources.icon_battery_normal_10, self.IconSize)
                 elif 11 <= int_level <= 20:
                     battery_sts = f"{int_level}%".ljust(5)
-                    battery_icon = QIcon(Resources.icon_battery_normal_20).pixmap(self.IconSize)
+                    battery_icon = IconCache.pixmap(Resources.icon_battery_normal_20, self.IconSize)
                 elif 21 <= int_level <= 40:
                     battery_sts = f"{int_level}%".ljust(5)
-                    battery_icon = QIcon(Resources.icon_battery_normal_40).pixmap(self.IconSize)
+                    battery_icon = IconCache.pixmap(Resources.icon_battery_normal_40, self.IconSize)
                 elif 41 <= int_level <= 60:
                     battery_sts = f"{int_level}%".ljust(5)
-                    battery_icon = QIcon(Resources.icon_battery_normal_60).pixmap(self.IconSize)
+                    battery_icon = IconCache.pixmap(Resources.icon_battery_normal_60, self.IconSize)
                 elif 61 <= int_level <= 80:
                     battery_sts = f"{int_level}%".ljust(5)
-                    battery_icon = QIcon(Resources.icon_battery_normal_80).pixmap(self.IconSize)
+                    battery_icon = IconCache.pixmap(Resources.icon_battery_normal_80, self.IconSize)
                 elif 81 <= int_level <= 99:
                     battery_sts = f"{int_level}%".ljust(5)
-                    battery_icon = QIcon(Resources.icon_battery_normal_90).pixmap(self.IconSize)
+                    battery_icon = IconCache.pixmap(Resources.icon_battery_normal_90, self.IconSize)
             elif int_status == battery_status_discharging:
                 battery_sts = f"{int_level}%".ljust(5)
-                battery_icon = QIcon(Resources.icon_battery_xx).pixmap(self.IconSize)
+                battery_icon = IconCache.pixmap(Resources.icon_battery_xx, self.IconSize)
             elif int_status == battery_status_unknown:
                 battery_sts = f"{int_level}%".ljust(5)
-                battery_icon = QIcon(Resources.icon_battery_xx).pixmap(self.IconSize)
+                battery_icon = IconCache.pixmap(Resources.icon_battery_xx, self.IconSize)
 
             self.icon.setPixmap(battery_icon)
             self.icon.setVisible(True)
@@ -119,8 +118,8 @@ class AndroidRootWidget(QWidget):
         layout.setContentsMargins(0, 0, 0, 0)
         self.setLayout(layout)
 
-        self.lock_icon = QIcon(Resources.icon_lock).pixmap(self.IconSize)
-        self.unlock_icon = QIcon(Resources.icon_unlock).pixmap(self.IconSize)
+        self.lock_icon = IconCache.pixmap(Resources.icon_lock, self.IconSize)
+        self.unlock_icon = IconCache.pixmap(Resources.icon_unlock, self.IconSize)
 
         self.icon = QLabel()
         self.icon.setVisible(False)
@@ -160,7 +159,7 @@ class AndroidVersionWidget(QWidget):
         self.setLayout(layout)
 
         self.icon = QLabel()
-        self.icon.setPixmap(QIcon(self.IconResource).pixmap(self.IconSize))
+        self.icon.setPixmap(IconCache.pixmap(self.IconResource, self.IconSize))
         self.icon.setVisible(False)
         layout.addWidget(self.icon)
         layout.addSpacing(self.HorizontalSpacing)
@@ -195,7 +194,7 @@ class DeviceLabelWidget(QWidget):
         self.setLayout(layout)
 
         self.icon = QLabel()
-        self.icon.setPixmap(QIcon(self.IconResource).pixmap(self.IconSize))
+        self.icon.setPixmap(IconCache.pixmap(self.IconResource, self.IconSize))
         self.icon.setVisible(False)
         layout.addWidget(self.icon)
         layout.addSpacing(self.HorizontalSpacing)
@@ -217,42 +216,6 @@ class DeviceLabelWidget(QWidget):
             self.icon.setVisible(True)
             self.text_widget.setText(text)
 
-class DeviceStatusThread(threading.Thread, QObject):
-    finished = pyqtSignal()
-
-    def __init__(self, delay_mseconds=1000):
-        QObject.__init__(self)
-        print("DeviceStatusThread init is called...")
-
-        self._delay_sec = delay_mseconds / 1000
-        self._stop_event = threading.Event()
-        threading.Thread.__init__(self)
-
-    def run(self):
-        while not self._stop_event.is_set():
-
-            # Update battery status
-            lines_level = ['']
-            lines_sts = ['']
-            data_level, data_sts = FileRepository.battery_level()
-            if data_level:
-                lines_level = data_level.splitlines()
-            if data_sts:
-                lines_sts = data_sts.splitlines()
-            Global().communicate.status_bar_battery_level.emit(lines_level[0], lines_sts[0])
-
-            # Update root/unroot status
-            data, _ = FileRepository.is_android_root()
-            Global().communicate.status_bar_is_root.emit(data)
-
-            self._stop_event.wait(self._delay_sec)
-
-        print("DeviceStatusThread is finished...")
-        self.finished.emit()
-
-    def stop(self):
-        self._stop_event.set()
-
 class DeviceCameraWidget(QWidget):
     IconResource = Resources.icon_camera
     IconSize = QSize(16, 16)
@@ -266,7 +229,7 @@ class DeviceCameraWidget(QWidget):
         self.setLayout(layout)
 
         self.icon = QLabel()
-        self.icon.setPixmap(QIcon(self.IconResource).pixmap(self.IconSize))
+        self.icon.setPixmap(IconCache.pixmap(self.IconResource, self.IconSize))
         self.icon.setVisible(False)
         layout.addWidget(self.icon)
         layout.addSpacing(self.HorizontalSpacing)
@@ -293,7 +256,10 @@ class DeviceCameraWidget(QWidget):
             self.text_widget.setVisible(True)
 
     def clicked(self, event):
-        okay, file_name = FileRepository.capture_screenshot()
+        Operations.run("Screenshot", FileRepository.capture_screenshot, (), self.captured)
+
+    @staticmethod
+    def captured(okay, file_name):
         if okay is None:
             Global().communicate.status_bar_general.emit(f"Screenshot is captured ({file_name})", 3000)
             Global().communicate.files_refresh.emit()
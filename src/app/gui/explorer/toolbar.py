@@ -1,6 +1,8 @@
 # ADB File Explorer
 # Copyright (C) 2022  Azat Aldeshov
 
+import os
+
 from PyQt5 import (QtCore, QtGui)
 from PyQt5.QtCore import (QEvent, QObject)
 from PyQt5.QtGui import (QIcon, QCursor)
@@ -9,12 +11,14 @@ from PyQt5.QtWidgets import (QAction, QApplication, QFileDialog, QHBoxLayout,
 
 from app.core.adb import Adb
 from app.core.managers import Global
+from app.core.operations import Operations
 from app.core.resources import Resources
 from app.core.settings import SettingsOptions, Settings
-from app.data.models import MessageData, MessageType
+from app.core.transfers import Transfer, TransferQueue, TransferType
+from app.data.models import MessageData
 from app.data.repositories import FileRepository
+from app.helpers.icons import IconCache
 from app.helpers.lookup import QtEventsLookUp
-from app.helpers.tools import AsyncRepositoryWorker, ProgressCallbackHelper
 
 
 class UploadTools(QToolButton):
@@ -36,6 +40,10 @@ class UploadTools(QToolButton):
         upload_directory.triggered.connect(self.__action_upload_directory__)
         self.menu.addAction(upload_directory)
 
+        upload_archive = QAction(QIcon(Resources.icon_folder_upload), 'Upload directory as &archive', self)
+        upload_archive.triggered.connect(self.__action_upload_directory_archive__)
+        self.menu.addAction(upload_archive)
+
         upload_files = QAction(QIcon(Resources.icon_folder_create), '&Create folder', self)
         upload_files.triggered.connect(self.__action_create_folder__)
         self.menu.addAction(upload_files)
@@ -55,61 +63,67 @@ class UploadTools(QToolButton):
             self.uploader.setup([dir_name])
             self.uploader.upload()
 
+    def __action_upload_directory_archive__(self):
+        dir_name = QFileDialog.getExistingDirectory(self, 'Select directory', '~')
+
+        if dir_name:
+            self.uploader.setup([dir_name])
+            self.uploader.upload(bulk=True)
+
     def __action_create_folder__(self):
         text, ok = QInputDialog.getText(self, 'New folder', 'Enter new folder name:')
 
         if ok and text:
-            data, error = FileRepository.new_folder(text)
-            if error:
-                Global().communicate.notification.emit(
-                    MessageData(
-                        timeout=Settings.get_value(SettingsOptions.NOTIFICATION_TIMEOUT),
-                        title="Creating folder",
-                        body=f"<span style='color: red; font-weight: 600'> {error} </span>",
-                    )
+            Operations.run("Creating folder", FileRepository.new_folder, (text,), self.create_folder_response)
+
+    @staticmethod
+    def create_folder_response(data, error):
+        if error:
+            Global().communicate.notification.emit(
+                MessageData(
+                    timeout=Settings.get_value(SettingsOptions.NOTIFICATION_TIMEOUT),
+                    title="Creating folder",
+                    body=f"<span style='color: red; font-weight: 600'> {error} </span>",
                 )
-            if data:
-                Global().communicate.notification.emit(
-                    MessageData(
-                        title="Creating folder",
-                        timeout=Settings.get_value(SettingsOptions.NOTIFICATION_TIMEOUT),
-                        body=data,
-                    )
+            )
+        if data:
+            Global().communicate.notification.emit(
+                MessageData(
+                    title="Creating folder",
+                    timeout=Settings.get_value(SettingsOptions.NOTIFICATION_TIMEOUT),
+                    body=data,
                 )
-            Global().communicate.files_refresh.emit()
+            )
+        Global().communicate.files_refresh.emit()
 
     class FilesUploader:
-        UPLOAD_WORKER_ID = 398
-
         def __init__(self):
             self.files = []
 
         def setup(self, files: list):
             self.files = files
 
-        def upload(self, data=None, error=None):
-            if self.files:
-                helper = ProgressCallbackHelper()
-                worker = AsyncRepositoryWorker(
-                    worker_id=self.UPLOAD_WORKER_ID,
-                    name="Upload",
-                    repository_method=FileRepository.upload,
-                    response_callback=self.upload,
-                    arguments=(helper.progress_callback.emit, self.files.pop())
-                )
-                if Adb.worker().work(worker):
-                    Global().communicate.notification.emit(
-                        MessageData(
-                            title="Uploading",
-                            message_type=MessageType.LOADING_MESSAGE,
-                            message_catcher=worker.set_loading_widget
-                        )
+        def upload(self, bulk: bool = None):
+            device = Adb.manager().get_device()
+            destination = Adb.manager().get_current_path()
+            while self.files:
+                source = self.files.pop(0)
+                TransferQueue.add(
+                    Transfer(
+                        name=os.path.basename(os.path.normpath(source)),
+                        kind=TransferType.UPLOAD,
+                        method=FileRepository.upload,
+                        arguments=(source, destination, bulk),
+                        device_id=device.id if device else None,
+                        size=os.path.getsize(source) if os.path.isfile(source) else 0,
+                        callback=self.upload_response,
+                        refresh=True,
+                        max_retries=Settings.get_value(SettingsOptions.TRANSFER_RETRIES)
                     )
-                    helper.setup(worker, worker.update_loading_widget)
-                    worker.start()
-            else:
-                Global().communicate.files_refresh.emit()
+                )
 
+        @staticmethod
+        def upload_response(_data, error):
             if error:
                 Global().communicate.notification.emit(
                     MessageData(
@@ -118,14 +132,6 @@ class UploadTools(QToolButton):
                         body=f"<span style='color: red; font-weight: 600'> {error} </span>",
                     )
                 )
-            if data:
-                Global().communicate.notification.emit(
-                    MessageData(
-                        title='Uploaded',
-                        timeout=Settings.get_value(SettingsOptions.NOTIFICATION_TIMEOUT),
-                        body=data,
-                    )
-                )
 
 
 class HomeButton(QToolButton):
@@ -281,7 +287,7 @@ class PathBar(QWidget):
     def _history_menu_populate(self):
         self.history_menu.clear()
         for path in Adb.manager().get_all_paths():
-            path_action = self.history_menu.addAction(QIcon(Resources.icon_path_fork), path)
+            path_action = self.history_menu.addAction(IconCache.icon(Resources.icon_path_fork), path)
             path_action.setData(path)
 
     def _history_menu_action(self, action):
@@ -290,7 +296,13 @@ class PathBar(QWidget):
 
     def _open_action(self):
         self.text.clearFocus()
-        file, error = FileRepository.file(self.device_path)
+        path = Adb.manager().normalized_path(self.device_path)
+        Operations.run(
+            "Opening folder", FileRepository.stat_many, ([path],),
+            lambda files, error: self._open_response((files or {}).get(path), error)
+        )
+
+    def _open_response(self, file, error):
         if error:
             Global().communicate.path_toolbar_refresh.emit()
             Global().communicate.notification.emit(
@@ -336,19 +348,40 @@ class SearchBar(QWidget):
 
         self.layout().addWidget(self.case_sensitivity_btn)
 
+        self.global_btn = QToolButton(self)
+        self.global_btn.setStyleSheet("padding: 4;")
+        self.global_action = QAction('Global', self)
+        self.global_action.setToolTip('Search the whole device (index), press Enter to search. Use name* for a prefix')
+        self.global_action.setCheckable(True)
+        self.global_action.toggled.connect(self._change_global)
+        self.global_btn.setDefaultAction(self.global_action)
+        self.layout().addWidget(self.global_btn)
+
         self.layout().setContentsMargins(0, 0, 0, 0)
         Global().communicate.search_case_update.emit(self.case_sensitivity_val)
 
     def _text_update(self, text: str):
+        if self.global_action.isChecked():
+            return
         print("SearchBar: text field is updated -> ", text)
         Global().communicate.search_text_update.emit(text)
 
     def _text_enter(self):
         text = self.text.text()
+        if self.global_action.isChecked():
+            print("SearchBar: global search -> ", text)
+            Global().communicate.search_global.emit(text)
+            return
         self.text.clear()
         print("SearchBar: text field is entered -> ", text)
         Global().communicate.search_text_update.emit(text)
 
+    def _change_global(self, checked: bool):
+        self.text.setPlaceholderText('Search device...' if checked else '')
+        if checked:
+            Global().communicate.search_text_update.emit('')
+        Global().communicate.search_global_mode.emit(checked)
+
     def _change_case_sentivity(self):
         if self.case_sensitivity_val:
             self.case_sensitivity_val = False
@@ -1,19 +1,20 @@
 # ADB File Explorer
 # Copyright (C) 2022  Azat Aldeshov
 
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import (QIcon, QPixmap)
+from PyQt5.QtCore import QSize, Qt
+from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import (QApplication, QLabel, QWidget)
 
 from app.core.application import Application
 from app.core.resources import Resources
+from app.helpers.icons import IconCache
 
 
 class About(QWidget):
     def __init__(self):
         super(QWidget, self).__init__()
         icon = QLabel(self)
-        icon.setPixmap(QPixmap(Resources.icon_logo).scaled(64, 64, Qt.KeepAspectRatio))
+        icon.setPixmap(IconCache.pixmap(Resources.icon_logo, QSize(64, 64)))
         icon.move(168, 40)
         about_text = "<br/><br/>"
         about_text += "<b>ADB File Explorer</b><br/>"
@@ -6,13 +6,14 @@ from typing import Union
 from PyQt5 import (QtCore, QtGui)
 from PyQt5.QtCore import (QAbstractAnimation, QObject, QPoint,
                           QPropertyAnimation, QSize, Qt, QTimer)
-from PyQt5.QtGui import (QIcon, QMovie, QPainter, QPaintEvent)
+from PyQt5.QtGui import (QMovie, QPainter, QPaintEvent)
 from PyQt5.QtWidgets import (QFrame, QGraphicsDropShadowEffect, QGraphicsOpacityEffect,
                              QHBoxLayout, QLabel, QProgressBar, QPushButton, QScrollArea,
                              QSizePolicy, QStyle, QStyleOption, QVBoxLayout, QWidget)
 
 from app.core.resources import Resources
 from app.data.models import MessageType
+from app.helpers.icons import IconCache
 from app.helpers.tools import read_string_from_file
 
 
@@ -90,7 +91,7 @@ class BaseMessage(QWidget):
     def create_close(self):
         button = QPushButton(self)
         button.setObjectName("close")
-        button.setIcon(QIcon(Resources.icon_close))
+        button.setIcon(IconCache.icon(Resources.icon_close))
         button.setFixedSize(32, 32)
         button.setIconSize(QSize(10, 10))
         button.setStyleSheet(read_string_from_file(Resources.style_notification_button))
@@ -115,6 +116,7 @@ class LoadingMessage(BaseMessage):
 
         self.label = None
         self.progress = None
+        self.cancel_button = None
         self.create_loading()
         self.create_title(title)
         if not body:
@@ -140,6 +142,25 @@ class LoadingMessage(BaseMessage):
         if self.progress:
             self.progress.setValue(progress)
 
+    def set_cancel(self, callback: callable):
+        """Shows a Cancel button in the header which calls `callback` once"""
+        if not self.cancel_button:
+            self.cancel_button = QPushButton("Cancel", self)
+            self.cancel_button.setContentsMargins(0, 0, 5, 0)
+            self.header.addWidget(self.cancel_button)
+        self.cancel_button.setEnabled(True)
+        self.cancel_button.setText("Cancel")
+        try:
+            self.cancel_button.clicked.disconnect()
+        except TypeError:
+            pass
+        self.cancel_button.clicked.connect(lambda: self.__cancel(callback))
+
+    def __cancel(self, callback: callable):
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.setText("Cancelling...")
+        callback()
+
 
 class Message(BaseMessage):
     def __init__(self, parent: QWidget, title: str, body: Union[QWidget, str], timeout=5000):
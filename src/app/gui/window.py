@@ -5,16 +5,23 @@ from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import (QAction, qApp, QInputDialog, QMainWindow, QMenuBar, QMessageBox)
 
 from app.core.adb import Adb
+from app.core.executor import Executor
 from app.core.managers import Global
+from app.core.operations import Operations
 from app.core.resources import Resources
 from app.core.settings import SettingsOptions, Settings
+from app.core.statistics import TransferStatistics
+from app.core.transfers import TransferQueue, TransferState, TransferType
 from app.data.models import MessageData, MessageType
 from app.data.repositories import DeviceRepository
 from app.gui.explorer import MainExplorer
+from app.gui.explorer.bandwidth import BandwidthDialog
 from app.gui.explorer.preference import PerferenceDialog
+from app.gui.explorer.progress import TransferPanel
 from app.gui.explorer.statusbar import DeviceLabelWidget, AndroidVersionWidget, AndroidRootWidget, AndroidBatteryWidget, DeviceCameraWidget
 from app.gui.help import About
 from app.gui.notification import NotificationCenter
+from app.helpers.converters import convert_to_readable_duration, convert_to_readable_size
 from app.helpers.tools import AsyncRepositoryWorker
 
 
@@ -26,7 +33,9 @@ class MenuBar(QMenuBar):
         super(MenuBar, self).__init__(parent)
 
         self.about = About()
+        self.bandwidth_dialog = None
         self.file_menu = self.addMenu('&File')
+        self.transfers_menu = self.addMenu('&Transfers')
         self.help_menu = self.addMenu('&Help')
 
         self.connect_action = QAction(QIcon(Resources.icon_link), '&Connect', self)
@@ -57,10 +66,34 @@ class MenuBar(QMenuBar):
         exit_action.triggered.connect(qApp.quit)
         self.file_menu.addAction(exit_action)
 
+        self.pause_action = QAction('&Pause transfers', self)
+        self.pause_action.setCheckable(True)
+        self.pause_action.toggled.connect(self.pause_transfers)
+        self.transfers_menu.addAction(self.pause_action)
+
+        retry_action = QAction('&Retry failed transfers', self)
+        retry_action.triggered.connect(self.retry_transfers)
+        self.transfers_menu.addAction(retry_action)
+
+        rate_action = QAction('Transfer &rate...', self)
+        rate_action.triggered.connect(self.show_bandwidth_dialog)
+        self.transfers_menu.addAction(rate_action)
+
+        cancel_action = QAction('&Cancel all', self)
+        cancel_action.triggered.connect(self.cancel_all)
+        self.transfers_menu.addAction(cancel_action)
+
         about_action = QAction('About', self)
         about_action.triggered.connect(self.about.show)
         self.help_menu.addAction(about_action)
 
+    def show_bandwidth_dialog(self):
+        # Not modal, limits can be tuned while watching the running transfers
+        if not self.bandwidth_dialog:
+            self.bandwidth_dialog = BandwidthDialog(self)
+        self.bandwidth_dialog.show()
+        self.bandwidth_dialog.raise_()
+
     def show_perference_dialog(self):
         perf_dlg = PerferenceDialog()
         perf_dlg_ret = perf_dlg.exec_()
@@ -82,8 +115,35 @@ class MenuBar(QMenuBar):
             Settings.set_value(SettingsOptions.HEADER_SIZE, perf_dlg.header_size.isChecked())
             Settings.set_value(SettingsOptions.HEADER_DATE, perf_dlg.header_date.isChecked())
             Settings.set_value(SettingsOptions.HEADER_MIME_TYPE, perf_dlg.header_mime_type.isChecked())
+            Settings.set_value(SettingsOptions.TRANSFER_PARALLEL, perf_dlg.widget_transfer_parallel.text())
+            Settings.set_value(SettingsOptions.SYNC_CHECKSUM, perf_dlg.widget_sync_checksum.isChecked())
+            Settings.set_value(SettingsOptions.TRANSFER_RETRIES, perf_dlg.widget_transfer_retries.text())
+            Settings.set_value(SettingsOptions.LISTING_BATCH_SIZE, perf_dlg.widget_listing_batch_size.text())
+            Settings.set_value(SettingsOptions.LISTING_FLUSH_INTERVAL, perf_dlg.widget_listing_flush_interval.text())
             Global().communicate.files_refresh.emit()
 
+    @staticmethod
+    def pause_transfers(paused: bool):
+        if paused:
+            TransferQueue.pause()
+            Global().communicate.status_bar_general.emit('Transfers paused', 3000)
+        else:
+            TransferQueue.resume()
+            Global().communicate.status_bar_general.emit('Transfers resumed', 3000)
+
+    @staticmethod
+    def retry_transfers():
+        count = TransferQueue.retry_failed()
+        Global().communicate.status_bar_general.emit(f'Retrying {count} failed transfer(s)', 3000)
+
+    @staticmethod
+    def cancel_all():
+        """Cancels the transfers and every running repository call"""
+        count = TransferQueue.cancel_all()
+        Adb.worker().cancel_all()
+        Operations.cancel_all()
+        Global().communicate.status_bar_general.emit(f'Cancelled {count} transfer(s)', 3000)
+
     def disconnect(self):
         worker = AsyncRepositoryWorker(
             worker_id=self.DISCONNECT_WORKER_ID,
@@ -215,6 +275,14 @@ class MainWindow(QMainWindow):
         self.notification_center = NotificationCenter(self)
         Global().communicate.notification.connect(self.notify)
 
+        # One loading notification for all queued transfers
+        self.transfers_message = None
+        self.transfers_panel = None
+        TransferQueue.signals.started.connect(self.transfers_started)
+        TransferQueue.signals.progress.connect(self.transfers_progress)
+        TransferQueue.signals.finished.connect(self.transfer_finished)
+        TransferQueue.signals.batch_finished.connect(self.transfers_finished)
+
         if Settings.get_value(SettingsOptions.SHOW_WELCOME_MSG):
             # Welcome notification texts
             welcome_title = "Welcome to ADBFileExplorer!"
@@ -241,6 +309,56 @@ class MainWindow(QMainWindow):
         self.status_bar_battery.setVisible(False)
         self.status_bar_root.setVisible(False)
 
+    def transfers_started(self):
+        self.transfers_panel = TransferPanel()
+        self.transfers_message = self.notification_center.append_notification(
+            title='Transfers',
+            body=self.transfers_panel,
+            message_type=MessageType.LOADING_MESSAGE
+        )
+        self.transfers_message.set_cancel(TransferQueue.cancel_all)
+
+    def transfers_progress(self, title: str, progress: int):
+        if self.transfers_message:
+            self.transfers_panel.update_progress(title, progress)
+
+    @staticmethod
+    def transfer_finished(transfer):
+        # Cancelled transfers are reported by the batch summary only
+        if transfer.callback and transfer.state != TransferState.CANCELLED:
+            transfer.callback(transfer.data, transfer.error)
+
+    def transfers_finished(self, batch: list):
+        if self.transfers_message:
+            self.transfers_message.close()
+            self.transfers_message = None
+            self.transfers_panel = None
+
+        failed = [t for t in batch if t.state == TransferState.FAILED]
+        cancelled = [t for t in batch if t.state == TransferState.CANCELLED]
+        downloads = len([t for t in batch if t.kind == TransferType.DOWNLOAD and not t.error])
+        uploads = len([t for t in batch if t.kind == TransferType.UPLOAD and not t.error])
+        body = f"Downloaded: {downloads}<br/>Uploaded: {uploads}"
+        history = TransferStatistics.history()
+        if history and history[-1]['bytes']:
+            summary = history[-1]
+            body += f"<br/>{convert_to_readable_size(summary['bytes'])} in " \
+                    f"{convert_to_readable_duration(summary['elapsed'])} " \
+                    f"({convert_to_readable_size(summary['average_rate'])}/s)"
+        if cancelled:
+            body += f"<br/>Cancelled: {len(cancelled)}"
+        if failed:
+            body += f"<br/><span style='color: red; font-weight: 600'>Failed: {len(failed)}</span>"
+        Global().communicate.notification.emit(
+            MessageData(
+                title='Transfers finished',
+                timeout=Settings.get_value(SettingsOptions.NOTIFICATION_TIMEOUT),
+                body=body
+            )
+        )
+        if any(t.refresh for t in batch):
+            Global().communicate.files_refresh.emit()
+
     def notify(self, data: MessageData):
         message = self.notification_center.append_notification(
             title=data.title,
@@ -253,6 +371,11 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         Global().communicate.app_close.emit()
+        # Kills the adb processes of running operations, so the app does not wait for them
+        TransferQueue.cancel_all()
+        Adb.worker().cancel_all()
+        Operations.cancel_all()
+        Executor.shutdown()
 
         Settings.set_value("win_size", self.size())
         Settings.set_value("win_pos", self.pos())
@@ -0,0 +1,185 @@
+# ADB File Explorer
+# Copyright (C) 2025  aakbar5
+
+import io
+import logging
+import os
+import tarfile
+import time
+from typing import Tuple
+
+from app.core.bandwidth import Bandwidth
+
+# Directory trees with at least this many files and at most this average file size
+# are transferred as one tar stream instead of one sync request per file.
+BULK_MIN_FILES = 500
+BULK_MAX_AVERAGE_SIZE = 256 * 1024
+
+
+class EmptyArchiveError(tarfile.ReadError):
+    """The stream ended before the first archive member, e.g. there is no tar on the device"""
+
+
+def use_bulk(files: int, size: int) -> bool:
+    return files >= BULK_MIN_FILES and size / max(files, 1) <= BULK_MAX_AVERAGE_SIZE
+
+
+class IterStream(io.RawIOBase):
+    """
+    IterStream - readable binary stream over an iterator of bytes chunks,
+    e.g. AdbDevice.streaming_shell(decode=False).
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.leftover = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self.leftover:
+            try:
+                self.leftover = next(self.chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self.leftover))
+        buffer[:size] = self.leftover[:size]
+        self.leftover = self.leftover[size:]
+        return size
+
+
+def scan_tree(path: str) -> Tuple[int, int]:
+    """Number of files inside the local tree `path` and their total size in bytes"""
+    files, size = 0, 0
+    pending = [path]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        files += 1
+                        size += entry.stat(follow_symlinks=False).st_size
+        except OSError as error:
+            logging.warning("Could not scan %s: %s", path, error)
+    return files, size
+
+
+class CountingReader:
+    """Counts the bytes read from `stream`"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.count += len(data)
+        Bandwidth.throttle(len(data))
+        return data
+
+
+class CountingWriter:
+    """Counts the bytes written to `stream`"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    def write(self, data: bytes) -> int:
+        self.stream.write(data)
+        self.count += len(data)
+        Bandwidth.throttle(len(data))
+        return len(data)
+
+
+def _safe_member(member: tarfile.TarInfo, destination: str) -> tarfile.TarInfo:
+    # Skip members which would land outside of the destination (absolute names, '..', links out of the tree)
+    if hasattr(tarfile, 'data_filter'):
+        try:
+            return tarfile.data_filter(member, destination)
+        except tarfile.FilterError as error:
+            logging.warning("Skipped archive member %s: %s", member.name, error)
+            return None
+
+    name = os.path.normpath(member.name)
+    if os.path.isabs(name) or name.startswith('..') or not (member.isfile() or member.isdir() or member.issym()):
+        return None
+    if member.issym():
+        target = os.path.normpath(os.path.join(os.path.dirname(name), member.linkname))
+        if os.path.isabs(member.linkname) or target.startswith('..'):
+            return None
+    return member
+
+
+def extract_stream(stream, destination: str, progress_callback: callable, files: int, size: int,
+                   preserve_timestamp: bool = True) -> Tuple[int, int]:
+    """
+    Extracts a tar stream into `destination` while reading it, nothing is buffered on disk.
+    `files` and `size` are the expected totals, progress_callback: (path, percent).
+    Returns the number of extracted files and the number of bytes read.
+    Raises EmptyArchiveError when not even one member could be read.
+    """
+    reader = CountingReader(stream)
+    # Every member adds a 512 bytes header and pads its data to 512 bytes
+    expected = max(size + files * 2 * tarfile.BLOCKSIZE, 1)
+    extracted = 0
+    members = 0
+    options = {'filter': 'fully_trusted'} if hasattr(tarfile, 'fully_trusted_filter') else {}
+
+    try:
+        with tarfile.open(fileobj=reader, mode='r|') as archive:
+            for member in archive:
+                members += 1
+                member = _safe_member(member, destination)
+                if member is None:
+                    continue
+                if not preserve_timestamp:
+                    member.mtime = time.time()
+                archive.extract(member, destination, **options)
+                if member.isfile():
+                    extracted += 1
+                progress_callback(f"{member.name} ({extracted}/{files})", min(99, int(reader.count / expected * 100)))
+    except tarfile.ReadError as error:
+        if not members:
+            raise EmptyArchiveError(str(error)) from error
+        raise
+    return extracted, reader.count
+
+
+def write_stream(stream, source: str, progress_callback: callable, files: int, size: int) -> Tuple[int, int]:
+    """
+    Writes the local tree `source` as a tar stream, the archive is named after the basename of `source`.
+    Modes and modification times are kept, owners are not. progress_callback: (path, percent).
+    Returns the number of archived files and the number of bytes written.
+    """
+    writer = CountingWriter(stream)
+    expected = max(size + files * 2 * tarfile.BLOCKSIZE, 1)
+    source = os.path.normpath(source)
+    archived = 0
+
+    with tarfile.open(fileobj=writer, mode='w|') as archive:
+        pending = [(source, os.path.basename(source))]
+        while pending:
+            path, name = pending.pop()
+            info = archive.gettarinfo(path, name)
+            if info is None:
+                # Sockets, FIFOs and devices can't be archived
+                logging.warning("Skipped %s: unsupported file type", path)
+                continue
+            info.uid = info.gid = 0
+            info.uname = info.gname = ''
+            if info.isfile():
+                with open(path, 'rb') as file:
+                    archive.addfile(info, file)
+                archived += 1
+                progress_callback(f"{name} ({archived}/{files})", min(99, int(writer.count / expected * 100)))
+            elif info.isdir():
+                archive.addfile(info)
+                with os.scandir(path) as entries:
+                    pending.extend((entry.path, f"{name}/{entry.name}") for entry in entries)
+            elif info.issym():
+                archive.addfile(info)
+    return archived, writer.count
@@ -2,10 +2,13 @@
 # Copyright (C) 2022  Azat Aldeshov
 
 import datetime
+import functools
+import posixpath
 import re
-from typing import List
+import stat
+from typing import Dict, Iterable, Iterator, List, Tuple
 
-from app.data.models import Device, File, FileType
+from app.data.models import Device, File, FileType, size_types
 
 # Converter to Device list
 # command: adb devices -l
@@ -208,6 +211,178 @@ def convert_to_file_list_b(data: str) -> List[File]:
     return files
 
 
+# Converter to File list (c)
+# command: adb -s <device_id> shell 'cd <path>; stat -c ...' (see adb_helper.list_dir)
+# <mode hex>/<size>/<mtime>/<owner>/<group>/<name>
+# //
+# <link target mode hex>/<name>
+# //
+# <name>/<link target>
+def convert_to_file_list_c(data: str, path: str) -> List[File]:
+    parser = FileListParser(path)
+    for line in (data or '').split('\n'):
+        parser.feed(line)
+    return parser.finish()
+
+
+class FileListParser:
+    """
+    Incremental convert_to_file_list_c(), fed with the output one line at a time.
+    feed() returns the File of every entry as soon as its line arrives, the link types
+    are filled in by finish() once the link sections have been read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files = []
+        self.section = 0
+        self.targets = {}
+        self.links = {}
+
+    def feed(self, line: str) -> File:
+        line = line.rstrip('\r\n')
+        if line == '//':
+            self.section += 1
+        elif not line:
+            pass
+        elif self.section == 0:
+            file = self.__file(line.split('/', 5))
+            if file:
+                self.files.append(file)
+            return file
+        elif self.section == 1:
+            mode, _, name = line.partition('/')
+            self.targets[name] = mode
+        else:
+            name, _, target = line.partition('/')
+            self.links[name] = target
+        return None
+
+    def __file(self, fields: list) -> File:
+        if len(fields) != 6:
+            return None
+        mode, size, mtime, owner, group, name = fields
+        try:
+            mode = int(mode, 16)
+            size = int(size)
+            date_time = datetime.datetime.fromtimestamp(int(mtime))
+        except (ValueError, OverflowError, OSError):
+            return None
+
+        return File(
+            name=name,
+            size=size,
+            owner=owner,
+            group=group,
+            path=(self.path + name),
+            link_type=FileType.UNKNOWN if stat.S_ISLNK(mode) else None,
+            date_time=date_time,
+            permissions=convert_mode_to_permissions(mode),
+        )
+
+    def finish(self) -> List[File]:
+        for file in self.files:
+            if file.link_type is None:
+                continue
+            file.link = self.links.get(file.name)
+            if file.name in self.targets:
+                target = int(self.targets[file.name], 16)
+                file.link_type = FileType.DIRECTORY if stat.S_ISDIR(target) else FileType.FILE
+        return self.files
+
+
+# Output of adb_helper.scan_script():
+# <number of files> <size in bytes>
+def convert_to_tree_size(data: str) -> Tuple[int, int]:
+    values = (data or '').split()
+    if len(values) < 2 or not values[0].isdigit() or not values[1].isdigit():
+        return 0, 0
+    return int(values[0]), int(values[1])
+
+
+# Output of adb_helper.tree_script(), names are relative to `path`:
+# <size>/<mtime epoch>/<path>/<name>
+def convert_to_tree(data: str, path: str) -> Dict[str, Tuple[int, int]]:
+    prefix = path.rstrip('/') + '/'
+    files = {}
+    for line in (data or '').split('\n'):
+        fields = line.split('/', 2)
+        if len(fields) < 3 or not fields[0].isdigit() or not fields[1].isdigit():
+            continue
+        if fields[2].startswith(prefix):
+            files[fields[2][len(prefix):]] = (int(fields[0]), int(fields[1]))
+    return files
+
+
+# Output of adb_helper.checksum_script():
+# <sha1>  <name>
+def convert_to_checksums(data: str) -> Dict[str, str]:
+    checksums = {}
+    for line in (data or '').split('\n'):
+        fields = line.split('  ', 1)
+        if len(fields) == 2 and len(fields[0]) == 40:
+            checksums[fields[1]] = fields[0]
+    return checksums
+
+
+# Output of adb_helper.status_script(), the first line of every value
+# <name>=<output>    --->    {name: output}
+def convert_to_status(data: str, names) -> Dict[str, str]:
+    status = {}
+    for line in (data or '').split('\n'):
+        name, separator, value = line.partition('=')
+        if separator and name in names and name not in status:
+            status[name] = value.strip()
+    return status
+
+
+# Lines of adb_helper.index_script(), rows of the FileIndex 'files' table:
+# <mode hex>/<size>/<mtime epoch>/<path>   --->    (path, parent, name, size, mtime, mode)
+def convert_to_index_records(lines: Iterable[str]) -> Iterator[tuple]:
+    for line in lines:
+        fields = line.split('/', 3)
+        if len(fields) != 4 or not fields[3].startswith('/'):
+            continue
+        try:
+            mode, size, mtime = int(fields[0], 16), int(fields[1]), int(fields[2])
+        except ValueError:
+            continue
+        path = fields[3].rstrip('/')
+        yield path, posixpath.dirname(path), posixpath.basename(path), size, mtime, mode
+
+
+# Row of the FileIndex 'files' table: (path, name, size, mtime, mode)
+def convert_index_row_to_file(row: tuple) -> File:
+    path, name, size, mtime, mode = row
+    try:
+        date_time = datetime.datetime.fromtimestamp(mtime)
+    except (ValueError, OverflowError, OSError):
+        date_time = None
+    return File(
+        name=name,
+        path=path,
+        size=size,
+        date_time=date_time,
+        permissions=convert_mode_to_permissions(mode),
+    )
+
+
+def convert_to_readable_size(size: float) -> str:
+    """Bytes as '1.5 MB'"""
+    count = 0
+    while size >= 1024 and count < len(size_types) - 1:
+        size /= 1024
+        count += 1
+    return f'{round(size, 1)} {size_types[count][1]}'
+
+
+def convert_to_readable_duration(seconds: float) -> str:
+    """Seconds as 'm:ss' or 'h:mm:ss'"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02}:{seconds:02}' if hours else f'{minutes}:{seconds:02}'
+
+
 # Get lines from raw data
 def convert_to_lines(data: str) -> List[str]:
     if not data:
@@ -221,6 +396,13 @@ def convert_to_lines(data: str) -> List[str]:
     return list(filtered)
 
 
+# Listings repeat a handful of modes, each one is converted once
+# 0o100660 (int)   --->    '-rw-rw----' (str)
+@functools.lru_cache(maxsize=1024)
+def convert_mode_to_permissions(mode: int) -> str:
+    return __converter_to_permissions_default__(list(oct(mode)[2:]))
+
+
 # Converting octal data to normal permissions' field
 # Created for: convert_to_file_list_b()
 # 100777 (.8)   --->    '- rwx rwx rwx' (str)
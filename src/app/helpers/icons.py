@@ -0,0 +1,43 @@
+# ADB File Explorer
+# Copyright (C) 2025  aakbar5
+
+from collections import OrderedDict
+
+from PyQt5.QtCore import QSize
+from PyQt5.QtGui import QGuiApplication, QIcon, QPixmap
+
+
+class IconCache:
+    """
+    IconCache - LRU cache of rendered icons keyed by (resource path, size, device pixel ratio).
+    SVG resources are decoded once per size instead of on every paint. GUI thread only.
+    """
+    MAX_ENTRIES = 256
+
+    pixmaps = OrderedDict()
+    icons = {}
+
+    @classmethod
+    def icon(cls, path: str) -> QIcon:
+        icon = cls.icons.get(path)
+        if icon is None:
+            icon = cls.icons[path] = QIcon(path)
+        return icon
+
+    @classmethod
+    def pixmap(cls, path: str, size: QSize) -> QPixmap:
+        app = QGuiApplication.instance()
+        ratio = app.devicePixelRatio() if app else 1.0
+        key = (path, size.width(), size.height(), ratio)
+
+        pixmap = cls.pixmaps.get(key)
+        if pixmap is not None:
+            cls.pixmaps.move_to_end(key)
+            return pixmap
+
+        pixmap = cls.icon(path).pixmap(QSize(round(size.width() * ratio), round(size.height() * ratio)))
+        pixmap.setDevicePixelRatio(ratio)
+        cls.pixmaps[key] = pixmap
+        while len(cls.pixmaps) > cls.MAX_ENTRIES:
+            cls.pixmaps.popitem(last=False)
+        return pixmap
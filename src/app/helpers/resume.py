@@ -0,0 +1,98 @@
+# ADB File Explorer
+# Copyright (C) 2025  aakbar5
+
+import json
+import logging
+import os
+
+from app.core.bandwidth import Bandwidth
+
+# Single files from this size on are transferred through a partial file which can be resumed
+RESUME_MIN_SIZE = 64 * 1024 * 1024
+# Offset recorded in the journal after every chunk of this size, once it is flushed to disk
+JOURNAL_INTERVAL = 4 * 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+
+
+def upload_part_name(path: str, size: int, mtime: int) -> str:
+    """Partial file on the device, the name changes when the local source changes"""
+    return f"{path}.{size}-{mtime}.part"
+
+
+def remove_partial(path: str):
+    """Removes the incomplete local file of a cancelled download which can't be resumed"""
+    try:
+        if os.path.isfile(path):
+            os.remove(path)
+    except OSError as error:
+        logging.warning("Could not remove %s: %s", path, error)
+
+
+class PartialDownload:
+    """
+    PartialDownload - download into '<path>.part' with the journal '<path>.part.json'.
+    The journal records the source size and mtime together with the offset which is known
+    to be on disk, a later attempt continues from there if the source is unchanged.
+    """
+
+    def __init__(self, path: str, source: str, size: int, mtime: int):
+        self.path = path
+        self.part = path + '.part'
+        self.journal = self.part + '.json'
+        self.source = source
+        self.size = size
+        self.mtime = mtime
+
+    @property
+    def offset(self) -> int:
+        try:
+            with open(self.journal, 'r', encoding='utf-8') as file:
+                journal = json.load(file)
+            if [journal.get('source'), journal.get('size'), journal.get('mtime')] != [self.source, self.size, self.mtime]:
+                return 0
+            return min(int(journal.get('offset') or 0), os.path.getsize(self.part))
+        except (OSError, ValueError, TypeError):
+            return 0
+
+    def __record(self, offset: int):
+        journal = {'source': self.source, 'size': self.size, 'mtime': self.mtime, 'offset': offset}
+        with open(self.journal + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(journal, file)
+        os.replace(self.journal + '.tmp', self.journal)
+
+    def write(self, stream, offset: int, progress_callback: callable) -> int:
+        """
+        Appends `stream`, which starts at `offset` of the source, to the partial file.
+        progress_callback: (path, percent). Returns the new offset.
+        """
+        mode = 'r+b' if offset and os.path.exists(self.part) else 'wb'
+        recorded = offset
+        with open(self.part, mode) as file:
+            file.seek(offset)
+            file.truncate()
+            self.__record(offset)
+            try:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    file.write(chunk)
+                    offset += len(chunk)
+                    Bandwidth.throttle(len(chunk))
+                    if offset - recorded >= JOURNAL_INTERVAL:
+                        file.flush()
+                        os.fsync(file.fileno())
+                        self.__record(offset)
+                        recorded = offset
+                    progress_callback(self.source, int(offset / max(self.size, 1) * 100))
+            finally:
+                file.flush()
+                os.fsync(file.fileno())
+                self.__record(offset)
+        return offset
+
+    def finish(self, preserve_timestamp: bool = True):
+        os.replace(self.part, self.path)
+        if preserve_timestamp and self.mtime:
+            os.utime(self.path, (self.mtime, self.mtime))
+        try:
+            os.remove(self.journal)
+        except OSError as error:
+            logging.warning("Could not remove journal %s: %s", self.journal, error)
@@ -6,17 +6,88 @@ import logging
 import os
 import shutil
 import subprocess
+import threading
+import time
+from contextlib import contextmanager
 
 from PyQt5 import QtCore
-from PyQt5.QtCore import QThread, QObject, QFile, QIODevice, QTextStream
+from PyQt5.QtCore import QObject, QFile, QIODevice, QTextStream
 from PyQt5.QtWidgets import QWidget
 
 from adb_shell.auth.keygen import keygen
 from adb_shell.auth.sign_pythonrsa import PythonRSASigner
+from app.core.executor import Executor
 from app.core.settings import SettingsOptions, Settings
 from app.data.models import MessageData
 
 
+class Cancelled(Exception):
+    """Raised by CancellationToken.check() once the operation was cancelled"""
+
+
+class CancellationToken:
+    """
+    CancellationToken - cooperative cancellation of one operation.
+    The worker running the operation activates the token for its thread. Blocking calls below
+    the repositories register a callback which interrupts them (e.g. kill the subprocess) and
+    chunk loops call check(), which raises Cancelled.
+    """
+    MESSAGE = "Cancelled"
+    local = threading.local()
+
+    def __init__(self):
+        self.cancelled = False
+        self.callbacks = []
+        self.lock = threading.Lock()
+
+    @classmethod
+    def current(cls) -> 'CancellationToken':
+        """Token of the operation running on this thread, a token which is never cancelled otherwise"""
+        return getattr(cls.local, 'token', None) or NEVER_CANCELLED
+
+    @contextmanager
+    def activate(self):
+        previous = getattr(self.local, 'token', None)
+        self.local.token = self
+        try:
+            yield self
+        finally:
+            self.local.token = previous
+
+    def cancel(self):
+        with self.lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except BaseException as error:
+                logging.warning("Cancel callback failed: %s", error)
+
+    def register(self, callback: callable) -> callable:
+        """Calls `callback` on cancel, right away if cancelled already. Returns the function which unregisters it"""
+        with self.lock:
+            if not self.cancelled:
+                self.callbacks.append(callback)
+                return lambda: self.__unregister(callback)
+        callback()
+        return lambda: None
+
+    def __unregister(self, callback: callable):
+        with self.lock:
+            if callback in self.callbacks:
+                self.callbacks.remove(callback)
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled(self.MESSAGE)
+
+
+NEVER_CANCELLED = CancellationToken()
+
+
 class CommonProcess:
     """
     CommonProcess - executes subprocess then saves output data and exit code.
@@ -33,8 +104,11 @@ class CommonProcess:
         self.output_data = None
         self.is_okay = False
         if arguments:
+            token = CancellationToken.current()
+            unregister = None
             try:
                 process = subprocess.Popen(arguments, stdout=stdout, stderr=subprocess.PIPE)
+                unregister = token.register(process.kill)
                 if stdout == subprocess.PIPE and stdout_callback:
                     for line in iter(process.stdout.readline, b''):
                         stdout_callback(line.decode(encoding='utf-8'))
@@ -43,6 +117,14 @@ class CommonProcess:
                 self.is_okay = self.exit_code == 0
                 self.error_data = error.decode(encoding='utf-8') if error else None
                 self.output_data = data.decode(encoding='utf-8') if data else None
+                if token.cancelled:
+                    self.is_okay = False
+                    self.error_data = CancellationToken.MESSAGE
+            except Cancelled:
+                process.kill()
+                process.communicate()
+                self.exit_code = process.poll()
+                self.error_data = CancellationToken.MESSAGE
             except UnicodeDecodeError:
                 self.error_data = "Can't open it, file format is uknown"
             except FileNotFoundError:
@@ -50,10 +132,50 @@ class CommonProcess:
             except BaseException as error:
                 logging.exception("Unexpected error=%s, type(error)=%s", error, type(error))
                 self.error_data = str(error)
+            finally:
+                if unregister:
+                    unregister()
 
 
-class AsyncRepositoryWorker(QThread):
+class BatchCallback:
+    """
+    BatchCallback - collects items and passes them on as lists, once `size` items are
+    collected or `interval` seconds passed since the last batch.
+
+    Keyword arguments:
+    callback -- callable function, params: (items: list) -> None
+    size -- items per batch
+    interval -- seconds between batches
+    """
+
+    def __init__(self, callback: callable, size: int, interval: float):
+        self.callback = callback
+        self.size = max(1, size)
+        self.interval = interval
+        self.items = []
+        self.last = time.monotonic()
+
+    def add(self, item):
+        self.items.append(item)
+        if len(self.items) >= self.size or time.monotonic() - self.last >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self.items:
+            self.callback(self.items)
+            self.items = []
+        self.last = time.monotonic()
+
+
+class AsyncRepositoryWorker(QObject):
+    """
+    AsyncRepositoryWorker - one repository call run by the shared Executor pools.
+    The response is delivered to the GUI thread by the on_response signal. Starting a worker
+    replaces the pending one with the same key, the worker id by default.
+    """
     on_response = QtCore.pyqtSignal(object, object)  # Response : data, error
+    on_partial = QtCore.pyqtSignal(object)  # Partial data
+    finished = QtCore.pyqtSignal()
 
     def __init__(
             self,
@@ -62,10 +184,22 @@ class AsyncRepositoryWorker(QThread):
             repository_method: callable,
             arguments: tuple,
             response_callback: callable,
+            partial_callback: callable = None,
+            pool: str = Executor.INTERACTIVE,
+            key=None,
     ):
+        """
+        partial_callback -- callable function on GUI thread, params: (data) -> None (default None).
+        When set, the repository method is called as method(partial_callback, *arguments).
+        pool -- Executor.INTERACTIVE or Executor.BULK (default INTERACTIVE)
+        key -- replace key (default worker_id)
+        """
         super(AsyncRepositoryWorker, self).__init__()
         self.on_response.connect(response_callback)
         self.finished.connect(self.close)
+        if partial_callback:
+            self.on_partial.connect(partial_callback)
+            arguments = (self.__partial, *arguments)
 
         self.__repository_method = repository_method
         self.__arguments = arguments
@@ -73,11 +207,50 @@ class AsyncRepositoryWorker(QThread):
         self.closed = False
         self.id = worker_id
         self.name = name
+        self.pool = pool
+        self.key = worker_id if key is None else key
+        self.token = CancellationToken()
+        self.superseded = False
+        self.future = None
+
+    def start(self):
+        self.future = Executor.submit(
+            self.pool, self.run, key=self.key, cancel=lambda: self.cancel(superseded=True), name=self.name
+        )
 
     def run(self):
-        data, error = self.__repository_method(*self.__arguments)
+        try:
+            self.__respond()
+        finally:
+            self.finished.emit()
+
+    def __respond(self):
+        if not self.token.cancelled:
+            with self.token.activate():
+                try:
+                    data, error = self.__repository_method(*self.__arguments)
+                except Cancelled:
+                    data, error = None, CancellationToken.MESSAGE
+                except BaseException as error:
+                    logging.exception("Unexpected error=%s, type(error)=%s", error, type(error))
+                    data, error = None, str(error)
+        if self.token.cancelled:
+            if self.superseded:
+                # A newer worker with the same key answers instead
+                return
+            data, error = None, CancellationToken.MESSAGE
         self.on_response.emit(data, error)
 
+    def __partial(self, data):
+        # Rows of a superseded listing must not reach the view
+        if not self.token.cancelled:
+            self.on_partial.emit(data)
+
+    def cancel(self, superseded: bool = False):
+        """Cancels the repository call, the response is (None, 'Cancelled') unless it is superseded"""
+        self.superseded = self.superseded or superseded
+        self.token.cancel()
+
     def close(self):
         if self.loading_widget:
             self.loading_widget.close()
@@ -87,20 +260,14 @@ class AsyncRepositoryWorker(QThread):
 
     def set_loading_widget(self, widget: QWidget):
         self.loading_widget = widget
+        if hasattr(widget, 'set_cancel'):
+            widget.set_cancel(self.cancel)
 
     def update_loading_widget(self, path, progress):
         if self.loading_widget and not self.closed:
             self.loading_widget.update_progress(f"SOURCE: {path}", progress)
 
 
-class ProgressCallbackHelper(QObject):
-    progress_callback = QtCore.pyqtSignal(str, int)
-
-    def setup(self, parent: QObject, callback: callable):
-        self.setParent(parent)
-        self.progress_callback.connect(callback)
-
-
 class Communicate(QObject):
     app_close = QtCore.pyqtSignal()
 
@@ -123,6 +290,8 @@ class Communicate(QObject):
 
     search_text_update = QtCore.pyqtSignal(str)
     search_case_update = QtCore.pyqtSignal(bool)
+    search_global_mode = QtCore.pyqtSignal(bool)  # Search the device index instead of the listing
+    search_global = QtCore.pyqtSignal(str)  # Text
 
 def get_python_rsa_keys_signer(rerun=True) -> PythonRSASigner:
     priv_key = Settings.get_value(SettingsOptions.ADB_KEY_FILE_PATH)
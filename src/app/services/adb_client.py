@@ -0,0 +1,386 @@
+# ADB File Explorer
+# Copyright (C) 2025  aakbar5
+
+import os
+import posixpath
+import shlex
+import socket
+import stat
+import struct
+import threading
+import time
+from typing import Callable, List, Tuple
+
+from app.core.bandwidth import Bandwidth
+from app.helpers.tools import CancellationToken
+
+ADB_SERVER_HOST = '127.0.0.1'
+ADB_SERVER_PORT = int(os.environ.get('ANDROID_ADB_SERVER_PORT', 5037))
+
+SYNC_DATA_MAX = 64 * 1024
+
+
+class AdbClientError(Exception):
+    pass
+
+
+class AdbServerUnavailable(AdbClientError):
+    pass
+
+
+class ShellPacket:
+    STDIN = 0
+    STDOUT = 1
+    STDERR = 2
+    EXIT = 3
+    CLOSE_STDIN = 4
+
+
+def _read_exactly(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise AdbClientError('Connection closed by adb server')
+        data.extend(chunk)
+    return bytes(data)
+
+
+class SyncConnection:
+    """
+    SyncConnection - one `sync:` session on a device transport.
+    A sync session stays usable after every request, so connections are pooled per device.
+    """
+
+    def __init__(self, sock: socket.socket, serial: str):
+        self.sock = sock
+        self.serial = serial
+
+    def close(self):
+        try:
+            self.sock.sendall(b'QUIT' + struct.pack('<I', 0))
+        except OSError:
+            pass
+        self.sock.close()
+
+    def __request(self, command: bytes, path: str):
+        path = path.encode(encoding='utf-8')
+        self.sock.sendall(command + struct.pack('<I', len(path)) + path)
+
+    def __fail(self, length: int):
+        message = _read_exactly(self.sock, length).decode(encoding='utf-8', errors='replace')
+        raise AdbClientError(message)
+
+    def stat(self, path: str) -> Tuple[int, int, int]:
+        """Returns (mode, size, mtime); mode is 0 when the path does not exist"""
+        self.__request(b'STAT', path)
+        response = _read_exactly(self.sock, 16)
+        if response[:4] != b'STAT':
+            raise AdbClientError(f'Unexpected sync response {response[:4]}')
+        return struct.unpack('<III', response[4:])
+
+    def list(self, path: str) -> List[Tuple[str, int, int, int]]:
+        """Returns a list of (name, mode, size, mtime) without '.' and '..'"""
+        self.__request(b'LIST', path)
+        entries = []
+        while True:
+            header = _read_exactly(self.sock, 20)
+            if header[:4] == b'DONE':
+                return entries
+            if header[:4] != b'DENT':
+                raise AdbClientError(f'Unexpected sync response {header[:4]}')
+            mode, size, mtime, length = struct.unpack('<IIII', header[4:])
+            name = _read_exactly(self.sock, length).decode(encoding='utf-8', errors='replace')
+            if name not in ('.', '..'):
+                entries.append((name, mode, size, mtime))
+
+    def recv(self, path: str, write: Callable[[bytes], None]):
+        self.__request(b'RECV', path)
+        while True:
+            header = _read_exactly(self.sock, 8)
+            length = struct.unpack('<I', header[4:])[0]
+            if header[:4] == b'DATA':
+                write(_read_exactly(self.sock, length))
+            elif header[:4] == b'DONE':
+                return
+            elif header[:4] == b'FAIL':
+                self.__fail(length)
+            else:
+                raise AdbClientError(f'Unexpected sync response {header[:4]}')
+
+    def send(self, path: str, mode: int, mtime: int, read: Callable[[int], bytes]):
+        self.__request(b'SEND', f'{path},{mode}')
+        while True:
+            data = read(SYNC_DATA_MAX)
+            if not data:
+                break
+            self.sock.sendall(b'DATA' + struct.pack('<I', len(data)) + data)
+        self.sock.sendall(b'DONE' + struct.pack('<I', mtime))
+
+        header = _read_exactly(self.sock, 8)
+        length = struct.unpack('<I', header[4:])[0]
+        if header[:4] == b'FAIL':
+            self.__fail(length)
+        if header[:4] != b'OKAY':
+            raise AdbClientError(f'Unexpected sync response {header[:4]}')
+
+
+class AdbClient:
+    """
+    AdbClient - talks to the adb server over its smart-socket protocol (localhost:5037)
+    instead of forking the `adb` executable for every operation.
+    Raises AdbServerUnavailable when no adb server is listening, so callers can fall back
+    to the command-line tool.
+    """
+
+    timeout = 10.
+    sync_pool = {}
+    sync_pool_lock = threading.Lock()
+
+    @classmethod
+    def __connect(cls) -> socket.socket:
+        try:
+            sock = socket.create_connection((ADB_SERVER_HOST, ADB_SERVER_PORT), timeout=cls.timeout)
+        except OSError as error:
+            raise AdbServerUnavailable(str(error)) from error
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    @staticmethod
+    def __request(sock: socket.socket, request: str):
+        data = request.encode(encoding='utf-8')
+        sock.sendall(b'%04x' % len(data) + data)
+        status = _read_exactly(sock, 4)
+        if status == b'FAIL':
+            length = int(_read_exactly(sock, 4), 16)
+            raise AdbClientError(_read_exactly(sock, length).decode(encoding='utf-8', errors='replace'))
+        if status != b'OKAY':
+            raise AdbClientError(f'Unexpected adb server response {status}')
+
+    @classmethod
+    def __host_query(cls, request: str) -> str:
+        with cls.__connect() as sock:
+            cls.__request(sock, request)
+            length = int(_read_exactly(sock, 4), 16)
+            return _read_exactly(sock, length).decode(encoding='utf-8')
+
+    @classmethod
+    def __transport(cls, serial: str, service: str) -> socket.socket:
+        sock = cls.__connect()
+        try:
+            cls.__request(sock, f'host:transport:{serial}')
+            cls.__request(sock, service)
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+    @classmethod
+    def available(cls) -> bool:
+        try:
+            cls.__connect().close()
+            return True
+        except AdbServerUnavailable:
+            return False
+
+    @classmethod
+    def devices(cls) -> str:
+        return cls.__host_query('host:devices-l')
+
+    @classmethod
+    def connect(cls, address: str) -> str:
+        return cls.__host_query(f'host:connect:{address}')
+
+    @classmethod
+    def disconnect(cls, address: str = '') -> str:
+        return cls.__host_query(f'host:disconnect:{address}')
+
+    @classmethod
+    def shell(cls, serial: str, command: str, stdout_callback: callable = None) -> Tuple[bytes, bytes, int]:
+        """
+        Runs a command with the shell protocol (v2), returns (stdout, stderr, exit code).
+        stdout_callback is called with every stdout line (str) as it arrives.
+        """
+        stdout, stderr, exit_code = bytearray(), bytearray(), None
+        lines_start = 0
+        token = CancellationToken.current()
+        with cls.__transport(serial, f'shell,v2,raw:{command}') as sock:
+            sock.settimeout(None)
+            # Shutting the socket down wakes up the blocking recv() below
+            unregister = token.register(lambda: sock.shutdown(socket.SHUT_RDWR))
+            while exit_code is None:
+                header = sock.recv(5)
+                if not header:
+                    break
+                if len(header) < 5:
+                    header += _read_exactly(sock, 5 - len(header))
+                packet, length = struct.unpack('<BI', header)
+                data = _read_exactly(sock, length)
+                if packet == ShellPacket.STDOUT:
+                    stdout.extend(data)
+                    if stdout_callback:
+                        end = stdout.rfind(b'\n') + 1
+                        if end > lines_start:
+                            for line in bytes(stdout[lines_start:end]).decode('utf-8', errors='replace').splitlines(True):
+                                stdout_callback(line)
+                            lines_start = end
+                elif packet == ShellPacket.STDERR:
+                    stderr.extend(data)
+                elif packet == ShellPacket.EXIT:
+                    exit_code = data[0]
+            unregister()
+        token.check()
+        if stdout_callback and len(stdout) > lines_start:
+            stdout_callback(bytes(stdout[lines_start:]).decode('utf-8', errors='replace'))
+        return bytes(stdout), bytes(stderr), exit_code
+
+    @classmethod
+    def exec_stream(cls, serial: str, command: str) -> socket.socket:
+        """Opens `exec:` service, the returned socket is the raw stdin/stdout of the command"""
+        sock = cls.__transport(serial, f'exec:{command}')
+        sock.settimeout(None)
+        return sock
+
+    @classmethod
+    def acquire_sync(cls, serial: str) -> SyncConnection:
+        with cls.sync_pool_lock:
+            idle = cls.sync_pool.get(serial)
+            if idle:
+                return idle.pop()
+        return SyncConnection(cls.__transport(serial, 'sync:'), serial)
+
+    @classmethod
+    def release_sync(cls, connection: SyncConnection):
+        with cls.sync_pool_lock:
+            cls.sync_pool.setdefault(connection.serial, []).append(connection)
+
+    @classmethod
+    def close_all(cls):
+        with cls.sync_pool_lock:
+            pool = cls.sync_pool
+            cls.sync_pool = {}
+        for connections in pool.values():
+            for connection in connections:
+                connection.close()
+
+    @classmethod
+    def pull(cls, serial: str, source: str, destination: str, preserve_timestamp: bool,
+             progress_callback: Callable[[str, int, int], None] = None) -> str:
+        """
+        Pulls a file or directory like `adb pull`, progress_callback: (path, written, total).
+        Returns a summary message.
+        """
+        token = CancellationToken.current()
+        connection = cls.acquire_sync(serial)
+        try:
+            mode, size, mtime = connection.stat(source)
+            if stat.S_ISLNK(mode):
+                # STAT does not follow links, a trailing slash resolves linked directories
+                link_mode, _, _ = connection.stat(source.rstrip('/') + '/')
+                if stat.S_ISDIR(link_mode):
+                    mode = link_mode
+            if mode == 0:
+                raise AdbClientError(f"remote object '{source}' does not exist")
+
+            if os.path.isdir(destination):
+                destination = os.path.join(destination, posixpath.basename(source.rstrip('/')))
+
+            entries = [(source, destination, mode, size, mtime)]
+            if stat.S_ISDIR(mode):
+                entries = cls.__walk(connection, source, destination)
+
+            start = time.time()
+            total = sum(entry[3] for entry in entries)
+            written = 0
+            for remote, local, mode, size, mtime in entries:
+                if stat.S_ISDIR(mode):
+                    os.makedirs(local, exist_ok=True)
+                    continue
+                os.makedirs(os.path.dirname(local) or '.', exist_ok=True)
+                with open(local, 'wb') as file:
+                    def write(data: bytes, _file=file, _remote=remote):
+                        nonlocal written
+                        token.check()
+                        _file.write(data)
+                        written += len(data)
+                        Bandwidth.throttle(len(data))
+                        if progress_callback:
+                            progress_callback(_remote, written, total)
+                    connection.recv(remote, write)
+                if preserve_timestamp:
+                    os.utime(local, (mtime, mtime))
+        except BaseException:
+            connection.close()
+            raise
+        cls.release_sync(connection)
+
+        files = len([entry for entry in entries if not stat.S_ISDIR(entry[2])])
+        return f"{source}: {files} file{'s' if files != 1 else ''} pulled ({written} bytes in {time.time() - start:.3f}s)"
+
+    @classmethod
+    def __walk(cls, connection: SyncConnection, source: str, destination: str) -> list:
+        entries = []
+        pending = [(source, destination)]
+        while pending:
+            remote_dir, local_dir = pending.pop()
+            entries.append((remote_dir, local_dir, stat.S_IFDIR, 0, 0))
+            for name, mode, size, mtime in connection.list(remote_dir):
+                remote = posixpath.join(remote_dir, name)
+                local = os.path.join(local_dir, name)
+                if stat.S_ISDIR(mode):
+                    pending.append((remote, local))
+                elif stat.S_ISREG(mode):
+                    entries.append((remote, local, mode, size, mtime))
+        return entries
+
+    @classmethod
+    def push(cls, serial: str, source: str, destination: str,
+             progress_callback: Callable[[str, int, int], None] = None) -> str:
+        """
+        Pushes a file or directory into the remote directory `destination` like `adb push`,
+        progress_callback: (path, written, total). Returns a summary message.
+        """
+        source = os.path.normpath(source)
+        target = posixpath.join(destination, os.path.basename(source))
+
+        entries = [(source, target)]
+        dirs = []
+        if os.path.isdir(source):
+            entries = []
+            for root, sub_dirs, files in os.walk(source):
+                remote_root = posixpath.join(target, os.path.relpath(root, source).replace(os.sep, '/'))
+                if not files and not sub_dirs:
+                    dirs.append(posixpath.normpath(remote_root))
+                for name in files:
+                    entries.append((os.path.join(root, name), posixpath.join(remote_root, name)))
+
+        start = time.time()
+        total = sum(os.path.getsize(local) for local, _ in entries)
+        written = 0
+        token = CancellationToken.current()
+        connection = cls.acquire_sync(serial)
+        try:
+            for local, remote in entries:
+                info = os.stat(local)
+                with open(local, 'rb') as file:
+                    def read(size: int, _file=file, _remote=remote) -> bytes:
+                        nonlocal written
+                        token.check()
+                        data = _file.read(size)
+                        written += len(data)
+                        Bandwidth.throttle(len(data))
+                        if progress_callback and data:
+                            progress_callback(_remote, written, total)
+                        return data
+                    connection.send(remote, stat.S_IFREG | stat.S_IMODE(info.st_mode), int(info.st_mtime), read)
+        except BaseException:
+            connection.close()
+            raise
+        cls.release_sync(connection)
+
+        if dirs:
+            # Sync protocol creates parents of pushed files only, empty ones need mkdir
+            cls.shell(serial, 'mkdir -p ' + ' '.join(shlex.quote(path) for path in dirs))
+
+        files = len(entries)
+        return f"{source}: {files} file{'s' if files != 1 else ''} pushed ({written} bytes in {time.time() - start:.3f}s)"
@@ -1,20 +1,46 @@
 # ADB File Explorer
 # Copyright (C) 2022  Azat Aldeshov
 
+import posixpath
+import re
+import shlex
+import socket
+import subprocess
+import threading
+import uuid
+from typing import List
+
 from app.core.settings import SettingsOptions, Settings
-from app.helpers.tools import CommonProcess
+from app.helpers.tools import Cancelled, CancellationToken, CommonProcess
+from app.services.adb_client import AdbClient, AdbClientError, AdbServerUnavailable
+from app.services.shell_session import ShellResponse, ShellSession
 
 ADB_PATH = Settings.get_value(SettingsOptions.ADB_PATH)
 ADB_AS_ROOT = Settings.get_value(SettingsOptions.ADB_AS_ROOT)
 PRESERVE_TIMESTAMP = Settings.get_value(SettingsOptions.PRESERVE_TIMESTAMP)
 
 
+def setting_changed(key: str, value):
+    global ADB_PATH, ADB_AS_ROOT, PRESERVE_TIMESTAMP
+    if key == SettingsOptions.ADB_PATH:
+        ADB_PATH = value
+    elif key == SettingsOptions.ADB_AS_ROOT:
+        ADB_AS_ROOT = value
+    elif key == SettingsOptions.PRESERVE_TIMESTAMP:
+        PRESERVE_TIMESTAMP = value
+
+
+Settings.signals.changed.connect(setting_changed)
+
+
 class Parameter:
     ROOT = 'root'
     DEVICE = '-s'
     PULL = 'pull'
     PUSH = 'push'
     SHELL = 'shell'
+    EXEC_OUT = 'exec-out'
+    NO_PTY = '-T'
     CONNECT = 'connect'
     HELP = '--help'
     VERSION = '--version'
@@ -45,11 +71,97 @@ class ShellCommand:
 
     GETPROP = 'getprop'
     GETPROP_PRODUCT_MODEL = [GETPROP, 'ro.product.model']
+    # Commands of FileRepository.device_info()
+    DEVICE_INFO = {
+        'android_version': 'getprop ro.build.version.release',
+        'model': 'getprop ro.product.model',
+        'uid': 'id -u',
+    }
 
     MKDIR = 'mkdir'
 
     CAT = 'cat'
 
+    STAT = 'stat'
+    # <mode hex>/<size>/<mtime epoch>/<owner>/<group>/<name>, '/' can't be part of a name
+    STAT_FORMAT = '%f/%s/%Y/%U/%G/%n'
+    STAT_GLOB = '* .[!.]* ..?*'
+    STAT_NOT_SUPPORTED = 3
+
+    TAR = 'tar'
+    TAR_CHECK = 'command -v tar >/dev/null'
+
+    SHA1SUM = 'sha1sum'
+
+    TAIL = 'tail'
+    TRUNCATE = 'truncate'
+    TOUCH = 'touch'
+
+    INDEX_FORMAT = '%f/%s/%Y/%n'
+
+
+def scan_script(path: str) -> str:
+    """Prints the number of files inside the tree `path` and their total size in bytes"""
+    return (
+        f"find -H {shlex.quote(path)} -type f -exec stat -c %s {{}} + 2>/dev/null | "
+        "{ n=0; s=0; while read b; do n=$((n+1)); s=$((s+b)); done; echo $n $s; }"
+    )
+
+
+def storage_roots_script() -> str:
+    """Prints the internal storage followed by the mounted removable volumes, one per line"""
+    return (
+        "echo /sdcard; for d in /storage/*; do "
+        "case \"$d\" in */emulated|*/self) ;; *) [ -d \"$d\" ] && echo \"$d\" ;; esac; done"
+    )
+
+
+def index_script(root: str) -> str:
+    """Prints '<mode hex>/<size>/<mtime epoch>/<path>' of everything below `root`"""
+    return f"find -H {shlex.quote(root)} -mindepth 1 -exec stat -c '{ShellCommand.INDEX_FORMAT}' {{}} + 2>/dev/null"
+
+
+def index_dirs_script(root: str) -> str:
+    """Prints '<mtime epoch>/<path>' of `root` and every directory below it"""
+    return f"find -H {shlex.quote(root)} -type d -exec stat -c '%Y/%n' {{}} + 2>/dev/null"
+
+
+def index_children_script(directories: list) -> str:
+    """Same output as index_script() for the direct children of `directories`"""
+    return (
+        f"for d in {' '.join(shlex.quote(path) for path in directories)}; do "
+        f"find \"$d\" -mindepth 1 -maxdepth 1 -exec stat -c '{ShellCommand.INDEX_FORMAT}' {{}} + 2>/dev/null; done"
+    )
+
+
+def read_from_script(path: str, offset: int) -> str:
+    """Writes the file `path` from byte `offset` on to stdout"""
+    return f"{ShellCommand.TAIL} -c +{offset + 1} {shlex.quote(path)} 2>/dev/null"
+
+
+def tree_script(path: str) -> str:
+    """Prints '<size>/<mtime epoch>/<path>' of every file inside the tree `path`"""
+    return f"find -H {shlex.quote(path.rstrip('/') or '/')} -type f -exec stat -c '%s/%Y/%n' {{}} + 2>/dev/null"
+
+
+def checksum_script(path: str, names: list) -> str:
+    """Prints '<sha1>  <name>' of the files `names` relative to the directory `path`"""
+    return f"cd {shlex.quote(path)} && {ShellCommand.SHA1SUM} -- {' '.join(shlex.quote(name) for name in names)}"
+
+
+def status_script(commands: dict) -> str:
+    """Prints '<name>=<output>' of every command of `commands` {name: command}, errors are dropped"""
+    return "; ".join(f'echo "{name}=$({command} 2>/dev/null)"' for name, command in commands.items())
+
+
+def tar_script(path: str) -> str:
+    """Writes the tree `path` as a tar archive to stdout, errors are dropped to keep the stream intact"""
+    path = path.rstrip('/') or '/'
+    return (
+        f"{ShellCommand.TAR} -cf - -C {shlex.quote(posixpath.dirname(path) or '/')} "
+        f"{shlex.quote(posixpath.basename(path) or '.')} 2>/dev/null"
+    )
+
 
 def validate():
     return version().is_okay
@@ -59,7 +171,31 @@ def version():
     return CommonProcess([ADB_PATH, Parameter.VERSION])
 
 
+def native(method: callable, *args):
+    """
+    Runs an AdbClient method against the adb server socket.
+    Returns None when the server is not reachable, so the caller can fall back to the adb binary.
+    """
+    try:
+        result = method(*args)
+    except AdbServerUnavailable:
+        return None
+    except (AdbClientError, OSError, Cancelled) as error:
+        if CancellationToken.current().cancelled:
+            return ShellResponse(error_data=CancellationToken.MESSAGE, exit_code=1)
+        return ShellResponse(error_data=f"error: {error}\n", exit_code=1)
+
+    if isinstance(result, tuple):
+        return ShellResponse(output=result[0], error=result[1], exit_code=result[2])
+    return ShellResponse(output=result.encode(encoding='utf-8'), exit_code=0)
+
+
 def devices():
+    response = native(AdbClient.devices)
+    if response:
+        # Keep the output format of `adb devices -l`
+        response.output_data = 'List of devices attached\n' + (response.output_data or '')
+        return response
     return CommonProcess([ADB_PATH, Parameter.DEVICES, Parameter.DEVICES_LONG])
 
 
@@ -72,33 +208,320 @@ def kill_server():
 
 
 def connect(device_id: str):
-    return CommonProcess([ADB_PATH, Parameter.CONNECT, device_id])
+    address = device_id if ':' in device_id else f'{device_id}:5555'
+    return native(AdbClient.connect, address) or CommonProcess([ADB_PATH, Parameter.CONNECT, device_id])
 
 
 def disconnect():
-    return CommonProcess([ADB_PATH, Parameter.DISCONNECT])
+    return native(AdbClient.disconnect) or CommonProcess([ADB_PATH, Parameter.DISCONNECT])
+
 
+def pull(device_id: str, source_path: str, destination_path: str, stdout_callback: callable,
+         progress_callback: callable = None):
+    """
+    Pull over the adb server sync socket, progress_callback: (path, written, total) bytes.
+    Falls back to `adb pull` where every stdout line is passed to stdout_callback.
+    """
+    if progress_callback:
+        response = native(AdbClient.pull, device_id, source_path, destination_path, PRESERVE_TIMESTAMP, progress_callback)
+        if response:
+            return response
 
-def pull(device_id: str, source_path: str, destination_path: str, stdout_callback: callable):
     pull_options = [Parameter.PULL, Parameter.PRESERVE_TIMESTAMP] if PRESERVE_TIMESTAMP else [Parameter.PULL]
     args = [ADB_PATH, Parameter.DEVICE, device_id, *pull_options, source_path, destination_path]
     return CommonProcess(arguments=args, stdout_callback=stdout_callback)
 
 
-def push(device_id: str, source_path: str, destination_path: str, stdout_callback: callable):
+def push(device_id: str, source_path: str, destination_path: str, stdout_callback: callable,
+         progress_callback: callable = None):
+    if progress_callback:
+        response = native(AdbClient.push, device_id, source_path, destination_path, progress_callback)
+        if response:
+            return response
+
     args = [ADB_PATH, Parameter.DEVICE, device_id, Parameter.PUSH, source_path, destination_path]
     return CommonProcess(arguments=args, stdout_callback=stdout_callback)
 
 
-def shell(device_id: str, args: list):
+def shell(device_id: str, args: list, stdout_callback: callable = None):
+    """stdout_callback -- called with every output line (str) while the command runs (default None)"""
     if ADB_AS_ROOT:
-        return CommonProcess([ADB_PATH, Parameter.DEVICE, device_id, Parameter.ROOT] + args)
-    return CommonProcess([ADB_PATH, Parameter.DEVICE, device_id, Parameter.SHELL] + args)
+        return CommonProcess([ADB_PATH, Parameter.DEVICE, device_id, Parameter.ROOT] + args, stdout_callback=stdout_callback)
+
+    # Reuse the long-lived shell of the device, spawn a new process only if it could not be
+    # started. A session which dies before its first command (e.g. device not found) falls
+    # back too, so the caller gets the adb error message instead of a generic one.
+    session = ShellSession.get(ADB_PATH, device_id)
+    if session:
+        response = session.run(" ".join(args), stdout_callback=stdout_callback)
+        if response is None:
+            # Dropped while waiting for it, e.g. another caller cancelled its command
+            session = ShellSession.get(ADB_PATH, device_id)
+            response = session.run(" ".join(args), stdout_callback=stdout_callback) if session else None
+        if response and (response.exit_code is not None or session.commands > 0 or CancellationToken.current().cancelled):
+            return response
+        ShellSession.close(device_id)
+    return native(AdbClient.shell, device_id, " ".join(args), stdout_callback) or CommonProcess(
+        [ADB_PATH, Parameter.DEVICE, device_id, Parameter.SHELL] + args, stdout_callback=stdout_callback
+    )
+
+
+def list_dir(device_id: str, path: str, names: str = ShellCommand.STAT_GLOB, stdout_callback: callable = None):
+    """
+    Single round-trip listing of `names` inside the directory `path`, three sections separated by '//' lines:
+    STAT_FORMAT record of every entry, '<mode hex>/<name>' of the link targets (stat -L),
+    and '<name>/<target>' of every link. Exits with STAT_NOT_SUPPORTED when `stat -c` is missing.
+    stdout_callback receives the lines while the listing runs.
+    """
+    return shell(device_id, [list_dir_script(path, names)], stdout_callback)
+
+
+def list_dir_script(path: str, names: str = ShellCommand.STAT_GLOB) -> str:
+    return (
+        f"cd {shlex.quote(path)} || exit 2; "
+        f"stat -c %f . >/dev/null 2>&1 || exit {ShellCommand.STAT_NOT_SUPPORTED}; "
+        f"stat -c '{ShellCommand.STAT_FORMAT}' -- {names} 2>/dev/null; echo //; "
+        f"stat -L -c '%f/%n' -- {names} 2>/dev/null; echo //; "
+        f"for f in {names}; do [ -L \"$f\" ] && echo \"$f/$(readlink \"$f\")\"; done; exit 0"
+    )
+
+
+def stat_file(device_id: str, path: str):
+    """Same output as list_dir() for the single entry `path`"""
+    return shell(device_id, [stat_file_script(path)])
+
+
+def stat_file_script(path: str) -> str:
+    path = path.rstrip('/')
+    if not path:
+        return list_dir_script('/', '.')
+    return list_dir_script(posixpath.dirname(path) or '/', shlex.quote(posixpath.basename(path)))
+
+
+class ShellBatch:
+    """
+    ShellBatch - several commands compiled into one script which needs a single round-trip.
+    Every command runs in its own subshell, its stdout, exit code and stderr are framed by
+    markers which are unique to the batch and split into one ShellResponse per command.
+    """
+
+    def __init__(self, commands: list):
+        self.commands = commands
+        self.marker = f"ADBFE{uuid.uuid4().hex[:16]}"
+
+    def script(self) -> str:
+        marker = self.marker
+        # The command writes stdout to fd 3, its stderr is captured and printed after the exit code
+        return "; ".join(
+            f"{{ echo {marker} B {index}; "
+            f"e=$( ( {command} ) 2>&1 1>&3; printf '\\n{marker} X %d\\n' $? >&3 ); "
+            f"printf '%s\\n{marker} E {index}\\n' \"$e\"; }} 3>&1"
+            for index, command in enumerate(self.commands)
+        )
+
+    def responses(self, output: str, error: str = None) -> List[ShellResponse]:
+        pattern = re.compile(
+            rf"^{self.marker} B (\d+)\n(.*?)\n{self.marker} X (\d+)\n(.*?)\n{self.marker} E \1$", re.S | re.M
+        )
+        found = {}
+        for match in pattern.finditer((output or '').replace('\r\n', '\n')):
+            stdout, exit_code, stderr = match.group(2, 3, 4)
+            found[int(match.group(1))] = ShellResponse(stdout.encode(), stderr.encode(), int(exit_code))
+        return [
+            found.get(index) or ShellResponse(error_data=error or "Command did not run")
+            for index in range(len(self.commands))
+        ]
+
+
+def batch(device_id: str, commands: list) -> List[ShellResponse]:
+    """Runs the shell commands in one round-trip, returns one response per command"""
+    shell_batch = ShellBatch(commands)
+    response = shell(device_id, [shell_batch.script()])
+    return shell_batch.responses(response.output_data, response.error_data)
+
+
+def untar_script(path: str) -> str:
+    """Extracts a tar archive read from stdin into `path`, the last output line is the exit code of tar"""
+    return f"{ShellCommand.TAR} -x -p -o -f - -C {shlex.quote(path)} 2>&1; echo $?"
+
+
+class CommandInput:
+    """
+    CommandInput - writable stdin of a command started by exec_in().
+    The output of the command is read on a thread while writing, a command printing a lot
+    can't block the writes. close() signals the end of the input and returns that output.
+    """
+
+    def __init__(self, sock: socket.socket = None, process: subprocess.Popen = None):
+        self.sock = sock
+        self.process = process
+        self.output = []
+        self.reader = threading.Thread(target=self.__read, name="exec-in", daemon=True)
+        self.reader.start()
+
+    def __read(self):
+        try:
+            if self.sock:
+                chunks = iter(lambda: self.sock.recv(65536), b'')
+            else:
+                chunks = iter(lambda: self.process.stdout.read1(65536), b'')
+            for chunk in chunks:
+                self.output.append(chunk)
+        except (OSError, ValueError):
+            pass
+
+    def write(self, data: bytes) -> int:
+        if self.sock:
+            self.sock.sendall(data)
+        else:
+            self.process.stdin.write(data)
+        return len(data)
+
+    def close(self) -> str:
+        # The command may have exited early, its output explains why
+        if self.sock:
+            try:
+                self.sock.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+            self.reader.join()
+            self.sock.close()
+        else:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+            self.reader.join()
+            self.process.wait()
+        return b''.join(self.output).decode(encoding='utf-8', errors='replace')
+
+    def abort(self):
+        """Drops the command without waiting for it, e.g. on cancel"""
+        if self.sock:
+            try:
+                # Wakes the reader, close() alone does not
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.reader.join()
+            self.sock.close()
+        else:
+            self.process.kill()
+            self.reader.join()
+            self.process.wait()
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+
+
+def tree(device_id: str, path: str):
+    return shell(device_id, [tree_script(path)])
+
+
+def status(device_id: str, commands: dict):
+    return shell(device_id, [status_script(commands)])
+
+
+def checksums(device_id: str, path: str, names: list):
+    return shell(device_id, [checksum_script(path, names)])
+
+
+def scan_dir(device_id: str, path: str):
+    return shell(device_id, [scan_script(path)])
+
+
+def exec_out(device_id: str, command: str):
+    """
+    Runs `command` through `exec-out`, stdout is passed unchanged.
+    Returns (readable binary stream, error).
+    """
+    try:
+        sock = AdbClient.exec_stream(device_id, command)
+        stream = sock.makefile('rb')
+        # The stream keeps the connection open until it is closed
+        sock.close()
+        return stream, None
+    except AdbServerUnavailable:
+        pass
+    except (AdbClientError, OSError) as error:
+        return None, f"error: {error}"
+
+    try:
+        process = subprocess.Popen(
+            [ADB_PATH, Parameter.DEVICE, device_id, Parameter.EXEC_OUT, command],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+    except OSError as error:
+        return None, f"error: {error}"
+    # Reaped once it exits, closing the stream early ends it with a broken pipe
+    threading.Thread(target=process.wait, name="exec-out", daemon=True).start()
+    return process.stdout, None
+
+
+def exec_in(device_id: str, command: str):
+    """
+    Runs `command` with its stdin opened for writing, stdin and stdout are passed unchanged.
+    Returns (CommandInput, error).
+    """
+    try:
+        return CommandInput(sock=AdbClient.exec_stream(device_id, command)), None
+    except AdbServerUnavailable:
+        pass
+    except (AdbClientError, OSError) as error:
+        return None, f"error: {error}"
+
+    try:
+        process = subprocess.Popen(
+            # `adb exec-in` does not return the output, the shell protocol does and passes the EOF of stdin
+            [ADB_PATH, Parameter.DEVICE, device_id, Parameter.SHELL, Parameter.NO_PTY, command],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+        )
+    except OSError as error:
+        return None, f"error: {error}"
+    return CommandInput(process=process), None
+
+
+def tar_stream(device_id: str, path: str):
+    """Streams the tree `path` as a tar archive, returns (readable binary stream, error)"""
+    return exec_out(device_id, tar_script(path))
+
+
+def untar_stream(device_id: str, path: str):
+    """Starts tar extraction into `path`, returns (CommandInput, error)"""
+    return exec_in(device_id, untar_script(path))
+
+
+def size_and_mtime(device_id: str, path: str):
+    """Prints '<size> <mtime epoch>' of the file `path`, exits with STAT_NOT_SUPPORTED when `stat -c` is missing"""
+    return shell(device_id, [
+        f"{ShellCommand.STAT} -c %f / >/dev/null 2>&1 || exit {ShellCommand.STAT_NOT_SUPPORTED}; "
+        f"{ShellCommand.STAT} -c '%s %Y' -- {shlex.quote(path)}"
+    ])
+
+
+def read_from(device_id: str, path: str, offset: int):
+    """Streams the file `path` starting at byte `offset`, returns (readable binary stream, error)"""
+    return exec_out(device_id, read_from_script(path, offset))
+
+
+def append_to(device_id: str, path: str, offset: int):
+    """
+    Truncates the file `path` to `offset` bytes and appends its stdin to it.
+    Returns (CommandInput, error), the last output line is the exit code.
+    """
+    path = shlex.quote(path)
+    return exec_in(device_id, f"{ShellCommand.TRUNCATE} -s {offset} {path} && {ShellCommand.CAT} >> {path}; echo $?")
+
+
+def close_sessions():
+    ShellSession.close_all()
+    AdbClient.close_all()
 
 
 def file_list(device_id: str, path: str):
-    return CommonProcess([ADB_PATH, Parameter.DEVICE, device_id, ShellCommand.LS, path])
+    return shell(device_id, [ShellCommand.LS, shlex.quote(path)])
 
 
 def read_file(device_id: str, path: str):
-    return CommonProcess([ADB_PATH, Parameter.DEVICE, device_id, ShellCommand.CAT, path])
+    return shell(device_id, [ShellCommand.CAT, shlex.quote(path)])
@@ -0,0 +1,189 @@
+# ADB File Explorer
+# Copyright (C) 2025  aakbar5
+
+import logging
+import queue
+import subprocess
+import threading
+import uuid
+
+from app.helpers.tools import CancellationToken
+
+
+class ShellResponse:
+    """
+    ShellResponse - result of one command executed inside a ShellSession.
+    Exposes the same attributes as CommonProcess so callers can use either of them.
+    """
+
+    def __init__(self, output: bytes = None, error: bytes = None, exit_code: int = None, error_data: str = None):
+        self.exit_code = exit_code
+        self.is_okay = exit_code == 0
+        self.error_data = error_data
+        self.output_data = None
+        if error_data:
+            return
+        try:
+            self.output_data = output.decode(encoding='utf-8') if output else None
+            self.error_data = error.decode(encoding='utf-8') if error else None
+        except UnicodeDecodeError:
+            self.is_okay = False
+            self.error_data = "Can't open it, file format is uknown"
+
+
+class ShellSession:
+    """
+    ShellSession - keeps one `adb -s <device_id> shell` process alive per device.
+
+    Every command is written to the shell stdin followed by a unique marker on stdout
+    (carrying the exit code) and on stderr, so the output of consecutive commands can
+    be split back out without spawning a new adb process for each of them.
+    Commands run in a subshell with stdin closed, so `cd`, `exit` or commands reading
+    stdin do not leak into the next command.
+    """
+
+    MARKER = '__ADBFE_END__'
+
+    sessions = {}
+    sessions_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, adb_path: str, device_id: str) -> 'ShellSession':
+        with cls.sessions_lock:
+            session = cls.sessions.get(device_id)
+            if session and session.alive:
+                return session
+            try:
+                session = ShellSession(adb_path, device_id)
+            except (OSError, ValueError) as error:
+                logging.error("Could not start shell session for %s: %s", device_id, error)
+                return None
+            cls.sessions[device_id] = session
+            return session
+
+    @classmethod
+    def close(cls, device_id: str):
+        with cls.sessions_lock:
+            session = cls.sessions.pop(device_id, None)
+        if session:
+            session.terminate()
+
+    @classmethod
+    def close_all(cls):
+        with cls.sessions_lock:
+            sessions = list(cls.sessions.values())
+            cls.sessions.clear()
+        for session in sessions:
+            session.terminate()
+
+    def __init__(self, adb_path: str, device_id: str):
+        self.device_id = device_id
+        self.commands = 0
+        self.closed = False
+        self.lock = threading.Lock()
+        self.process = subprocess.Popen(
+            [adb_path, '-s', device_id, 'shell'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        self.stdout = queue.Queue()
+        self.stderr = queue.Queue()
+        # Devices without shell protocol v2 merge stderr into stdout
+        self.merged_stderr = False
+        for stream, lines in ((self.process.stdout, self.stdout), (self.process.stderr, self.stderr)):
+            threading.Thread(target=self.__reader, args=(stream, lines), daemon=True).start()
+
+    @staticmethod
+    def __reader(stream, lines: queue.Queue):
+        for line in iter(stream.readline, b''):
+            lines.put(line)
+        lines.put(None)
+
+    @property
+    def alive(self) -> bool:
+        return not self.closed and self.process.poll() is None
+
+    def terminate(self):
+        if self.alive:
+            self.closed = True
+            try:
+                self.process.stdin.close()
+                self.process.terminate()
+            except OSError:
+                pass
+        # Wakes up a command waiting for its output, children of the shell may keep the pipes open
+        self.stdout.put(None)
+        self.stderr.put(None)
+
+    def run(self, command: str, timeout: float = None, stdout_callback: callable = None) -> ShellResponse:
+        """
+        stdout_callback -- called with every output line (str) while the command runs (default None)
+        Returns None when the session was closed before the command started, e.g. by a cancelled
+        command of another caller, a new session runs it.
+        """
+        token = f"{self.MARKER}{uuid.uuid4().hex}"
+        script = (
+            f"( {command}\n) </dev/null\n"
+            f"__adbfe_rc=$?\n"
+            f"printf '\\n%s\\n' {token} >&2\n"
+            f"printf '\\n%s %d\\n' {token} $__adbfe_rc\n"
+        )
+
+        cancel = CancellationToken.current()
+        with self.lock:
+            if cancel.cancelled:
+                return ShellResponse(error_data=CancellationToken.MESSAGE)
+            if not self.alive:
+                return None
+            # The command can't be interrupted inside the shell, the whole session is dropped
+            unregister = cancel.register(self.terminate)
+            try:
+                self.process.stdin.write(script.encode(encoding='utf-8'))
+                self.process.stdin.flush()
+                def forward(line: bytes):
+                    # Skip the stderr marker of devices without shell protocol v2
+                    if not line.startswith(token.encode()):
+                        stdout_callback(line.decode(encoding='utf-8', errors='replace'))
+
+                output, exit_code = self.__read_until(
+                    self.stdout, f"{token} ", timeout, forward if stdout_callback else None
+                )
+                if output is None:
+                    raise EOFError('Shell session closed')
+
+                # Without shell protocol v2 the stderr marker lands on stdout
+                err_marker = b'\n' + token.encode() + b'\n'
+                if err_marker in output:
+                    self.merged_stderr = True
+                    output = output.replace(err_marker, b'', 1)
+
+                error = b''
+                if not self.merged_stderr:
+                    error, _ = self.__read_until(self.stderr, f"{token}\n", timeout)
+                    if error is None:
+                        raise EOFError('Shell session closed')
+            except (OSError, ValueError, EOFError, queue.Empty) as error:
+                if cancel.cancelled:
+                    return ShellResponse(error_data=CancellationToken.MESSAGE)
+                logging.error("Shell session of %s failed: %s", self.device_id, error or 'timeout')
+                self.terminate()
+                return ShellResponse(error_data=f"Shell session failed: {error or 'timeout'}")
+            finally:
+                unregister()
+            self.commands += 1
+
+        return ShellResponse(output=output[:-1], error=error[:-1], exit_code=exit_code)
+
+    @staticmethod
+    def __read_until(lines: queue.Queue, marker: str, timeout: float, callback: callable = None):
+        marker = marker.encode()
+        data = []
+        while True:
+            line = lines.get(timeout=timeout)
+            if line is None:
+                return None, None
+            if line.startswith(marker):
+                code = line[len(marker):].strip()
+                return b''.join(data), int(code) if code.isdigit() else None
+            data.append(line)
+            if callback:
+                callback(line)